@@ -1,23 +1,174 @@
 # FastAPI web server for LangChainCPMAgent
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from src.agents.agent import agent
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from src.agents.agent import agent, fast_path_result, get_agent_instance, is_agent_ready, stream
+from src.agents.context_budget import context_budget_stats
+from src.agents.middleware import GENERATION_SETTINGS
+from src.agents.session import session_store
+from src.agents.router import get_query_router
+from src.agents.tool_call_parser import tool_call_stats
+from src.models.prompt_cache import prompt_cache_stats
+from src.models.speculative import speculative_stats
+from src.models.scheduler import (
+    DeadlineExceeded,
+    InferenceScheduler,
+    RequestCancelled,
+    SchedulerOverloaded,
+    cancel_scope,
+    cancellation_stats,
+    inference_scheduler,
+)
+from src.models.worker_pool import WorkerPool
+from src.tools.cpm_tools import tool_cache
+from src.tools.ingestion import IngestWatcher
+from src.tools.performance_store import add_store_listener, get_performance_store
+from src.utils.cache import create_cache
+from src.utils.metrics import REQUEST_LATENCY_SECONDS, render_metrics
+from contextlib import asynccontextmanager
+from src.utils.config import ConfigWatcher, config_manager
 import asyncio
+import json
+import logging
+import time
+
+# 日志配置：logging.level 设为 DEBUG 时输出智能体完整消息等调试信息
+logging.basicConfig(
+    level=config_manager.get("logging.level", "INFO"),
+    format=config_manager.get("logging.format", "%(asctime)s %(levelname)s %(name)s: %(message)s")
+)
+logger = logging.getLogger(__name__)
+
+# 可选的多进程模型工作池，启用时 /chat、/chat/batch 和 /chat/stream 请求分发到工作进程执行
+worker_pool = WorkerPool.from_config()
+worker_scheduler = None
+if worker_pool is not None:
+    # 每个工作进程同时处理一个请求，其余请求在有界队列中等待
+    worker_scheduler = InferenceScheduler(
+        max_concurrency=worker_pool.num_workers,
+        max_queue_size=int(config_manager.get("workers.max_queue_size", 64)),
+        request_timeout=inference_scheduler.request_timeout
+    )
+
+# 配置热加载：修改采样参数和缓存大小不需要重启或重新加载模型
+config_watcher = ConfigWatcher.from_config(config_manager)
+
+# 基准结果目录的增量导入（data.ingest 启用时）
+ingest_watcher = IngestWatcher.from_config()
+
+# 启动状态：模型加载和预热在后台进行，完成前 /ready 返回 503
+startup_state = {"ready": False, "error": None}
+
+async def load_models():
+    """加载模型（或启动工作池）并做一次预热生成"""
+    try:
+        await asyncio.to_thread(get_performance_store)
+        if worker_pool is not None:
+            await asyncio.to_thread(worker_pool.start)
+        else:
+            await asyncio.to_thread(get_agent_instance)
+        startup_state["ready"] = True
+    except Exception as e:
+        startup_state["error"] = str(e)
+        logger.error(f"Error loading model: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    """应用生命周期：后台加载模型并开始监视配置文件和基准结果目录，关闭时停止监视和模型工作池"""
+    # 不等待加载完成，端口立即可用，/health 可以马上响应
+    startup_task = asyncio.create_task(load_models())
+    if config_watcher is not None:
+        config_watcher.start()
+    if ingest_watcher is not None:
+        ingest_watcher.start()
+    yield
+    await startup_task
+    if config_watcher is not None:
+        config_watcher.stop()
+    if ingest_watcher is not None:
+        ingest_watcher.stop()
+    if worker_pool is not None:
+        await asyncio.to_thread(worker_pool.shutdown)
 
 # 创建FastAPI应用实例
 app = FastAPI(
     title="LangChainCPMAgent API",
     description="智能体系统API接口",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# 最终结果缓存，性能数据变更时清空
+result_cache = create_cache("result")
+add_store_listener(lambda store: result_cache.clear())
+
+def normalize_message(message):
+    """规范化请求文本作为缓存键：忽略大小写和多余空白"""
+    return " ".join(message.lower().split())
+
+def result_cache_key(version, message, overrides=None):
+    """结果缓存键：性能数据版本、规范化的请求文本和按请求覆盖的生成参数"""
+    overrides = overrides or {}
+    return (version, normalize_message(message), tuple(
+        (key, tuple(value) if isinstance(value, list) else value) for key, value in sorted(overrides.items())))
+
 # 请求模型
 class ChatRequest(BaseModel):
     message: str
+    # 可选的请求截止时间（秒），包含排队和推理时间
+    timeout: Optional[float] = None
+    # 可选的生成参数，只对本次请求的模型调用生效，未设置时使用 model.params 中的默认值；
+    # 较小的 max_tokens 可以明显降低延迟
+    max_tokens: Optional[int] = Field(None, ge=1)
+    temperature: Optional[float] = Field(None, ge=0, le=2)
+    top_p: Optional[float] = Field(None, gt=0, le=1)
+    stop: Optional[List[str]] = None
+    # 可选的会话 ID：同一会话的请求共享对话历史（如追问 "and on H100?"），结果不进入结果缓存
+    session_id: Optional[str] = Field(None, min_length=1, max_length=128)
+    
+    def overrides(self):
+        """请求中设置了的生成参数"""
+        return {key: value for key, value in self.model_dump(include=set(GENERATION_SETTINGS)).items()
+                if value is not None}
+    
+    def agent_config(self):
+        """传给智能体的请求配置：截止时间、生成参数覆盖和会话 ID"""
+        config = {"timeout": self.timeout, **self.overrides()}
+        if self.session_id is not None:
+            config["session_id"] = self.session_id
+        return config
 
 # 响应模型
 class ChatResponse(BaseModel):
     response: str
+    # 请求中的会话 ID，无会话时为空
+    session_id: Optional[str] = None
+
+# 批量请求模型
+class BatchChatRequest(BaseModel):
+    messages: List[str]
+    # 可选的整批截止时间（秒），包含排队和推理时间
+    timeout: Optional[float] = None
+
+# 批量响应中的单条结果，失败时 response 为空，status_code/detail 与 /chat 的错误响应一致
+class BatchChatItem(BaseModel):
+    response: Optional[str] = None
+    status_code: int = 200
+    detail: Optional[str] = None
+
+# 批量响应模型，结果顺序与请求中的 messages 一致
+class BatchChatResponse(BaseModel):
+    responses: List[BatchChatItem]
+
+async def dispatch(message, config):
+    """执行一次智能体请求：启用工作池时分发到负载最低的工作进程，否则在当前进程执行"""
+    if worker_pool is not None:
+        return await worker_scheduler.run(
+            lambda: worker_pool.submit(message, config),
+            timeout=config.get("timeout")
+        )
+    return await agent(message, config)
 
 # Health check接口
 @app.get("/health")
@@ -25,19 +176,230 @@ async def health_check():
     """健康检查接口"""
     return {"status": "healthy", "service": "LangChainCPMAgent"}
 
+# Readiness接口
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查接口：模型加载并预热完成后返回 200，否则返回 503"""
+    ready = startup_state["ready"] or (worker_pool is None and is_agent_ready())
+    if ready:
+        return {"status": "ready", "service": "LangChainCPMAgent"}
+    status = "failed" if startup_state["error"] else "loading"
+    return JSONResponse(
+        status_code=503,
+        content={"status": status, "service": "LangChainCPMAgent", "error": startup_state["error"]}
+    )
+
+# 检查客户端是否已断开连接的间隔（秒）
+DISCONNECT_POLL_SECONDS = float(config_manager.get("scheduler.disconnect_poll_interval", 0.25))
+
+async def cancel_on_disconnect(http_request, coro):
+    """执行请求处理，客户端断开连接时取消处理：取消通过取消令牌传到模型调用，停止生成并释放推理槽位"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise RequestCancelled("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+
 # Chat接口
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """聊天接口，接收消息并返回智能体的响应"""
+    with REQUEST_LATENCY_SECONDS.labels(endpoint="/chat").time():
+        return await _chat(request, http_request)
+
+async def _chat(request, http_request=None):
+    # 会话中的回答依赖对话历史，不使用结果缓存
+    cache_key = None
+    if request.session_id is None:
+        cache_key = result_cache_key(get_performance_store().version, request.message, request.overrides())
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return ChatResponse(response=cached)
+    
     try:
         # 调用智能体处理消息
-        response = await agent(request.message)
+        processing = dispatch(request.message, request.agent_config())
+        result = await (cancel_on_disconnect(http_request, processing) if http_request is not None else processing)
+        response = json.dumps(result, ensure_ascii=False)
+        if cache_key is not None:
+            result_cache.set(cache_key, response)
         # 返回响应
-        return ChatResponse(response=response)
+        return ChatResponse(response=response, session_id=request.session_id)
+    except SchedulerOverloaded as e:
+        # 队列已满，快速拒绝
+        raise HTTPException(status_code=429, detail=str(e))
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except RequestCancelled as e:
+        # 客户端已断开连接（499 为 nginx 的 Client Closed Request）
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         # 处理异常
         raise HTTPException(status_code=500, detail=f"处理消息时发生错误: {str(e)}")
 
+def error_item(e):
+    """把处理单条消息时的异常转换为批量响应中的错误结果"""
+    if isinstance(e, SchedulerOverloaded):
+        return BatchChatItem(status_code=429, detail=str(e))
+    if isinstance(e, DeadlineExceeded):
+        return BatchChatItem(status_code=503, detail=str(e))
+    if isinstance(e, RequestCancelled):
+        return BatchChatItem(status_code=499, detail=str(e))
+    return BatchChatItem(status_code=500, detail=f"处理消息时发生错误: {str(e)}")
+
+# 批量Chat接口
+@app.post("/chat/batch", response_model=BatchChatResponse)
+async def chat_batch(request: BatchChatRequest):
+    """批量聊天接口：相同的查询只处理一次，路由到相同工具参数的查询共享一次数据查询，
+    其余查询在调度器的并发上限内并发执行，结果按请求顺序返回"""
+    max_batch_size = int(config_manager.get("scheduler.max_batch_size", 128))
+    if len(request.messages) > max_batch_size:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds the limit of {max_batch_size} messages")
+    with REQUEST_LATENCY_SECONDS.labels(endpoint="/chat/batch").time():
+        return BatchChatResponse(responses=await _chat_batch(request))
+
+async def _chat_batch(request):
+    version = get_performance_store().version
+    scheduler = worker_scheduler or inference_scheduler
+    deadline = scheduler.deadline(request.timeout)
+    keys = [normalize_message(message) for message in request.messages]
+    
+    # 去重：规范化后相同的查询只处理一次
+    unique = {}
+    for key, message in zip(keys, request.messages):
+        unique.setdefault(key, message)
+    
+    items = {}
+    fast_groups = {}
+    agent_keys = []
+    router = get_query_router()
+    for key, message in unique.items():
+        cached = result_cache.get(result_cache_key(version, key))
+        if cached is not None:
+            items[key] = BatchChatItem(response=cached)
+            continue
+        arguments = router.route(message)
+        if arguments is None:
+            agent_keys.append(key)
+        else:
+            fast_groups.setdefault(tuple(sorted(arguments.items())), []).append(key)
+    
+    # 路由到相同工具参数的查询共享一次数据查询
+    for arguments, group in fast_groups.items():
+        try:
+            item = BatchChatItem(response=json.dumps(fast_path_result(dict(arguments)), ensure_ascii=False))
+        except Exception as e:
+            item = error_item(e)
+        for key in group:
+            if item.response is not None:
+                result_cache.set(result_cache_key(version, key), item.response)
+            items[key] = item
+    
+    # 其余查询交给智能体并发执行；同时提交的数量不超过调度器的并发上限，不占满等待队列
+    limit = asyncio.Semaphore(scheduler.max_concurrency)
+    
+    async def run_one(key):
+        async with limit:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return key, BatchChatItem(status_code=503, detail="Request deadline exceeded while waiting in batch")
+            try:
+                result = await dispatch(unique[key], {"timeout": remaining, "fast_path": False})
+            except Exception as e:
+                return key, error_item(e)
+        response = json.dumps(result, ensure_ascii=False)
+        result_cache.set(result_cache_key(version, key), response)
+        return key, BatchChatItem(response=response)
+    
+    for key, item in await asyncio.gather(*(run_one(key) for key in agent_keys)):
+        items[key] = item
+    return [items[key] for key in keys]
+
+async def stream_events(message, config):
+    """执行一次流式请求：启用工作池时在工作进程中执行并转发事件（同一会话的请求与 /chat 在同一个
+    工作进程中，共享对话历史），否则在当前进程执行"""
+    if worker_pool is None:
+        async for item in stream(message, config):
+            yield item
+        return
+    token = worker_scheduler.cancel_token(config.get("timeout"))
+    async with worker_scheduler.slot(token.deadline):
+        with cancel_scope(token):
+            async for item in worker_pool.stream(message, config):
+                yield item
+
+def format_sse(event, data):
+    """把事件编码为 server-sent events 格式"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# 流式Chat接口
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """流式聊天接口，以 server-sent events 推送工具调用、工具结果和模型生成的 token"""
+    # 开始推送前先做准入检查，队列已满时直接返回 429
+    if (worker_scheduler or inference_scheduler).is_overloaded():
+        raise HTTPException(status_code=429, detail="Inference queue is full")
+    
+    async def event_source():
+        start = time.perf_counter()
+        try:
+            async for item in stream_events(request.message, request.agent_config()):
+                yield format_sse(item["event"], item["data"])
+        except SchedulerOverloaded as e:
+            yield format_sse("error", {"status": 429, "detail": str(e)})
+        except DeadlineExceeded as e:
+            yield format_sse("error", {"status": 503, "detail": str(e)})
+        except RequestCancelled as e:
+            yield format_sse("error", {"status": 499, "detail": str(e)})
+        except Exception as e:
+            yield format_sse("error", {"detail": f"处理消息时发生错误: {str(e)}"})
+        finally:
+            # 端到端延迟包含整个事件流的推送时间
+            REQUEST_LATENCY_SECONDS.labels(endpoint="/chat/stream").observe(time.perf_counter() - start)
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# 运行统计接口
+@app.get("/stats")
+async def stats():
+    """运行统计接口，返回快速路径、缓存、推理调度器和提示词 token 的运行情况"""
+    return {
+        "router": get_query_router().stats(),
+        "scheduler": (worker_scheduler or inference_scheduler).stats(),
+        "cache": {
+            "result": result_cache.stats(),
+            "tool": tool_cache.stats(),
+        },
+        # 启用工作池时模型调用、会话和取消统计在各工作进程中（合并后的计数见 /metrics），不在此返回
+        "prompt_cache": prompt_cache_stats.as_dict() if worker_pool is None else None,
+        "speculative": speculative_stats.as_dict() if worker_pool is None else None,
+        "cancellation": cancellation_stats.as_dict() if worker_pool is None else None,
+        "ingest": ingest_watcher.ingestor.stats.as_dict() if ingest_watcher is not None else None,
+        "context": context_budget_stats.as_dict() if worker_pool is None else None,
+        "sessions": session_store.stats() if worker_pool is None else None,
+        "tool_calls": tool_call_stats.as_dict() if worker_pool is None else None,
+        "workers": worker_pool.stats() if worker_pool is not None else None,
+    }
+
+# Prometheus 指标接口
+@app.get("/metrics")
+async def metrics():
+    """以 Prometheus 文本格式返回各阶段延迟直方图和计数器"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
 # 根路径
 @app.get("/")
 async def root():
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Autotuner for the llama.cpp runtime settings on the local CPU.
+Loads each GGUF quantization variant with candidate n_threads, n_threads_batch and n_batch values,
+measures prefill tokens/sec on a representative agent prompt (system prompt, tool schemas, a
+question and a tool result) and decode tokens/sec on the continuation, and picks the settings with
+the lowest estimated time per model call. Decode speed depends only on n_threads and prefill speed
+on n_threads_batch and n_batch, so they are swept one after the other and the number of model loads
+grows with the sum rather than the product of the candidate lists.
+
+Only the quantization variants given (by default the configured type and download.gguf_versions)
+are compared; lower-bit variants trade answer quality for speed. With --download missing variants
+are fetched from the hub. With --write the winning settings are written to
+src/config/model_config.yaml (comments are kept); they take effect on the next start.
+
+Usage: python -m benchmarks.autotune [--quants q4_k_s q8_0] [--threads 2 4 8] [--batches 128 256 512]
+                                     [--decode-tokens 128] [--repeat 2] [--download] [--write]
+"""
+
+import argparse
+import gc
+import json
+import os
+import re
+import time
+
+from benchmarks.results import save_results
+from src.utils.config import config_manager
+
+DEFAULT_BATCHES = [64, 128, 256, 512, 1024]
+
+LOOKUP = {"model_name": "Qwen/Qwen3-235B-A22B", "engine_name": "vllm", "device_type": "nvidia/h800"}
+
+
+def default_threads():
+    """1, 2, 4, ... up to the usable CPU count, plus the CPU count and half of it."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    threads = {cpus, max(1, cpus // 2)}
+    value = 1
+    while value < cpus:
+        threads.add(value)
+        value *= 2
+    return sorted(threads)
+
+
+def agent_prompt():
+    """Prompt text shaped like the answer turn of an agent request."""
+    # Imported here: the agent modules are only needed to build the prompt
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+    from src.agents.agent import load_system_prompt, tools
+    from src.agents.tool_result_encoding import encode_tool_result
+    from src.tools.cpm_tools import get_performance_data
+
+    schemas = json.dumps([convert_to_openai_tool(tool) for tool in tools], ensure_ascii=False)
+    rows = get_performance_data.invoke(LOOKUP)
+    question = (f"What's the performance data for {LOOKUP['model_name']} with {LOOKUP['engine_name']} "
+                f"on {LOOKUP['device_type']}?")
+    return "\n\n".join([load_system_prompt(), schemas, question, encode_tool_result(rows)])
+
+
+def model_files(quants, download):
+    """Quantization -> GGUF file, for the variants found locally (or downloaded)."""
+    from src.models.agent_model import _download_model, _find_gguf_file
+
+    config = config_manager.get("model", {})
+    local_path = config.get("path", "")
+    directory = local_path if local_path and os.path.isdir(local_path) else config.get("cache_dir", "./models")
+    files = {}
+    for quant in quants:
+        model_file = _find_gguf_file(directory, quant) if os.path.isdir(directory) else None
+        if model_file is None and download:
+            model_file = _find_gguf_file(_download_model(config.get("name"), directory, quant), quant)
+        if model_file is None:
+            print(f"skipping {quant}: no GGUF file found in {directory} (use --download to fetch it)")
+            continue
+        files[quant] = model_file
+    return files
+
+
+class LlamaBenchmark:
+    """Loads a GGUF file with the given settings and measures prefill and decode speed."""
+
+    def __init__(self, files, prompt, n_ctx, decode_tokens, repeat, n_gpu_layers=-1):
+        self.files = files
+        self.prompt = prompt
+        self.n_ctx = n_ctx
+        self.decode_tokens = decode_tokens
+        self.repeat = repeat
+        self.n_gpu_layers = n_gpu_layers
+
+    def __call__(self, quant, n_threads, n_threads_batch, n_batch):
+        from llama_cpp import Llama
+
+        llm = Llama(self.files[quant], n_ctx=self.n_ctx, n_threads=n_threads, n_threads_batch=n_threads_batch,
+                    n_batch=n_batch, n_gpu_layers=self.n_gpu_layers, use_mmap=True, verbose=False)
+        try:
+            tokens = llm.tokenize(self.prompt.encode("utf-8"))[:self.n_ctx - self.decode_tokens - 1]
+            prefill = decode = 0.0
+            # Best of `repeat` runs: the first one also pays for faulting in the mapped weights
+            for _ in range(self.repeat):
+                llm.reset()
+                start = time.perf_counter()
+                llm.eval(tokens)
+                prefill = max(prefill, len(tokens) / (time.perf_counter() - start))
+                start = time.perf_counter()
+                for _ in range(self.decode_tokens):
+                    llm.eval([llm.sample(temp=0.0)])
+                decode = max(decode, self.decode_tokens / (time.perf_counter() - start))
+        finally:
+            if hasattr(llm, "close"):
+                llm.close()
+            del llm
+            gc.collect()
+        return {"prompt_tokens": len(tokens), "prefill_tokens_per_second": prefill,
+                "decode_tokens_per_second": decode}
+
+
+def estimated_seconds(result, decode_tokens):
+    """Time for one model call: prefill of the prompt plus `decode_tokens` decode steps."""
+    return (result["prompt_tokens"] / result["prefill_tokens_per_second"]
+            + decode_tokens / result["decode_tokens_per_second"])
+
+
+def tune(measure, quants, threads, batches, decode_tokens):
+    """Sweep the settings for each quantization and return (best, trials).
+
+    For each quantization n_threads is chosen by decode speed (with n_threads_batch equal to it),
+    then n_threads_batch and then n_batch by prefill speed. The quantizations are compared by
+    the estimated time per model call.
+    """
+    trials = {}
+
+    def run(quant, n_threads, n_threads_batch, n_batch):
+        settings = (quant, n_threads, n_threads_batch, n_batch)
+        if settings not in trials:
+            trials[settings] = measure(*settings)
+            result = trials[settings]
+            print(f"{quant:>8} {n_threads:>9} {n_threads_batch:>15} {n_batch:>7} "
+                  f"{result['prefill_tokens_per_second']:>14.1f} {result['decode_tokens_per_second']:>13.1f}")
+        return trials[settings]
+
+    print(f"{'quant':>8} {'n_threads':>9} {'n_threads_batch':>15} {'n_batch':>7} {'prefill tok/s':>14} "
+          f"{'decode tok/s':>13}")
+    best = None
+    batch = 512 if 512 in batches else batches[-1]
+    for quant in quants:
+        n_threads = max(threads, key=lambda t: run(quant, t, t, batch)["decode_tokens_per_second"])
+        n_threads_batch = max(threads, key=lambda t: run(quant, n_threads, t, batch)["prefill_tokens_per_second"])
+        n_batch = max(batches, key=lambda b: run(quant, n_threads, n_threads_batch, b)["prefill_tokens_per_second"])
+        result = trials[(quant, n_threads, n_threads_batch, n_batch)]
+        candidate = {"quant": quant, "n_threads": n_threads, "n_threads_batch": n_threads_batch,
+                     "n_batch": n_batch, **result, "estimated_seconds": estimated_seconds(result, decode_tokens)}
+        if best is None or candidate["estimated_seconds"] < best["estimated_seconds"]:
+            best = candidate
+    return best, [dict(zip(("quant", "n_threads", "n_threads_batch", "n_batch"), settings), **result)
+                  for settings, result in trials.items()]
+
+
+def tuned_values(best):
+    """model_config.yaml values for the winning settings."""
+    values = {
+        "model.params.n_threads": best["n_threads"],
+        "model.params.n_threads_batch": best["n_threads_batch"],
+        "model.params.n_batch": best["n_batch"],
+        "model.quantization.type": best["quant"],
+    }
+    bits = re.match(r"q(\d+)", best["quant"])
+    if bits:
+        values["model.quantization.bits"] = int(bits.group(1))
+    return values
+
+
+def main():
+    model = config_manager.get("model", {})
+    params = model.get("params", {}) or {}
+    configured = [(model.get("quantization", {}) or {}).get("type")] + list(
+        (model.get("download", {}) or {}).get("gguf_versions", []))
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quants", nargs="+", default=None, help="GGUF quantization variants to compare")
+    parser.add_argument("--threads", nargs="+", type=int, default=default_threads())
+    parser.add_argument("--batches", nargs="+", type=int, default=DEFAULT_BATCHES)
+    parser.add_argument("--decode-tokens", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--download", action="store_true", help="download missing quantization variants")
+    parser.add_argument("--write", action="store_true", help="write the winning settings to model_config.yaml")
+    args = parser.parse_args()
+
+    quants = list(dict.fromkeys(q.lower() for q in (args.quants or configured) if q))
+    files = model_files(quants, args.download)
+    if not files:
+        parser.error("no GGUF model files to benchmark")
+    n_ctx = params.get("max_length", 2048)
+    measure = LlamaBenchmark(files, agent_prompt(), n_ctx, args.decode_tokens, args.repeat,
+                             n_gpu_layers=params.get("n_gpu_layers", -1))
+    batches = sorted(b for b in args.batches if b <= n_ctx) or [n_ctx]
+    best, trials = tune(measure, list(files), sorted(set(args.threads)), batches, args.decode_tokens)
+
+    print(f"best: {best['quant']} n_threads={best['n_threads']} n_threads_batch={best['n_threads_batch']} "
+          f"n_batch={best['n_batch']} ({best['prefill_tokens_per_second']:.1f} prefill tok/s, "
+          f"{best['decode_tokens_per_second']:.1f} decode tok/s, "
+          f"{best['estimated_seconds']:.2f}s per {best['prompt_tokens']}+{args.decode_tokens} token call)")
+    if args.write:
+        path = config_manager.write_values("model", tuned_values(best))
+        print(f"settings written to {path} (restart to apply)")
+    path = save_results("autotune", {"parameters": vars(args), "files": files, "best": best, "trials": trials})
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Batch endpoint benchmark.
+Sends the same dashboard-style set of queries (repeated questions, several phrasings of the same
+lookup and questions that need the model) once as sequential POST /chat calls and once as a single
+POST /chat/batch, against app.py served in-process with the fake chat model. Caches are cleared
+before each mode. Results are saved as JSON under benchmarks/results/.
+
+Model-path queries still share the scheduler's inference slots, so with the default single slot
+their decode time bounds the speedup; --max-concurrency raises the slot count (safe here because
+the fake model has no shared state).
+
+Usage: python -m benchmarks.bench_batch [--queries 100] [--token-latency 0.002] [--max-concurrency 1]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.results import save_results
+from src.tools.performance_store import KEY_FIELDS, get_performance_store
+
+FAST_PATH_TEMPLATES = [
+    "What's the best config for {model_name} with {engine_name} on {device_type}?",
+    "{model_name} {engine_name} {device_type} performance",
+    "Show {engine_name} results for {model_name} on {device_type}",
+]
+AGENT_PATH_TEMPLATES = [
+    "How does {model_name} perform on {device_type}?",
+    "Which engine is fastest for {model_name}?",
+]
+
+
+def make_queries(count):
+    """Dashboard-style queries: a few distinct questions asked in several phrasings, with repeats."""
+    store = get_performance_store()
+    keys = [{field: record[field] for field in KEY_FIELDS} for record in store.records(store.candidate_rows())]
+    distinct = []
+    for key in keys:
+        distinct += [template.format(**key) for template in FAST_PATH_TEMPLATES]
+        distinct += [template.format(**key) for template in AGENT_PATH_TEMPLATES]
+    return [distinct[i % len(distinct)] if i % 3 else distinct[i % len(distinct)].upper() for i in range(count)]
+
+
+def _clear_caches(web_app):
+    from src.tools.cpm_tools import tool_cache
+
+    web_app.result_cache.clear()
+    tool_cache.clear()
+
+
+async def _main(args):
+    install_fake_llm(prefill_latency=args.prefill_latency, token_latency=args.token_latency)
+    # Imported after the fake model is installed so that startup loads it instead of the GGUF model
+    import app as web_app
+
+    await web_app.load_models()
+    scheduler = web_app.inference_scheduler
+    scheduler.max_concurrency = args.max_concurrency
+    scheduler._semaphore = asyncio.Semaphore(args.max_concurrency)
+    queries = make_queries(args.queries)
+    results = {"queries": len(queries), "distinct_queries": len({" ".join(q.lower().split()) for q in queries})}
+
+    transport = httpx.ASGITransport(app=web_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        _clear_caches(web_app)
+        start = time.perf_counter()
+        for query in queries:
+            response = await client.post("/chat", json={"message": query})
+            response.raise_for_status()
+        results["sequential_seconds"] = time.perf_counter() - start
+
+        _clear_caches(web_app)
+        start = time.perf_counter()
+        response = await client.post("/chat/batch", json={"messages": queries})
+        response.raise_for_status()
+        results["batch_seconds"] = time.perf_counter() - start
+        results["batch_errors"] = sum(1 for item in response.json()["responses"] if item["status_code"] != 200)
+    results["speedup"] = results["sequential_seconds"] / results["batch_seconds"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--prefill-latency", type=float, default=0.02, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="seconds per generated token")
+    parser.add_argument("--max-concurrency", type=int, default=1, help="inference slots of the scheduler")
+    args = parser.parse_args()
+
+    results = asyncio.run(_main(args))
+    print(f"{results['queries']} queries ({results['distinct_queries']} distinct)")
+    print(f"sequential /chat: {results['sequential_seconds']:.2f}s "
+          f"({results['queries'] / results['sequential_seconds']:.1f} req/s)")
+    print(f"/chat/batch:      {results['batch_seconds']:.2f}s "
+          f"({results['queries'] / results['batch_seconds']:.1f} req/s), {results['batch_errors']} errors")
+    print(f"speedup: {results['speedup']:.1f}x")
+    path = save_results("batch", {"parameters": vars(args), **results})
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
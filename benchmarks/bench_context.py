@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Prompt-token benchmark for the compact tool-result encoding and the context budget.
+For a sample of (model, engine, device) lookups against a synthetic performance store, builds the
+prompt of the model call that follows the tool result (system prompt + tool definitions + question
++ tool call + tool result) and counts its tokens with the tool result as raw JSON and as the
+compact table, and after the context budget has fitted it into n_ctx. Tokens are estimated with
+estimate_tokens (no model is loaded), so absolute numbers are approximate; the ratios are what
+matters. Results are saved as JSON under benchmarks/results/.
+
+Usage: python -m benchmarks.bench_context [--rows 100000] [--requests 200] [--n-ctx 2048]
+"""
+
+import argparse
+import json
+import random
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.bench_performance_store import make_synthetic_records
+from benchmarks.results import save_results
+from src.agents.agent import system_prompt, tools
+from src.agents.context_budget import ContextBudget, estimate_tokens, tools_text
+from src.agents.tool_result_encoding import encode_tool_result
+from src.tools.performance_store import KEY_FIELDS, PerformanceStore
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--n-ctx", type=int, default=2048)
+    parser.add_argument("--max-rows", type=int, default=20)
+    parser.add_argument("--reserve-tokens", type=int, default=256)
+    args = parser.parse_args()
+
+    store = PerformanceStore.from_records(make_synthetic_records(args.rows))
+    keys = sorted({tuple(record[field] for field in KEY_FIELDS) for record in store.records(store.candidate_rows())})
+    rng = random.Random(0)
+    fixed_text = system_prompt + tools_text(tools)
+    budget = ContextBudget(n_ctx=args.n_ctx, count_tokens=estimate_tokens, reserve_tokens=args.reserve_tokens,
+                           max_rows=args.max_rows)
+
+    raw_tool, compact_tool, raw_prompt, compact_prompt, fitted_prompt, rows_per_lookup = [], [], [], [], [], []
+    raw_over, fitted_over = 0, 0
+    limit = budget.limit()
+    for _ in range(args.requests):
+        arguments = dict(zip(KEY_FIELDS, rng.choice(keys)))
+        rows = store.lookup(**arguments)
+        rows_per_lookup.append(len(rows))
+        raw = json.dumps(rows, ensure_ascii=False)
+        compact = encode_tool_result(rows, max_rows=args.max_rows)
+        messages = [
+            HumanMessage(content=f"{arguments['model_name']} 在 {arguments['device_type']} 上用 "
+                                 f"{arguments['engine_name']} 的性能如何？"),
+            AIMessage(content="", tool_calls=[{"name": "get_performance_data", "args": arguments, "id": "call_1"}]),
+            ToolMessage(content=compact, artifact=rows, name="get_performance_data", tool_call_id="call_1"),
+        ]
+        _, report = budget.fit(fixed_text, messages)
+        raw_tool.append(estimate_tokens(raw))
+        compact_tool.append(estimate_tokens(compact))
+        raw_prompt.append(report["uncompacted_prompt_tokens"])
+        compact_prompt.append(report["uncompacted_prompt_tokens"] - raw_tool[-1] + compact_tool[-1])
+        fitted_prompt.append(report["prompt_tokens"])
+        raw_over += report["uncompacted_prompt_tokens"] > limit
+        fitted_over += report["over_budget"]
+
+    results = {
+        "parameters": vars(args),
+        "fixed_prompt_tokens": estimate_tokens(fixed_text),
+        "rows_per_lookup": _mean(rows_per_lookup),
+        "tool_result_tokens": {"raw_json": _mean(raw_tool), "compact": _mean(compact_tool)},
+        "prompt_tokens_per_request": {
+            "raw_json": _mean(raw_prompt),
+            "compact": _mean(compact_prompt),
+            "fitted": _mean(fitted_prompt),
+        },
+        "prompt_token_reduction": 1 - sum(fitted_prompt) / sum(raw_prompt),
+        "over_budget_requests": {"raw_json": raw_over, "fitted": fitted_over},
+    }
+
+    print(f"{args.requests} requests, {results['rows_per_lookup']:.1f} rows per lookup, "
+          f"{results['fixed_prompt_tokens']} tokens of system prompt + tool definitions")
+    print(f"tool result tokens:  raw JSON {_mean(raw_tool):8.1f}   compact {_mean(compact_tool):8.1f}")
+    print(f"prompt tokens:       raw JSON {_mean(raw_prompt):8.1f}   compact {_mean(compact_prompt):8.1f}   "
+          f"fitted {_mean(fitted_prompt):8.1f}")
+    print(f"prompt token reduction per request: {results['prompt_token_reduction']:.1%}")
+    print(f"requests over the {limit}-token budget: raw JSON {raw_over}, after fitting {fitted_over}")
+    path = save_results("context", results)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Ingestion benchmark for benchmark result files written to a watch directory.
+Writes synthetic records into several JSONL files, times the first full ingest (parse +
+validate rows/sec and the store rebuild), then appends a small batch to one file and times the
+incremental ingest, which only reads the appended lines and appends their records to the
+store instead of rebuilding it. Results are saved as JSON under benchmarks/results/.
+
+Usage: python -m benchmarks.bench_ingest [--rows 100000] [--files 10] [--append 1000]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.bench_performance_store import make_synthetic_records
+from benchmarks.results import save_results
+from src.tools.ingestion import ResultIngestor
+from src.tools.performance_store import get_performance_store, set_performance_store
+
+
+def _write(path, records):
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def _ingest(ingestor):
+    stats = ingestor.stats
+    rows_before, parse_before = stats.rows_read, stats.parse_seconds
+    start = time.perf_counter()
+    store = ingestor.ingest()
+    elapsed = time.perf_counter() - start
+    rows = stats.rows_read - rows_before
+    parse_seconds = stats.parse_seconds - parse_before
+    return {
+        "rows_read": rows,
+        "store_rows": len(store),
+        "seconds": elapsed,
+        "rows_per_second": rows / parse_seconds if parse_seconds else 0.0,
+        "rebuild_seconds": stats.rebuild_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--append", type=int, default=1000)
+    args = parser.parse_args()
+
+    original = get_performance_store()
+    records = make_synthetic_records(args.rows + args.append)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"results-{i:03d}.jsonl") for i in range(args.files)]
+        per_file = -(-args.rows // args.files)
+        for i, path in enumerate(paths):
+            _write(path, records[i * per_file:min((i + 1) * per_file, args.rows)])
+
+        ingestor = ResultIngestor(directory, base_records=[])
+        try:
+            full = _ingest(ingestor)
+            _write(paths[0], records[args.rows:])
+            incremental = _ingest(ingestor)
+        finally:
+            set_performance_store(original)
+
+    for name, result in (("full", full), ("incremental", incremental)):
+        print(f"{name:>12}: {result['rows_read']:>8} rows read in {result['seconds']:.3f}s  "
+              f"({result['rows_per_second']:,.0f} rows/s parse+validate, "
+              f"rebuild {result['rebuild_seconds']:.3f}s, store {result['store_rows']} rows)")
+    path = save_results("ingest", {"parameters": vars(args), "full": full, "incremental": incremental})
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
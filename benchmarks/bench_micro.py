@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the per-request code paths around the model.
+Times get_performance_data (cached tool call and uncached store lookup), name resolution,
+the tool-call middleware parser and run() post-processing of an agent result, without loading
+a model.
+Results are saved as JSON under benchmarks/results/.
+
+Usage: python -m benchmarks.bench_micro [--rows 100000] [--repeat 2000]
+"""
+
+import argparse
+import json
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.bench_performance_store import make_synthetic_records
+from benchmarks.results import save_results
+from src.agents.agent import process_result
+from src.agents.middleware import tool_call_extractor_middleware
+from src.agents.tool_call_parser import parse_tool_calls
+from src.tools.cpm_tools import get_performance_data
+from src.tools.entity_index import get_entity_index
+from src.tools.performance_store import PerformanceStore, set_performance_store
+
+
+def _time(func, repeat):
+    """Mean and best time per call in microseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return {"mean_us": sum(samples) / len(samples) * 1e6, "min_us": min(samples) * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    store = PerformanceStore.from_records(make_synthetic_records(args.rows))
+    set_performance_store(store)
+    key = store.records(store.candidate_rows()[:1])[0]
+    arguments = {"model_name": key["model_name"], "engine_name": key["engine_name"], "device_type": key["device_type"]}
+    rows = store.lookup(**arguments)
+    # A lower-case, space-separated partial name that misses the exact/alias tables
+    fuzzy_name = arguments["model_name"].split("/")[-1].lower().replace("-", " ") + " x"
+
+    tool_call = f'<tool_call>{json.dumps({"name": "get_performance_data", "arguments": arguments})}</tool_call>'
+    multi_call = "好的，我来查询。" + tool_call + "\n" + tool_call.replace("get_performance_data", "get_best_configs")
+
+    def middleware():
+        message = AIMessage(content=tool_call)
+        tool_call_extractor_middleware.after_model({"messages": [message]}, None)
+
+    agent_result = {"messages": [
+        HumanMessage(content="question"),
+        AIMessage(content="", tool_calls=[{"name": "get_performance_data", "args": arguments, "id": "call_1"}]),
+        ToolMessage(content=json.dumps(rows), name="get_performance_data", tool_call_id="call_1"),
+        AIMessage(content="summary"),
+    ]}
+
+    results = {
+        "rows": args.rows,
+        "rows_per_lookup": len(rows),
+        "get_performance_data_cached": _time(lambda: get_performance_data.invoke(arguments), args.repeat),
+        "store_lookup": _time(lambda: store.lookup(**arguments), args.repeat),
+        "resolve_exact_names": _time(lambda: get_entity_index().canonicalize(**arguments), args.repeat),
+        "resolve_fuzzy_name": _time(lambda: get_entity_index().resolve("model_name", fuzzy_name), args.repeat),
+        "parse_tool_calls": _time(lambda: parse_tool_calls(multi_call), args.repeat),
+        "middleware_after_model": _time(middleware, args.repeat),
+        "run_post_processing": _time(lambda: process_result(agent_result), args.repeat),
+    }
+
+    print(f"{'benchmark':>30} {'mean us':>10} {'min us':>10}")
+    for name, timing in results.items():
+        if isinstance(timing, dict):
+            print(f"{name:>30} {timing['mean_us']:>10.1f} {timing['min_us']:>10.1f}")
+    path = save_results("micro", results)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
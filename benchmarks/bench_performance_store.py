@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the performance data store.
+Compares indexed lookups against the legacy per-call linear scan as the row count grows, and
+times compare() (grouped aggregates + Pareto frontier for one model) against the per-combination
+lookups the agent would otherwise make, one tool call per engine/device pair.
+
+Usage: python -m benchmarks.bench_performance_store [--sizes 1000 10000 100000 500000]
+"""
+
+import argparse
+import random
+import time
+
+from src.tools.performance_store import PerformanceStore
+
+MODELS = [f"Org{i}/Model-{i}B" for i in range(200)]
+ENGINES = ["vllm", "tensorrt-llm", "sglang", "lmdeploy"]
+DEVICES = ["nvidia/h800", "nvidia/h100", "nvidia/a100", "nvidia/l40s", "amd/mi300x"]
+
+
+def make_synthetic_records(n, seed=0):
+    """Generate n synthetic benchmark records following the store schema."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        tp = rng.choice([1, 2, 4, 8])
+        records.append({
+            "id": i + 1,
+            "model_name": rng.choice(MODELS),
+            "engine_name": rng.choice(ENGINES),
+            "device_type": rng.choice(DEVICES),
+            "node_num": rng.choice([1, 1, 2, 4]),
+            "device_per_node": tp,
+            "scenario": "",
+            "dtype": rng.choice(["bfloat16", "float16", "fp8"]),
+            "quantization": rng.choice(["", "", "awq", "gptq"]),
+            "gpu_memory_utilization": 0.9,
+            "data_parallel_size": 0,
+            "pipeline_parallel_size": 0,
+            "tensor_parallel_size": tp,
+            "enable_expert_parallel": rng.random() < 0.2,
+            "enable_chunked_prefill": rng.random() < 0.5,
+            "ttft": round(rng.uniform(50, 800), 1),
+            "tpot": round(rng.uniform(5, 40), 1),
+            "qps": round(rng.uniform(0.1, 3.0), 2),
+            "throughput": round(rng.uniform(200, 4000), 2),
+        })
+    return records
+
+
+def _linear_scan(records, model_name, engine_name, device_type):
+    """The original get_performance_data filter."""
+    return [
+        item for item in records
+        if item["model_name"] == model_name and
+           item["engine_name"] == engine_name and
+           item["device_type"] == device_type
+    ]
+
+
+def _time_per_call(fn, keys, min_seconds=0.2):
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for key in keys:
+            fn(*key)
+        calls += len(keys)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 500_000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    stores = []
+    print(f"{'rows':>10} {'build (s)':>10} {'indexed (us)':>14} {'linear scan (us)':>18} {'speedup':>9}")
+    for size in args.sizes:
+        records = make_synthetic_records(size)
+        keys = [(rng.choice(MODELS), rng.choice(ENGINES), rng.choice(DEVICES)) for _ in range(args.lookups)]
+
+        start = time.perf_counter()
+        store = PerformanceStore.from_records(records)
+        build_seconds = time.perf_counter() - start
+
+        indexed = _time_per_call(store.lookup, keys)
+        scan = _time_per_call(lambda m, e, d: _linear_scan(records, m, e, d), keys[:20])
+        print(f"{size:>10} {build_seconds:>10.3f} {indexed * 1e6:>14.1f} {scan * 1e6:>18.1f} {scan / indexed:>8.0f}x")
+        stores.append((size, store))
+
+    print()
+    print(f"{'rows':>10} {'rows/model':>11} {'compare (us)':>13} {'all lookups (us)':>17} {'lookup calls':>13}")
+    models = [(model,) for model in MODELS[:20]]
+    for size, store in stores:
+        compare = _time_per_call(store.compare, models)
+        lookups = _time_per_call(
+            lambda model: [store.lookup(model, engine, device) for engine in ENGINES for device in DEVICES], models)
+        print(f"{size:>10} {size // len(MODELS):>11} {compare * 1e6:>13.1f} {lookups * 1e6:>17.1f} "
+              f"{len(ENGINES) * len(DEVICES):>13}")
+
+
+if __name__ == "__main__":
+    main()
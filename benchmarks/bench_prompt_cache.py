@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Prefill benchmark for the system-prompt KV prefix cache.
+Sends the same agent-shaped prompts (system prompt + tool schema + a varying user turn) to the
+real GGUF model, once with the KV context reset before every request and no state cache
+("before"), and once with the prefix state warmed and restored from the cache ("after").
+
+Usage: python -m benchmarks.bench_prompt_cache [--requests 5]
+"""
+
+import argparse
+import time
+
+from src.agents.agent import load_system_prompt, tools
+from src.models.agent_model import get_chat_llm
+from src.models.prompt_cache import install_prompt_cache, prompt_cache_stats, warm_prompt_cache
+
+QUESTIONS = [
+    "What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?",
+    "What's the performance data for Meta/Llama-3-70B-Instruct with vllm on nvidia/h800?",
+    "Qwen/Qwen3-72B-A22B 在 nvidia/h800 上用 vllm 的最佳配置是什么？",
+    "Which config of Qwen/Qwen3-235B-A22B on nvidia/h100 has the lowest ttft with vllm?",
+    "Show tensorrt-llm results for Qwen/Qwen3-235B-A22B on nvidia/h800.",
+]
+
+
+def _messages(system_prompt, question):
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": question}]
+
+
+def _run(model, llm, system_prompt, requests):
+    """Time single-token completions, i.e. prefill latency, after clearing the live KV context."""
+    latencies = []
+    for i in range(requests):
+        llm.client.reset()
+        start = time.perf_counter()
+        model.invoke(_messages(system_prompt, QUESTIONS[i % len(QUESTIONS)]), max_tokens=1)
+        latencies.append(time.perf_counter() - start)
+    return sum(latencies) / len(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    llm = get_chat_llm()
+    model = llm.bind_tools(tools)
+    system_prompt = load_system_prompt()
+
+    llm.client.set_cache(None)
+    before = _run(model, llm, system_prompt, args.requests)
+
+    install_prompt_cache(llm, force=True)
+    warm_prompt_cache(llm, tools, _messages(system_prompt, "你好"))
+    saved_before = prompt_cache_stats.prefill_tokens_saved
+    after = _run(model, llm, system_prompt, args.requests)
+    saved = prompt_cache_stats.prefill_tokens_saved - saved_before
+
+    print(f"prefix tokens (warm-up prompt): {prompt_cache_stats.warmup_prompt_tokens}")
+    print(f"prefill tokens saved:           {saved} total, {saved / args.requests:.0f} per request")
+    print(f"prefill latency before:         {before * 1000:.1f} ms")
+    print(f"prefill latency after:          {after * 1000:.1f} ms ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Decode-speed benchmark for speculative decoding on the answer turn.
+Runs the agent's final turn (question, tool call and tool result in the context) on the local
+GGUF model for a set of lookups, once without a draft model and once with the configured one
+(prompt lookup unless model.speculative says otherwise), with greedy sampling so both runs
+produce the same text. Reports decode tokens/sec and the draft acceptance rate.
+
+Usage: python -m benchmarks.bench_speculative [--repeat 1] [--max-tokens 256] [--method prompt_lookup]
+"""
+
+import argparse
+import time
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from benchmarks.results import save_results
+from src.agents.agent import load_system_prompt, tools
+from src.agents.tool_result_encoding import encode_tool_result
+from src.models.agent_model import get_chat_llm
+from src.models.speculative import speculative_stats
+from src.tools.cpm_tools import get_performance_data
+from src.utils.config import config_manager
+
+LOOKUPS = [
+    {"model_name": "Qwen/Qwen3-235B-A22B", "engine_name": "vllm", "device_type": "nvidia/h800"},
+    {"model_name": "Meta/Llama-3-70B-Instruct", "engine_name": "vllm", "device_type": "nvidia/h800"},
+    {"model_name": "Qwen/Qwen3-235B-A22B", "engine_name": "tensorrt-llm", "device_type": "nvidia/h800"},
+]
+
+
+def _conversation(system_prompt, arguments):
+    rows = get_performance_data.invoke(arguments)
+    call = {"name": get_performance_data.name, "args": arguments, "id": "call_1"}
+    return [
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=f"What's the performance data for {arguments['model_name']} with "
+                             f"{arguments['engine_name']} on {arguments['device_type']}?"),
+        AIMessage(content="", tool_calls=[call]),
+        ToolMessage(content=encode_tool_result(rows), artifact=rows, name=call["name"], tool_call_id="call_1"),
+    ]
+
+
+def _measure(model, conversations, repeat):
+    tokens_before, seconds_before = speculative_stats.decode_tokens, speculative_stats.decode_seconds
+    drafted_before, accepted_before = speculative_stats.drafted_tokens, speculative_stats.accepted_tokens
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for messages in conversations:
+            model.invoke(messages)
+    elapsed = time.perf_counter() - start
+    tokens = speculative_stats.decode_tokens - tokens_before
+    seconds = speculative_stats.decode_seconds - seconds_before
+    drafted = speculative_stats.drafted_tokens - drafted_before
+    return {
+        "decode_tokens_per_second": tokens / seconds if seconds else 0.0,
+        "seconds_per_request": elapsed / (repeat * len(conversations)),
+        "acceptance_rate": (speculative_stats.accepted_tokens - accepted_before) / drafted if drafted else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--method", default=None, help="override model.speculative.method")
+    args = parser.parse_args()
+
+    # The draft model has to be passed to llama.cpp when the model is loaded
+    speculative = config_manager.configs.setdefault("model", {}).setdefault("speculative", {})
+    speculative["enabled"] = True
+    if args.method:
+        speculative["method"] = args.method
+    llm = get_chat_llm()
+    draft_model = llm.client.draft_model
+    model = llm.bind_tools(tools).bind(max_tokens=args.max_tokens, temperature=0.0, top_p=1.0)
+    system_prompt = load_system_prompt()
+    conversations = [_conversation(system_prompt, arguments) for arguments in LOOKUPS]
+    # Evaluate the shared prompt prefixes once so both runs start from the same cache state
+    model.bind(max_tokens=1).batch(conversations)
+
+    llm.client.draft_model = None
+    baseline = _measure(model, conversations, args.repeat)
+    llm.client.draft_model = draft_model
+    speculative_run = _measure(model, conversations, args.repeat)
+
+    print(f"{'mode':>12} {'decode tok/s':>13} {'seconds/req':>12} {'acceptance':>11}")
+    print(f"{'baseline':>12} {baseline['decode_tokens_per_second']:>13.1f} {baseline['seconds_per_request']:>12.2f} "
+          f"{'-':>11}")
+    print(f"{speculative_stats.method:>12} {speculative_run['decode_tokens_per_second']:>13.1f} "
+          f"{speculative_run['seconds_per_request']:>12.2f} {speculative_run['acceptance_rate']:>11.1%}")
+    if baseline["decode_tokens_per_second"]:
+        print(f"decode speedup: "
+              f"{speculative_run['decode_tokens_per_second'] / baseline['decode_tokens_per_second']:.2f}x")
+    path = save_results("speculative", {
+        "parameters": vars(args),
+        "method": speculative_stats.method,
+        "baseline": baseline,
+        "speculative": speculative_run,
+    })
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Import-time and startup-time benchmark for the web server.
+Measures, in fresh interpreters, how long `import app` takes, then starts uvicorn and measures
+how long until /health answers (port bound) and until /ready answers 200 (model loaded and
+warmed up). Thresholds turn it into a regression check that exits non-zero when exceeded.
+
+Usage: python -m benchmarks.bench_startup [--runs 5] [--max-import-seconds 3] [--max-health-seconds 5]
+"""
+
+import argparse
+import json
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+
+
+def measure_import(runs):
+    """Median wall time of `import app` in a fresh interpreter."""
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _status(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def measure_startup(ready_timeout):
+    """Seconds until /health answers and until /ready returns 200 (None if it never does)."""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    health_seconds = ready_seconds = None
+    try:
+        while time.perf_counter() - start < ready_timeout and server.poll() is None:
+            if health_seconds is None and _status(f"http://127.0.0.1:{port}/health") == 200:
+                health_seconds = time.perf_counter() - start
+            if health_seconds is not None and _status(f"http://127.0.0.1:{port}/ready") == 200:
+                ready_seconds = time.perf_counter() - start
+                break
+            time.sleep(0.05)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return health_seconds, ready_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--skip-ready", action="store_true", help="only measure import time and port binding")
+    parser.add_argument("--max-import-seconds", type=float, default=None)
+    parser.add_argument("--max-health-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    results = {"import_seconds": measure_import(args.runs)}
+    health, ready = measure_startup(5 if args.skip_ready else args.ready_timeout)
+    results["health_seconds"] = health
+    if not args.skip_ready:
+        results["ready_seconds"] = ready
+    print(json.dumps(results, indent=2))
+
+    failures = []
+    if args.max_import_seconds is not None and results["import_seconds"] > args.max_import_seconds:
+        failures.append(f"import took {results['import_seconds']:.2f}s > {args.max_import_seconds}s")
+    if args.max_health_seconds is not None and (health is None or health > args.max_health_seconds):
+        failures.append(f"/health not answering within {args.max_health_seconds}s")
+    for failure in failures:
+        print(f"REGRESSION: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
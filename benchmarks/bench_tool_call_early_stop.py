@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Decode-token benchmark for stopping generation once tool calls are complete.
+Runs the agent's first (tool-calling) turn on the local GGUF model for a set of questions,
+once with early stop disabled and once enabled, and reports decode tokens per request.
+
+Usage: python -m benchmarks.bench_tool_call_early_stop [--repeat 1]
+"""
+
+import argparse
+import time
+
+from src.agents.agent import load_system_prompt, tools
+from src.agents.tool_call_parser import tool_call_stats
+from src.models.agent_model import get_chat_llm
+
+QUESTIONS = [
+    "What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?",
+    "What's the performance data for Meta/Llama-3-70B-Instruct with vllm on nvidia/h800?",
+    "Qwen/Qwen3-72B-A22B 在 nvidia/h800 上用 vllm 的最佳配置是什么？",
+    "Show tensorrt-llm results for Qwen/Qwen3-235B-A22B on nvidia/h800.",
+]
+
+
+def _measure(llm, model, system_prompt, repeat, early_stop):
+    llm.early_stop_tool_calls = early_stop
+    tokens_before = tool_call_stats.decode_tokens
+    start = time.perf_counter()
+    requests = 0
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            model.invoke([{"role": "system", "content": system_prompt}, {"role": "user", "content": question}])
+            requests += 1
+    elapsed = time.perf_counter() - start
+    return (tool_call_stats.decode_tokens - tokens_before) / requests, elapsed / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    llm = get_chat_llm()
+    model = llm.bind_tools(tools)
+    system_prompt = load_system_prompt()
+
+    off_tokens, off_seconds = _measure(llm, model, system_prompt, args.repeat, early_stop=False)
+    on_tokens, on_seconds = _measure(llm, model, system_prompt, args.repeat, early_stop=True)
+    print(f"{'mode':>12} {'decode tokens/req':>18} {'seconds/req':>12}")
+    print(f"{'no stop':>12} {off_tokens:>18.1f} {off_seconds:>12.2f}")
+    print(f"{'early stop':>12} {on_tokens:>18.1f} {on_seconds:>12.2f}")
+    print(f"decode tokens saved per request: {off_tokens - on_tokens:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tool-call grammar benchmark.
+Runs the full agent on the local GGUF model for a set of questions, once without and once with
+the grammar generated from the tool signatures, and reports the tool-call parse failure rate,
+model turns per request and latency.
+
+Usage: python -m benchmarks.bench_tool_call_grammar [--repeat 1]
+"""
+
+import argparse
+import time
+
+from langchain.agents import create_agent
+
+from src.agents.agent import system_prompt, tools
+from src.agents.middleware import tool_call_extractor_middleware
+from src.agents.tool_call_grammar import build_tool_call_grammar
+from src.agents.tool_call_parser import tool_call_stats
+from src.models.agent_model import get_chat_llm
+
+QUESTIONS = [
+    "What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?",
+    "What's the performance data for Meta/Llama-3-70B-Instruct with vllm on nvidia/h800?",
+    "Qwen/Qwen3-72B-A22B 在 nvidia/h800 上用 vllm 的最佳配置是什么？",
+    "Top 2 configs by ttft for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800, at most 2 nodes.",
+]
+
+
+def _measure(llm, repeat, grammar):
+    llm.grammar = grammar
+    agent = create_agent(model=llm, tools=tools, system_prompt=system_prompt,
+                         middleware=[tool_call_extractor_middleware])
+    parsed, failures = tool_call_stats.parsed_calls, tool_call_stats.parse_failures
+    turns = 0
+    requests = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            result = agent.invoke({"messages": [{"role": "user", "content": question}]})
+            turns += sum(1 for msg in result["messages"] if msg.type == "ai")
+            requests += 1
+    elapsed = time.perf_counter() - start
+    parsed = tool_call_stats.parsed_calls - parsed
+    failures = tool_call_stats.parse_failures - failures
+    failure_rate = failures / (parsed + failures) if parsed + failures else 0.0
+    return failure_rate, turns / requests, elapsed / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    from llama_cpp import LlamaGrammar
+
+    llm = get_chat_llm()
+    grammar = LlamaGrammar.from_string(build_tool_call_grammar(tools), verbose=False)
+
+    print(f"{'mode':>10} {'parse failure rate':>19} {'turns/req':>10} {'seconds/req':>12}")
+    for name, value in (("free", None), ("grammar", grammar)):
+        failure_rate, turns, seconds = _measure(llm, args.repeat, value)
+        print(f"{name:>10} {failure_rate:>19.1%} {turns:>10.2f} {seconds:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Throughput scaling benchmark for the model worker pool.
+Runs a fixed batch of concurrent requests through WorkerPool with an increasing number of
+worker processes and reports requests/sec and scaling efficiency relative to one worker.
+
+By default each request is a CPU-bound stand-in for a decode loop so the benchmark runs
+without a model; pass --target src.agents.agent:run to measure the real agent.
+
+Usage: python -m benchmarks.bench_worker_pool [--workers 1 2 4 8] [--requests 32]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from src.models.worker_pool import WorkerPool
+
+
+def simulated_inference(task, config=None):
+    """Burn a fixed amount of single-core CPU, like one decode on a pinned model."""
+    iterations = int((config or {}).get("iterations", 2_000_000))
+    total = 0
+    for i in range(iterations):
+        total += i * i
+    return {"message": task, "checksum": total}
+
+
+async def _drive(pool, requests, message, config):
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.submit(message, config) for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    cpu_count = os.cpu_count() or 1
+    default_workers = sorted({1, 2, 4, 8, cpu_count} & set(range(1, cpu_count + 1)))
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--target", default="benchmarks.bench_worker_pool:simulated_inference")
+    parser.add_argument("--message", default="What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?")
+    parser.add_argument("--iterations", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    config = {"iterations": args.iterations}
+    baseline = None
+    print(f"{'workers':>8} {'seconds':>9} {'req/s':>8} {'speedup':>8} {'efficiency':>11}")
+    for workers in args.workers:
+        warmup = "src.agents.agent:get_agent_instance" if args.target.startswith("src.agents.agent:") else None
+        pool = WorkerPool(workers, args.threads_per_worker, target=args.target, warmup=warmup)
+        pool.start()
+        try:
+            # One warm-up request per worker so model load is not measured
+            asyncio.run(_drive(pool, workers, args.message, config))
+            elapsed = asyncio.run(_drive(pool, args.requests, args.message, config))
+        finally:
+            pool.shutdown()
+        throughput = args.requests / elapsed
+        baseline = baseline or throughput
+        speedup = throughput / baseline
+        print(f"{workers:>8} {elapsed:>9.2f} {throughput:>8.2f} {speedup:>7.2f}x {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
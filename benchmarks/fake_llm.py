@@ -0,0 +1,99 @@
+"""
+Deterministic stand-in for the GGUF chat model, for benchmarks that should run without a model.
+
+The first turn answers with a <tool_call> for get_performance_data whose arguments are picked
+from the performance store vocabulary by substring match on the question; once a tool result
+is in the conversation it answers with a short fixed summary. Output is streamed in fixed-size
+chunks with a configurable prefill delay and per-token delay, so latency numbers reflect a
+model of known speed and everything else is the application's own overhead.
+"""
+
+import json
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel, generate_from_stream
+from langchain_core.messages import AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from src.tools.performance_store import KEY_FIELDS, get_performance_store
+
+FINAL_ANSWER = "以上是查询到的性能配置，吞吐量最高的配置已在结果中给出。"
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that replays a fixed tool-calling conversation at a fixed speed."""
+
+    prefill_latency: float = 0.0
+    token_latency: float = 0.0
+    chars_per_token: int = 4
+    # Large enough that the context budget never trims the scripted conversation
+    n_ctx: int = 8192
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-cpm"
+
+    def bind_tools(self, tools, **kwargs):
+        # Tools are implied by the scripted replies; generation settings (max_tokens, ...) still apply
+        return self.bind(**{key: value for key, value in kwargs.items() if key != "tool_choice"})
+
+    def _arguments(self, question):
+        """Use the key values named in the question and fill the rest from the first matching record."""
+        store = get_performance_store()
+        lowered = question.lower()
+        named = {}
+        for field in KEY_FIELDS:
+            matches = [value for value in store.distinct(field) if value.lower() in lowered]
+            if matches:
+                named[field] = matches[0]
+        rows = store.candidate_rows(**named)
+        record = store.records(rows[:1])[0] if len(rows) else {}
+        return {field: named.get(field, record.get(field, "")) for field in KEY_FIELDS}
+
+    def _reply(self, messages):
+        if any(isinstance(message, ToolMessage) for message in messages):
+            return FINAL_ANSWER
+        call = {"name": "get_performance_data", "arguments": self._arguments(messages[-1].content)}
+        return f"<tool_call>{json.dumps(call, ensure_ascii=False)}</tool_call>"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        text = self._reply(messages)
+        max_tokens = kwargs.get("max_tokens")
+        time.sleep(self.prefill_latency)
+        for index, start in enumerate(range(0, len(text), self.chars_per_token)):
+            if max_tokens is not None and index >= max_tokens:
+                break
+            time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + self.chars_per_token]))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def install_fake_llm(prefill_latency=0.0, token_latency=0.0):
+    """Make get_chat_llm() return a FakeChatModel instead of loading the GGUF model.
+
+    Must be called before the agent instance is first created.
+    """
+    from src.models import agent_model
+
+    llm = FakeChatModel(prefill_latency=prefill_latency, token_latency=token_latency)
+    agent_model._chat_llm_instance = llm
+    return llm
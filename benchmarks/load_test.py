@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the web API.
+Serves app.py in-process with the deterministic fake chat model (benchmarks/fake_llm.py) in place
+of the GGUF model, drives it with concurrent clients and reports p50/p95/p99 latency and
+requests/sec per concurrency level. Results are saved as JSON under benchmarks/results/.
+
+The request mix alternates agent-path questions (the router cannot resolve all three parameters,
+so the fake model is called) with fast-path questions according to --fast-path-ratio. Requests
+carry a unique suffix unless --allow-cache is given, so the result cache does not absorb them.
+
+Usage: python -m benchmarks.load_test [--concurrency 1 4 16] [--requests 200] [--token-latency 0.002]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.fake_llm import install_fake_llm
+from benchmarks.results import percentiles, save_results
+
+AGENT_PATH_QUESTIONS = [
+    "How does Meta/Llama-3-70B-Instruct perform on nvidia/h800?",
+    "Which engine is fastest for Qwen/Qwen3-235B-A22B?",
+    "Show me vllm results on nvidia/h100",
+]
+FAST_PATH_QUESTIONS = [
+    "What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?",
+    "Best config for Qwen/Qwen3-235B-A22B with tensorrt-llm on nvidia/h800",
+]
+
+
+def _messages(requests, fast_path_ratio, allow_cache, tag):
+    messages = []
+    fast_every = round(1 / fast_path_ratio) if fast_path_ratio > 0 else 0
+    for i in range(requests):
+        if fast_every and i % fast_every == 0:
+            message = FAST_PATH_QUESTIONS[i % len(FAST_PATH_QUESTIONS)]
+        else:
+            message = AGENT_PATH_QUESTIONS[i % len(AGENT_PATH_QUESTIONS)]
+        messages.append(message if allow_cache else f"{message} (#{tag}-{i})")
+    return messages
+
+
+async def _client(client, endpoint, queue, latencies, errors):
+    while True:
+        try:
+            message = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        start = time.perf_counter()
+        response = await client.post(endpoint, json={"message": message})
+        if endpoint.endswith("/stream"):
+            # The stream answers 200 up front; failures arrive as error events
+            body = response.text
+            failed = response.status_code != 200 or "event: error" in body
+        else:
+            failed = response.status_code != 200
+        latencies.append(time.perf_counter() - start)
+        if failed:
+            errors[response.status_code] = errors.get(response.status_code, 0) + 1
+
+
+async def _run_level(client, endpoint, concurrency, messages):
+    queue = asyncio.Queue()
+    for message in messages:
+        queue.put_nowait(message)
+    latencies, errors = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(client, endpoint, queue, latencies, errors) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(messages),
+        "seconds": elapsed,
+        "requests_per_second": len(messages) / elapsed,
+        "latency_seconds": percentiles(latencies),
+        "errors": errors,
+    }
+
+
+async def _main(args):
+    install_fake_llm(prefill_latency=args.prefill_latency, token_latency=args.token_latency)
+    # Imported after the fake model is installed so that startup loads it instead of the GGUF model
+    import app as web_app
+
+    await web_app.load_models()
+    if web_app.startup_state["error"]:
+        raise SystemExit(f"Startup failed: {web_app.startup_state['error']}")
+
+    results = []
+    transport = httpx.ASGITransport(app=web_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Warm-up so one-off initialisation (router, indexes) is not measured
+        await client.post(args.endpoint, json={"message": AGENT_PATH_QUESTIONS[0] + " (warm-up)"})
+        for concurrency in args.concurrency:
+            messages = _messages(args.requests, args.fast_path_ratio, args.allow_cache, concurrency)
+            results.append(await _run_level(client, args.endpoint, concurrency, messages))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--endpoint", default="/chat", choices=["/chat", "/chat/stream"])
+    parser.add_argument("--prefill-latency", type=float, default=0.02, help="seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="seconds per generated token")
+    parser.add_argument("--fast-path-ratio", type=float, default=0.25)
+    parser.add_argument("--allow-cache", action="store_true", help="repeat identical requests")
+    args = parser.parse_args()
+
+    results = asyncio.run(_main(args))
+    print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for level in results:
+        latency = level["latency_seconds"]
+        print(f"{level['concurrency']:>8} {level['requests_per_second']:>8.1f} {latency['p50'] * 1000:>8.1f} "
+              f"{latency['p95'] * 1000:>8.1f} {latency['p99'] * 1000:>8.1f} {sum(level['errors'].values()):>7}")
+    path = save_results("load_test", {"parameters": vars(args), "levels": results})
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Helpers for recording benchmark results as JSON so runs can be compared across commits.
+
+Each run is written to benchmarks/results/<name>-<commit>-<timestamp>.json together with the
+commit, host and Python version it was measured on.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import time
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit():
+    """Short hash of the checked-out commit, with a '+dirty' suffix for uncommitted changes."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True,
+                               text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}+dirty" if dirty else commit
+
+
+def percentiles(values, points=(50, 95, 99)):
+    """Nearest-rank percentiles of `values` as {"p50": ..., "p95": ..., ...}."""
+    ordered = sorted(values)
+    if not ordered:
+        return {f"p{point}": 0.0 for point in points}
+    return {f"p{point}": ordered[min(int(point / 100 * len(ordered)), len(ordered) - 1)] for point in points}
+
+
+def save_results(name, results, directory=RESULTS_DIR):
+    """Write a benchmark run to a JSON file and return its path."""
+    os.makedirs(directory, exist_ok=True)
+    commit = git_commit()
+    record = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"platform": platform.platform(), "python": platform.python_version(), "cpu_count": os.cpu_count()},
+        "results": results,
+    }
+    path = os.path.join(directory, f"{name}-{commit}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    return path
@@ -1,21 +1,46 @@
 # 使用 LangChain 标准方法实现的智能体
 from langchain.agents import create_agent
-from src.tools.cpm_tools import get_performance_data
-from src.models.agent_model import llm
+from src.tools.cpm_tools import compare_configs, get_performance_data, get_best_configs
+from src.tools.performance_store import table_records
+from src.models.agent_model import get_chat_llm
+from src.models.prompt_cache import warm_prompt_cache
 from src.utils.prompt_utils import prompt_manager
-from src.utils.config import config_manager
-from src.agents.middleware import tool_call_extractor_middleware
+from src.agents.middleware import (
+    GENERATION_SETTINGS,
+    cancellation_middleware,
+    context_budget_middleware,
+    generation_settings_middleware,
+    terminal_tool_middleware,
+    tool_call_extractor_middleware,
+    tool_metrics_middleware,
+    tool_result_encoding_middleware,
+)
+from src.agents.context_budget import context_budget_stats
+from src.agents.session import capture_kv_state, restore_kv_state, session_store
+from src.agents.tool_result_encoding import encode_tool_result
+from src.agents.router import get_query_router
+from src.agents.tool_call_grammar import apply_tool_call_grammar
+from src.agents.tool_call_parser import new_tool_call_id, tool_call_stats
+from src.models.scheduler import cancel_scope, inference_scheduler
+from src.utils.metrics import AGENT_TURNS, PROMPT_TOKENS, TOOL_LATENCY_SECONDS, observe_seconds
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from contextlib import nullcontext
+import asyncio
+import json
+import logging
 import os
+import threading
 
-# 加载配置
-config_manager.load_all_configs()
-config_manager.merge_with_env()
+logger = logging.getLogger(__name__)
 
 # 加载提示词
 prompt_manager.load_all_prompts()
 
 # 定义工具列表
-tools = [get_performance_data]
+tools = [get_performance_data, get_best_configs, compare_configs]
+
+# 返回性能数据的工具名称
+PERFORMANCE_TOOL_NAMES = {tool.name for tool in tools}
 
 # 加载系统提示词
 def load_system_prompt():
@@ -25,81 +50,233 @@ def load_system_prompt():
         with open(prompt_path, 'r', encoding='utf-8') as f:
             return f.read().strip()
     except Exception as e:
-        print(f"Error loading system prompt: {e}")
+        logger.error(f"Error loading system prompt: {e}")
         # 返回默认提示词作为后备
         return "你是一个性能数据专家。你的任务是帮助用户找到模型、引擎和设备类型的最佳配置。"
 
 # 加载系统提示词
 system_prompt = load_system_prompt()
-llm.bind_tools(tools)
-# 创建智能体
-agent_instance = create_agent(
-    model=llm,
-    tools=tools,
-    system_prompt=system_prompt,
-    middleware=[tool_call_extractor_middleware]
-)
 
-# 智能体运行函数
-async def run(task, config=None):
-    """运行智能体执行指定任务
-    
-    Args:
-        task: 要执行的任务描述
-        config: 可选的配置参数，用于覆盖默认配置
-        
-    Returns:
-        格式化的任务执行结果，包含性能数据和简要概括
-    """
-    # 使用智能体处理任务
-    result = await agent_instance.ainvoke({
-        "messages": [{"role": "user", "content": task}]
-    })
-    
-    # 打印详细信息，便于调试
-    print(f"Result type: {type(result)}")
-    print(f"Result content: {result}")
+# 智能体实例，首次使用时创建（导入本模块不会加载模型）
+_agent_instance = None
+_agent_lock = threading.Lock()
+
+def get_agent_instance():
+    """获取（必要时创建）智能体实例：加载模型、创建智能体并做一次预热生成"""
+    global _agent_instance
     
-    # 提取性能数据和生成简要概括
-    performance_data = []
-    summary_message = ""
+    if _agent_instance is not None:
+        return _agent_instance
     
-    # 检查是否有工具调用和结果
-    if isinstance(result, dict) and 'messages' in result:
-        for i, msg in enumerate(result['messages']):
-            print(f"Message {i} type: {type(msg)}")
-            print(f"Message {i} content: {msg}")
-            
-            # 检查是否是 ToolMessage，提取性能数据
-            if hasattr(msg, 'name') and msg.name == 'get_performance_data':
-                print(f"Found ToolMessage with performance data at index {i}")
-                try:
-                    import json
-                    # 解析工具返回的性能数据
-                    tool_data = json.loads(msg.content)
-                    if isinstance(tool_data, list):
-                        performance_data.extend(tool_data)
-                except Exception as e:
-                    print(f"Error parsing tool data: {e}")
+    with _agent_lock:
+        if _agent_instance is None:
+            llm = get_chat_llm()
+            # 按配置用工具签名生成的语法约束工具调用输出
+            apply_tool_call_grammar(llm, tools)
+            # 创建智能体
+            instance = create_agent(
+                model=llm,
+                tools=tools,
+                system_prompt=system_prompt,
+                middleware=[
+                    cancellation_middleware,
+                    terminal_tool_middleware,
+                    generation_settings_middleware,
+                    context_budget_middleware,
+                    tool_call_extractor_middleware,
+                    tool_metrics_middleware,
+                    tool_result_encoding_middleware,
+                ]
+            )
+            # 预热生成：计算系统提示词 + 工具定义前缀，启用前缀缓存时同时写入缓存
+            warm_prompt_cache(llm, tools, [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": "你好"}
+            ])
+            _agent_instance = instance
+    return _agent_instance
+
+async def aget_agent_instance():
+    """在线程中获取智能体实例，避免模型加载阻塞事件循环"""
+    if _agent_instance is not None:
+        return _agent_instance
+    return await asyncio.to_thread(get_agent_instance)
+
+def is_agent_ready():
+    """智能体（及模型）是否已加载完成"""
+    return _agent_instance is not None
+
+# get_best_configs 优化目标的概括方式：目标 -> (指标名称, 单位)
+OBJECTIVE_SUMMARIES = {
+    "throughput": ("吞吐量", " tokens/sec"),
+    "qps": ("QPS", ""),
+    "ttft": ("首 token 延迟", " ms"),
+    "tpot": ("每 token 延迟", " ms"),
+}
+
+def best_configs_summary(rows, arguments):
+    """概括 get_best_configs 的结果：排名第一的配置（工具已按优化目标排序）的目标指标"""
+    objective = arguments.get("objective", "throughput")
+    label, unit = OBJECTIVE_SUMMARIES.get(objective, OBJECTIVE_SUMMARIES["throughput"])
+    best = rows[0]
+    model_name = best.get('model_name', 'Unknown')
+    engine_name = best.get('engine_name', 'Unknown')
+    device_type = best.get('device_type', 'Unknown')
+    return (f"按{label}找到 {len(rows)} 个关于 {model_name} 在 {device_type} 上使用 {engine_name} 引擎的最佳配置，"
+            f"最优配置的{label}为 {best.get(objective, 0):.2f}{unit}")
+
+def compare_summary(data):
+    """概括 compare_configs 的结果：对比的引擎和设备组合数、吞吐量最高的组合和 Pareto 前沿配置数"""
+    groups = table_records(data["groups"])
+    if not groups:
+        return f"未找到 {data.get('model_name', 'Unknown')} 的性能数据"
+    # 分组已按最大吞吐量降序排列
+    best = groups[0]
+    return (f"对比了 {data.get('model_name', 'Unknown')} 在 {len(groups)} 个引擎和设备组合上的 "
+            f"{sum(group['configs'] for group in groups)} 个性能配置，吞吐量最高的是 {best['engine_name']} 引擎"
+            f"在 {best['device_type']} 上（{best['max_throughput']:.2f} tokens/sec），"
+            f"Pareto 前沿共 {len(data['pareto_frontier']['rows'])} 个配置")
+
+def format_result(performance_data, tool_call=None):
+    """根据性能数据构建 {"message", "performance_data"} 格式的返回结果
     
+    tool_call 是本轮最后一次性能数据工具调用 {"name", "args", "data"}（工具名称、参数和返回值）：
+    get_best_configs 按优化目标概括排名第一的配置，compare_configs 按对比结果概括，
+    其他情况按吞吐量最高的配置概括
+    """
+    name = tool_call["name"] if tool_call is not None else None
+    rows = tool_rows(tool_call["data"]) if tool_call is not None else []
     # 生成简要概括
-    if performance_data:
-        # 基于性能数据生成简要概括
-        first_data = performance_data[0]
-        model_name = first_data.get('model_name', 'Unknown')
-        engine_name = first_data.get('engine_name', 'Unknown')
-        device_type = first_data.get('device_type', 'Unknown')
-        throughput = first_data.get('throughput', 0)
+    if name == get_best_configs.name and rows:
+        summary_message = best_configs_summary(rows, tool_call["args"] or {})
+    elif name == compare_configs.name and isinstance(tool_call["data"], dict) and "groups" in tool_call["data"]:
+        summary_message = compare_summary(tool_call["data"])
+    elif performance_data:
+        # 基于吞吐量最高的配置生成简要概括
+        best_data = max(performance_data, key=lambda item: item.get('throughput', 0))
+        model_name = best_data.get('model_name', 'Unknown')
+        engine_name = best_data.get('engine_name', 'Unknown')
+        device_type = best_data.get('device_type', 'Unknown')
+        throughput = best_data.get('throughput', 0)
         
         summary_message = f"找到 {len(performance_data)} 个关于 {model_name} 在 {device_type} 上使用 {engine_name} 引擎的性能配置，最高吞吐量为 {throughput:.2f} tokens/sec"
     else:
         summary_message = "未找到性能数据"
     
-    # 构建格式化返回结果
-    formatted_result = {
+    return {
         "message": summary_message,
         "performance_data": performance_data
     }
+
+def parse_tool_data(msg):
+    """解析性能数据工具返回的 ToolMessage，得到工具的返回值，解析失败时返回 None"""
+    try:
+        # 回传给模型的内容是紧凑编码，完整数据在 artifact 中；
+        # 返回空列表时 ToolMessage 的内容保持为列表而不是 JSON 字符串
+        if getattr(msg, "artifact", None) is not None:
+            return msg.artifact
+        return msg.content if isinstance(msg.content, list) else json.loads(msg.content)
+    except Exception as e:
+        logger.warning(f"Error parsing tool data: {e}")
+    return None
+
+def tool_rows(tool_data):
+    """性能数据工具的返回值对应的性能数据行列表"""
+    if isinstance(tool_data, list):
+        return tool_data
+    if isinstance(tool_data, dict) and "pareto_frontier" in tool_data:
+        # 对比工具返回紧凑表格，取 Pareto 前沿配置作为性能数据行
+        return [{"model_name": tool_data["model_name"], **record}
+                for record in table_records(tool_data["pareto_frontier"])]
+    return []
+
+def parse_tool_rows(msg):
+    """解析性能数据工具返回的 ToolMessage，得到性能数据行列表"""
+    return tool_rows(parse_tool_data(msg))
+
+def turn_result(tool_calls):
+    """根据本轮的性能数据工具调用列表（见 format_result）生成格式化结果"""
+    performance_data = [row for call in tool_calls for row in tool_rows(call["data"])]
+    return format_result(performance_data, tool_calls[-1] if tool_calls else None)
+
+def fast_path_result(arguments):
+    """用路由得到的参数直接调用性能数据工具并格式化结果"""
+    with observe_seconds(TOOL_LATENCY_SECONDS.labels(tool=get_performance_data.name)):
+        rows = get_performance_data.invoke(arguments)
+    return format_result(rows)
+
+def fast_path_messages(task, arguments, result):
+    """把一次快速路径查询表示为智能体消息（问题、工具调用、工具结果和概括），记入会话历史，
+    使追问时模型能看到之前查询的参数和结果"""
+    rows = result["performance_data"]
+    call_id = new_tool_call_id()
+    return [
+        HumanMessage(content=task),
+        AIMessage(content="", tool_calls=[{"name": get_performance_data.name, "args": arguments, "id": call_id}]),
+        ToolMessage(content=encode_tool_result(rows), artifact=rows, name=get_performance_data.name,
+                    tool_call_id=call_id),
+        AIMessage(content=result["message"]),
+    ]
+
+def try_fast_path(task, session=None):
+    """对能唯一确定工具参数的查询直接调用工具，无法确定时返回 None；给出会话时把这一轮记入会话历史"""
+    arguments = get_query_router().route(task)
+    if arguments is None:
+        return None
+    result = fast_path_result(arguments)
+    if session is not None:
+        # 快速路径不经过模型，KV 快照仍对应之前的历史，追问时作为前缀继续使用
+        session_store.save(session, [*session.messages, *fast_path_messages(task, arguments, result)],
+                           session.kv_state)
+    return result
+
+def record_turns(turns):
+    """记录一次请求的模型调用轮数"""
+    tool_call_stats.record_request(turns)
+    AGENT_TURNS.inc(turns)
+
+def record_prompt_tokens(context):
+    """记录一次请求最后一次模型调用的提示词 token 数（由 ContextBudgetMiddleware 写入运行时上下文）"""
+    usage = context.get("prompt_tokens")
+    if usage is None:
+        return
+    prompt_tokens, uncompacted_prompt_tokens = usage
+    context_budget_stats.record_request(prompt_tokens, uncompacted_prompt_tokens)
+    PROMPT_TOKENS.labels(kind="sent").observe(prompt_tokens)
+    PROMPT_TOKENS.labels(kind="uncompacted").observe(uncompacted_prompt_tokens)
+
+def process_result(result):
+    """后处理智能体的运行结果：记录模型调用轮数，从工具消息中提取性能数据并生成格式化结果"""
+    # 记录本次请求的模型调用轮数
+    if isinstance(result, dict) and 'messages' in result:
+        record_turns(sum(1 for msg in result['messages'] if getattr(msg, 'type', None) == 'ai'))
+    
+    # 调试输出默认关闭：只有启用 DEBUG 日志时才格式化完整的消息内容
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug(f"Result type: {type(result)}")
+    
+    # 提取性能数据工具的调用（名称、参数和返回值），用于生成性能数据和简要概括
+    tool_calls = []
+    
+    # 检查是否有工具调用和结果
+    if isinstance(result, dict) and 'messages' in result:
+        arguments = {}
+        for i, msg in enumerate(result['messages']):
+            if debug:
+                logger.debug(f"Message {i} ({type(msg).__name__}): {msg}")
+            
+            # 记录模型发起的工具调用参数，按 tool_call_id 对应到工具结果
+            for call in getattr(msg, 'tool_calls', None) or []:
+                arguments[call.get('id')] = call.get('args')
+            
+            # 检查是否是 ToolMessage，提取性能数据
+            if hasattr(msg, 'name') and msg.name in PERFORMANCE_TOOL_NAMES:
+                tool_calls.append({"name": msg.name, "args": arguments.get(getattr(msg, 'tool_call_id', None)),
+                                   "data": parse_tool_data(msg)})
+    
+    # 构建格式化返回结果
+    formatted_result = turn_result(tool_calls)
     
     # 处理不同的返回格式
     if isinstance(result, dict):
@@ -117,5 +294,159 @@ async def run(task, config=None):
     # 返回格式化结果作为后备
     return formatted_result
 
+def runtime_context(config):
+    """从请求配置中取出按请求覆盖的生成参数，作为智能体的运行时上下文"""
+    overrides = {key: config[key] for key in GENERATION_SETTINGS if config.get(key) is not None}
+    return {"generation": overrides}
+
+def get_session(config):
+    """请求配置中有 session_id 时返回对应的会话（不存在时创建），否则返回 None"""
+    session_id = config.get("session_id")
+    return session_store.get(session_id) if session_id else None
+
+async def begin_session_turn(session, task):
+    """开始会话的一轮：载入会话的 KV 快照（须在推理槽位中调用），返回本轮的输入消息"""
+    if session is None:
+        return [HumanMessage(content=task)]
+    # 复制 KV 状态是阻塞操作，在线程中执行，不阻塞事件循环
+    await asyncio.to_thread(restore_kv_state, get_chat_llm(), session.kv_state)
+    return [*session.messages, HumanMessage(content=task)]
+
+async def end_session_turn(session, messages):
+    """结束会话的一轮：保存完整的对话历史和当前的 KV 快照（须在推理槽位中调用）"""
+    if session is None:
+        return
+    kv_state = None
+    if session_store.save_kv_state:
+        kv_state = await asyncio.to_thread(capture_kv_state, get_chat_llm())
+    session_store.save(session, messages, kv_state)
+
+# 智能体运行函数
+async def run(task, config=None):
+    """运行智能体执行指定任务
+    
+    Args:
+        task: 要执行的任务描述
+        config: 可选的配置参数，用于覆盖默认配置，如 {"timeout": 30}（请求截止时间，秒），
+            {"fast_path": False} 表示调用方已确认无法走快速路径；max_tokens、temperature、
+            top_p、stop 在本次请求的每次模型调用时覆盖配置中的默认生成参数；
+            {"session_id": "..."} 在该会话的历史上继续对话，同一会话的请求依次执行
+        
+    Returns:
+        格式化的任务执行结果，包含本轮的性能数据和简要概括
+    """
+    config = config or {}
+    session = get_session(config)
+    async with session.lock if session is not None else nullcontext():
+        return await _run_turn(task, config, session)
+
+async def _run_turn(task, config, session):
+    # 参数明确的查询走快速路径，不调用模型
+    if config.get("fast_path", True):
+        fast_result = try_fast_path(task, session)
+        if fast_result is not None:
+            return fast_result
+    
+    agent_instance = await aget_agent_instance()
+    context = runtime_context(config)
+    history_length = len(session.messages) if session is not None else 0
+    
+    async def invoke():
+        messages = await begin_session_turn(session, task)
+        result = await agent_instance.ainvoke({"messages": messages}, context=context)
+        await end_session_turn(session, result["messages"])
+        return result
+    
+    # 在调度器分配的推理槽位中使用智能体处理任务；截止时间和调用方的取消（客户端断开）
+    # 通过取消令牌传到模型调用，在下一个 token 前停止生成
+    result = await inference_scheduler.run(invoke, timeout=config.get("timeout"))
+    record_prompt_tokens(context)
+    
+    # 只处理本轮新增的消息
+    return process_result({**result, "messages": result["messages"][history_length:]})
+
+# 流式运行函数
+async def stream(task, config=None):
+    """以事件流的形式运行智能体，边执行边产出进度事件
+    
+    Args:
+        task: 要执行的任务描述
+        config: 可选的配置参数，与 run() 相同，如 {"timeout": 30}（请求截止时间，秒）、
+            {"max_tokens": 256}（生成参数覆盖）、{"session_id": "..."}（会话）
+        
+    Yields:
+        {"event", "data"} 格式的事件：token（模型生成的 token）、tool_start（工具开始调用）、
+        tool_result（工具返回的性能数据行）以及最后的 result（与 run() 相同格式的结果）
+    """
+    config = config or {}
+    session = get_session(config)
+    async with session.lock if session is not None else nullcontext():
+        async for item in _stream_turn(task, config, session):
+            yield item
+
+async def _stream_turn(task, config, session):
+    # 参数明确的查询走快速路径，直接产出工具结果
+    if config.get("fast_path", True):
+        fast_result = try_fast_path(task, session)
+        if fast_result is not None:
+            yield {"event": "tool_result", "data": {"name": get_performance_data.name, "rows": fast_result["performance_data"]}}
+            yield {"event": "result", "data": fast_result}
+            return
+    
+    agent_instance = await aget_agent_instance()
+    context = runtime_context(config)
+    tool_calls = []
+    turns = 0
+    cancel_token = inference_scheduler.cancel_token(config.get("timeout"))
+    async with inference_scheduler.slot(cancel_token.deadline):
+        with cancel_scope(cancel_token):
+            try:
+                messages = await begin_session_turn(session, task)
+                final_state = None
+                async for event in agent_instance.astream_events(
+                    {"messages": messages},
+                    version="v2",
+                    context=context
+                ):
+                    cancel_token.raise_if_cancelled()
+                    if event["event"] == "on_chat_model_start":
+                        turns += 1
+                    elif event["event"] == "on_chain_end" and not event.get("parent_ids"):
+                        # 根节点结束事件携带最终状态（完整的消息列表）
+                        final_state = event["data"].get("output")
+                    for item in _stream_event(event, tool_calls):
+                        yield item
+                if isinstance(final_state, dict) and "messages" in final_state:
+                    await end_session_turn(session, final_state["messages"])
+            except (asyncio.CancelledError, GeneratorExit):
+                # 客户端断开连接时事件流被取消或关闭，停止模型生成，生成停止后再释放槽位
+                cancel_token.cancel("disconnected")
+                await inference_scheduler.release_when_idle(cancel_token)
+                raise
+            except Exception:
+                await inference_scheduler.release_when_idle(cancel_token)
+                raise
+    record_turns(turns)
+    record_prompt_tokens(context)
+    
+    yield {"event": "result", "data": turn_result(tool_calls)}
+
+def _stream_event(event, tool_calls):
+    """把 astream_events 事件转换为对外的进度事件"""
+    kind = event["event"]
+    if kind == "on_chat_model_stream":
+        content = event["data"]["chunk"].content
+        if content:
+            yield {"event": "token", "data": {"content": content}}
+    elif kind == "on_tool_start":
+        yield {"event": "tool_start", "data": {"name": event["name"], "arguments": event["data"].get("input")}}
+    elif kind == "on_tool_end":
+        rows = []
+        if event["name"] in PERFORMANCE_TOOL_NAMES:
+            data = parse_tool_data(event["data"]["output"])
+            tool_calls.append({"name": event["name"], "args": event["data"].get("input"), "data": data})
+            rows = tool_rows(data)
+        yield {"event": "tool_result", "data": {"name": event["name"], "rows": rows}}
+
 # 全局导出
 agent = run
\ No newline at end of file
@@ -0,0 +1,190 @@
+# 上下文预算：统计每次模型调用的提示词 token 数，超出上下文窗口时裁剪工具结果和历史消息
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agents.tool_result_encoding import encode_tool_result
+
+# 聊天模板为每条消息增加的 token 数（角色标记等）的估计值
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class ContextBudgetStats:
+    """提示词 token 计数：实际发送的 token 数，以及工具结果不做紧凑编码时的 token 数"""
+
+    def __init__(self):
+        self.model_calls = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.uncompacted_prompt_tokens = 0
+        self.truncated_tool_results = 0
+        self.dropped_messages = 0
+        self.over_budget = 0
+
+    def record_request(self, prompt_tokens, uncompacted_prompt_tokens):
+        """记录一次请求最后一次模型调用的提示词 token 数（包含本次请求的全部工具结果）"""
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.uncompacted_prompt_tokens += uncompacted_prompt_tokens
+
+    def as_dict(self):
+        return {
+            "model_calls": self.model_calls,
+            "requests": self.requests,
+            "prompt_tokens_per_request": self.prompt_tokens / self.requests if self.requests else 0.0,
+            "uncompacted_prompt_tokens_per_request":
+                self.uncompacted_prompt_tokens / self.requests if self.requests else 0.0,
+            "prompt_token_reduction":
+                1 - self.prompt_tokens / self.uncompacted_prompt_tokens if self.uncompacted_prompt_tokens else 0.0,
+            "truncated_tool_results": self.truncated_tool_results,
+            "dropped_messages": self.dropped_messages,
+            "over_budget": self.over_budget,
+        }
+
+
+context_budget_stats = ContextBudgetStats()
+
+
+def estimate_tokens(text):
+    """没有分词器时估计 token 数：ASCII 字符约 4 个一个 token，其他字符（主要是中文，UTF-8 编码 3 字节）
+    约一个字符一个 token"""
+    non_ascii = (len(text.encode("utf-8")) - len(text)) // 2
+    return (len(text) - non_ascii + 3) // 4 + non_ascii
+
+
+def make_token_counter(model):
+    """返回统计文本 token 数的函数：llama.cpp 模型用它自己的分词器，其他模型用 estimate_tokens 估计"""
+    client = getattr(model, "client", None)
+    if client is not None and hasattr(client, "tokenize"):
+        return lambda text: len(client.tokenize(text.encode("utf-8"), add_bos=False, special=True)) if text else 0
+    return estimate_tokens
+
+
+def message_text(message):
+    """消息中会进入提示词的文本：内容和工具调用"""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        content += json.dumps([{"name": call["name"], "arguments": call["args"]} for call in message.tool_calls],
+                              ensure_ascii=False)
+    return content
+
+
+# 工具定义文本的缓存：工具名称元组 -> JSON 文本
+_tool_schema_text = {}
+
+
+def tools_text(tools):
+    """工具定义（会随请求发送给模型）的 JSON 文本"""
+    key = tuple(getattr(tool, "name", None) or json.dumps(tool, sort_keys=True, default=str) for tool in tools)
+    if key not in _tool_schema_text:
+        _tool_schema_text[key] = json.dumps([convert_to_openai_tool(tool) for tool in tools], ensure_ascii=False)
+    return _tool_schema_text[key]
+
+
+def _units(messages):
+    """把消息切分为可整体删除的单元：一条用户消息，或一条模型消息及其后的工具结果"""
+    units = []
+    for index, message in enumerate(messages):
+        if isinstance(message, ToolMessage) and units:
+            units[-1].append(index)
+        else:
+            units.append([index])
+    return units
+
+
+class ContextBudget:
+    """把一次模型调用的提示词控制在上下文窗口内
+
+    上下文窗口为 n_ctx，其中为生成保留 min(max_tokens, reserve_tokens) 个 token。
+    超出时依次：1) 从最早的工具结果开始，用 artifact 中的完整数据以更少的行数重新编码；
+    2) 从最早的消息开始整体删除历史（最后一条用户消息和最新一轮模型输出及工具结果始终保留）。
+    """
+
+    def __init__(self, n_ctx, count_tokens, reserve_tokens=256, max_rows=20, min_rows=1, precision=2,
+                 fixed_tokens=None):
+        self.n_ctx = n_ctx
+        self.count_tokens = count_tokens
+        self.fixed_tokens = fixed_tokens
+        self.reserve_tokens = reserve_tokens
+        self.max_rows = max_rows
+        self.min_rows = min_rows
+        self.precision = precision
+
+    def limit(self, max_tokens=None):
+        """提示词可用的 token 数"""
+        reserve = min(max_tokens, self.reserve_tokens) if max_tokens else self.reserve_tokens
+        return self.n_ctx - reserve
+
+    def message_tokens(self, message):
+        return self.count_tokens(message_text(message)) + MESSAGE_OVERHEAD_TOKENS
+
+    def uncompacted_tokens(self, message):
+        """工具结果按完整 JSON 发送时该消息的 token 数"""
+        if isinstance(message, ToolMessage) and message.artifact is not None:
+            return self.count_tokens(json.dumps(message.artifact, ensure_ascii=False)) + MESSAGE_OVERHEAD_TOKENS
+        return self.message_tokens(message)
+
+    def fit(self, fixed_text, messages, max_tokens=None):
+        """裁剪消息使提示词不超过预算
+
+        Args:
+            fixed_text: 不可裁剪的部分（系统提示词和工具定义），构造时给出 fixed_tokens 则不再统计
+            messages: 对话消息
+            max_tokens: 本次调用的生成 token 上限
+
+        Returns:
+            (messages, report)：裁剪后的消息列表，以及 prompt_tokens、uncompacted_prompt_tokens、
+            truncated_tool_results、dropped_messages 和 over_budget（裁剪后仍超出预算）
+        """
+        limit = self.limit(max_tokens)
+        fixed = self.fixed_tokens if self.fixed_tokens is not None else self.count_tokens(fixed_text)
+        messages = list(messages)
+        sizes = [self.message_tokens(message) for message in messages]
+        report = {
+            "uncompacted_prompt_tokens": fixed + sum(self.uncompacted_tokens(message) for message in messages),
+            "truncated_tool_results": 0,
+            "dropped_messages": 0,
+        }
+        total = fixed + sum(sizes)
+
+        # 1) 工具结果减少行数重新编码，从最早的开始
+        for index, message in enumerate(messages):
+            if total <= limit:
+                break
+            if not isinstance(message, ToolMessage) or message.artifact is None:
+                continue
+            rows = self.max_rows
+            truncated = False
+            while total > limit and rows > self.min_rows:
+                rows = max(rows // 2, self.min_rows)
+                content = encode_tool_result(message.artifact, max_rows=rows, precision=self.precision)
+                candidate = message.model_copy(update={"content": content})
+                size = self.message_tokens(candidate)
+                if size < sizes[index]:
+                    total += size - sizes[index]
+                    sizes[index] = size
+                    messages[index] = candidate
+                    truncated = True
+            report["truncated_tool_results"] += truncated
+
+        # 2) 从最早的消息开始整体删除历史
+        if total > limit:
+            units = _units(messages)
+            last_human = max((i for i, unit in enumerate(units) if isinstance(messages[unit[0]], HumanMessage)),
+                             default=len(units) - 1)
+            protected = {last_human, len(units) - 1}
+            dropped = set()
+            for i, unit in enumerate(units):
+                if total <= limit:
+                    break
+                if i in protected:
+                    continue
+                dropped.update(unit)
+                total -= sum(sizes[index] for index in unit)
+            messages = [message for index, message in enumerate(messages) if index not in dropped]
+            report["dropped_messages"] = len(dropped)
+
+        report["prompt_tokens"] = total
+        report["over_budget"] = total > limit
+        return messages, report
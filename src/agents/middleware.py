@@ -1,11 +1,21 @@
 # 智能体中间件模块
-from langchain.agents.middleware import after_model
-from langchain.agents.middleware import AgentState
+from langchain.agents.middleware import after_model, before_model
+from langchain.agents.middleware import AgentMiddleware, AgentState
 from langgraph.runtime import Runtime
-from langchain_core.messages import AIMessage
-import re
-import json
+from langchain_core.messages import AIMessage, ToolMessage
+from src.agents.context_budget import ContextBudget, context_budget_stats, make_token_counter, tools_text
+from src.agents.tool_call_parser import TOOL_CALL_OPEN, parse_tool_calls
+from src.agents.tool_result_encoding import decode_tool_content, encode_tool_result
+from src.models.scheduler import raise_if_cancelled
+from src.utils.config import config_manager
+from src.utils.metrics import MIDDLEWARE_PARSE_SECONDS, TOOL_CALL_FAILURES, TOOL_LATENCY_SECONDS, observe_seconds
 from typing import Any
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 可按请求覆盖的生成参数
+GENERATION_SETTINGS = ("max_tokens", "temperature", "top_p", "stop")
 
 @after_model
 def tool_call_extractor_middleware(state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
@@ -30,48 +40,232 @@ def tool_call_extractor_middleware(state: AgentState, runtime: Runtime) -> dict[
         return None
     
     # 检查消息内容中是否包含 tool_call 标签
-    if not hasattr(last_message, 'content') or '<tool_call>' not in last_message.content:
+    if not hasattr(last_message, 'content') or TOOL_CALL_OPEN not in last_message.content:
         return None
     
-    # 提取 tool_call 标签中的内容
-    tool_call_match = re.search(r'<tool_call>(.*?)</tool_call>', last_message.content, re.DOTALL)
-    if not tool_call_match:
+    # 解析全部 tool_call 块（一轮中可以有多个工具调用，工具节点会并发执行）
+    with observe_seconds(MIDDLEWARE_PARSE_SECONDS):
+        tool_calls, cleaned_content, errors = parse_tool_calls(last_message.content)
+    if errors:
+        TOOL_CALL_FAILURES.labels(stage="parse").inc(len(errors))
+    for error in errors:
+        logger.warning(error)
+    if not tool_calls:
         return None
     
-    tool_call_content = tool_call_match.group(1).strip()
+    # 更新消息的 tool_calls 字段，并从内容中移除 tool_call 标签
+    last_message.tool_calls = tool_calls
+    last_message.content = cleaned_content
     
-    try:
-        # 解析工具调用 JSON
-        tool_call_data = json.loads(tool_call_content)
-        
-        # 检查工具调用格式是否正确
-        if 'name' not in tool_call_data or 'arguments' not in tool_call_data:
-            return None
-        
-        # 创建标准的工具调用格式
-        import time
-        tool_call_id = f"tool_call_{int(time.time() * 1000)}"
-        tool_call = {
-            'name': tool_call_data['name'],
-            'args': tool_call_data['arguments'],
-            'id': tool_call_id
-        }
-        
-        # 更新消息的 tool_calls 字段
-        last_message.tool_calls = [tool_call]
-        
-        # 从内容中移除 tool_call 标签
-        cleaned_content = re.sub(r'<tool_call>.*?</tool_call>', '', last_message.content, flags=re.DOTALL)
-        last_message.content = cleaned_content.strip()
-        
-        # 返回更新后的状态
-        return {
-            'messages': state['messages']
-        }
+    # 返回更新后的状态
+    return {
+        'messages': state['messages']
+    }
+
+
+def _tool_result_data(message):
+    """工具消息对应的工具返回值：紧凑编码时在 artifact 中，否则解析内容"""
+    if message.artifact is not None:
+        return message.artifact
+    return decode_tool_content(message.content)
+
+
+def is_terminal_result(message, terminal_tools):
+    """工具结果是否可以直接作为最终结果：工具在 terminal_tools 中且调用成功（名称有歧义时返回的
+    error/suggestions 需要模型根据建议重新调用）"""
+    if not terminal_tools.get(message.name, False) or message.status == "error":
+        return False
+    data = _tool_result_data(message)
+    return not (isinstance(data, dict) and "error" in data)
+
+
+@before_model(can_jump_to=["end"])
+def terminal_tool_middleware(state: AgentState, runtime: Runtime) -> dict[str, Any] | None:
+    """工具终止模式：上一轮调用的工具都在 agent.terminal_tools 中且都成功返回时直接结束智能体循环，
+    不再调用模型概括工具结果（run() 根据工具返回的数据生成结果）
+    
+    Args:
+        state: 智能体状态，包含消息历史
+        runtime: 运行时对象
         
-    except json.JSONDecodeError as e:
-        print(f"解析工具调用 JSON 失败: {e}")
-        return None
-    except Exception as e:
-        print(f"处理工具调用时出错: {e}")
+    Returns:
+        {"jump_to": "end"} 结束循环，或 None 继续调用模型
+    """
+    # 取出最后一条模型消息之后的工具结果
+    results = []
+    for message in reversed(state.get('messages', [])):
+        if not isinstance(message, ToolMessage):
+            break
+        results.append(message)
+    if not results:
         return None
+    
+    terminal_tools = config_manager.snapshot().get("agent.terminal_tools", {}) or {}
+    if all(is_terminal_result(message, terminal_tools) for message in results):
+        return {"jump_to": "end"}
+    return None
+
+
+class CancellationMiddleware(AgentMiddleware):
+    """请求被取消（客户端断开）或超过截止时间时，在下一次模型调用或工具调用之前结束智能体循环
+    （正在进行的模型调用由 ToolCallAwareChatLlamaCpp 在下一个 token 前停止）"""
+    
+    def wrap_model_call(self, request, handler):
+        raise_if_cancelled()
+        return handler(request)
+    
+    async def awrap_model_call(self, request, handler):
+        raise_if_cancelled()
+        return await handler(request)
+    
+    def wrap_tool_call(self, request, handler):
+        raise_if_cancelled()
+        return handler(request)
+    
+    async def awrap_tool_call(self, request, handler):
+        raise_if_cancelled()
+        return await handler(request)
+
+
+cancellation_middleware = CancellationMiddleware()
+
+
+class ToolMetricsMiddleware(AgentMiddleware):
+    """记录每次工具调用的耗时和执行失败次数"""
+    
+    def wrap_tool_call(self, request, handler):
+        with observe_seconds(TOOL_LATENCY_SECONDS.labels(tool=request.tool_call["name"])):
+            return self._record(handler(request))
+    
+    async def awrap_tool_call(self, request, handler):
+        with observe_seconds(TOOL_LATENCY_SECONDS.labels(tool=request.tool_call["name"])):
+            return self._record(await handler(request))
+    
+    @staticmethod
+    def _record(response):
+        # 工具异常被工具节点转换为 status="error" 的 ToolMessage
+        if getattr(response, "status", None) == "error":
+            TOOL_CALL_FAILURES.labels(stage="execution").inc()
+        return response
+
+
+tool_metrics_middleware = ToolMetricsMiddleware()
+
+
+def generation_defaults(snapshot):
+    """从配置快照读取默认生成参数，max_tokens 未配置时使用 max_length"""
+    params = snapshot.get("model.params", {}) or {}
+    defaults = {
+        "max_tokens": params.get("max_tokens", params.get("max_length")),
+        "temperature": params.get("temperature"),
+        "top_p": params.get("top_p"),
+    }
+    return {key: value for key, value in defaults.items() if value is not None}
+
+
+class GenerationSettingsMiddleware(AgentMiddleware):
+    """在每次模型调用时设置生成参数：默认值取自当前配置快照（配置热加载后立即生效），
+    再用运行时上下文中的 {"generation": {...}} 按请求覆盖。参数在调用时传给模型，
+    不需要重新加载模型。"""
+    
+    def wrap_model_call(self, request, handler):
+        return handler(self._apply(request))
+    
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._apply(request))
+    
+    @staticmethod
+    def _apply(request):
+        settings = generation_defaults(config_manager.snapshot())
+        context = getattr(request.runtime, "context", None)
+        if isinstance(context, dict):
+            overrides = context.get("generation") or {}
+            settings.update({key: value for key, value in overrides.items() if key in GENERATION_SETTINGS})
+        return request.override(model_settings={**request.model_settings, **settings})
+
+
+generation_settings_middleware = GenerationSettingsMiddleware()
+
+
+class ToolResultEncodingMiddleware(AgentMiddleware):
+    """把工具返回的数据编码为紧凑表格再交给模型（见 tool_result_encoding），
+    完整数据保存在 ToolMessage.artifact 中供结果后处理使用"""
+    
+    def wrap_tool_call(self, request, handler):
+        return self._encode(handler(request))
+    
+    async def awrap_tool_call(self, request, handler):
+        return self._encode(await handler(request))
+    
+    @staticmethod
+    def _encode(response):
+        config = config_manager.snapshot().get("context.tool_result", {}) or {}
+        if not config.get("compact", True) or not isinstance(response, ToolMessage):
+            return response
+        if response.status == "error" or response.artifact is not None:
+            return response
+        data = decode_tool_content(response.content)
+        if data is None:
+            return response
+        content = encode_tool_result(data, max_rows=int(config.get("max_rows", 20)),
+                                     precision=int(config.get("precision", 2)))
+        return response.model_copy(update={"content": content, "artifact": data})
+
+
+class ContextBudgetMiddleware(AgentMiddleware):
+    """统计每次模型调用的提示词 token 数，超出上下文窗口时裁剪工具结果和历史消息（见 ContextBudget）。
+    运行时上下文是字典时，把最后一次调用的 (prompt_tokens, uncompacted_prompt_tokens) 写入
+    其中的 "prompt_tokens"，供请求结束后统计。"""
+    
+    def __init__(self):
+        super().__init__()
+        # 系统提示词和工具定义不变，缓存最近一次统计的 ((模型, 文本), token 数)
+        self._fixed_tokens = (None, 0)
+    
+    def wrap_model_call(self, request, handler):
+        return handler(self._fit(request))
+    
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._fit(request))
+    
+    def _count_fixed(self, model, text, count_tokens):
+        key = (id(model), text)
+        if self._fixed_tokens[0] != key:
+            self._fixed_tokens = (key, count_tokens(text))
+        return self._fixed_tokens[1]
+    
+    def _fit(self, request):
+        snapshot = config_manager.snapshot()
+        config = snapshot.get("context.budget", {}) or {}
+        if not config.get("enabled", True):
+            return request
+        tool_result = snapshot.get("context.tool_result", {}) or {}
+        count_tokens = make_token_counter(request.model)
+        system_text = request.system_message.content if request.system_message is not None else ""
+        fixed_text = system_text + tools_text(request.tools)
+        budget = ContextBudget(
+            n_ctx=getattr(request.model, "n_ctx", None) or int(snapshot.get("model.params.max_length", 2048)),
+            count_tokens=count_tokens,
+            reserve_tokens=int(config.get("reserve_tokens", 256)),
+            max_rows=int(tool_result.get("max_rows", 20)),
+            precision=int(tool_result.get("precision", 2)),
+            fixed_tokens=self._count_fixed(request.model, fixed_text, count_tokens),
+        )
+        messages, report = budget.fit(fixed_text, request.messages, request.model_settings.get("max_tokens"))
+        
+        context_budget_stats.model_calls += 1
+        context_budget_stats.truncated_tool_results += report["truncated_tool_results"]
+        context_budget_stats.dropped_messages += report["dropped_messages"]
+        if report["over_budget"]:
+            context_budget_stats.over_budget += 1
+            logger.warning(f"Prompt of {report['prompt_tokens']} tokens exceeds the context budget after trimming")
+        context = getattr(request.runtime, "context", None)
+        if isinstance(context, dict):
+            context["prompt_tokens"] = (report["prompt_tokens"], report["uncompacted_prompt_tokens"])
+        if len(messages) == len(request.messages) and not report["truncated_tool_results"]:
+            return request
+        return request.override(messages=messages)
+
+
+tool_result_encoding_middleware = ToolResultEncodingMiddleware()
+context_budget_middleware = ContextBudgetMiddleware()
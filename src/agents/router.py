@@ -0,0 +1,90 @@
+# 智能体前置路由：对格式规范的查询直接调用工具，跳过模型推理
+import re
+
+from src.tools.performance_store import KEY_FIELDS, get_performance_store
+
+
+class QueryRouter:
+    """基于已知词表的实体匹配器。
+
+    用性能数据中出现过的 model_name / engine_name / device_type 取值
+    预编译大小写不敏感的正则；三个字段各自恰好匹配到一个取值时视为命中，
+    否则（缺失或有歧义）交给智能体处理。
+    """
+
+    # 名称中可能出现的字符，用于判断匹配边界
+    _NAME_CHARS = r"\w./-"
+
+    def __init__(self, vocabularies):
+        self._patterns = {}
+        self._canonical = {}
+        for field in KEY_FIELDS:
+            values = [value for value in vocabularies.get(field, []) if value]
+            self._canonical[field] = {value.lower(): value for value in values}
+            if not values:
+                self._patterns[field] = None
+                continue
+            # 长名称优先，避免短名称抢先匹配
+            alternation = "|".join(re.escape(value) for value in sorted(values, key=len, reverse=True))
+            self._patterns[field] = re.compile(
+                rf"(?<![{self._NAME_CHARS}])({alternation})(?![{self._NAME_CHARS}])",
+                re.IGNORECASE,
+            )
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_store(cls, store):
+        """用性能数据存储的词表构建路由器"""
+        return cls({field: store.distinct(field) for field in KEY_FIELDS})
+
+    def extract(self, text):
+        """提取工具参数，无法唯一确定时返回 None"""
+        if not text:
+            return None
+        arguments = {}
+        for field in KEY_FIELDS:
+            pattern = self._patterns[field]
+            if pattern is None:
+                return None
+            matches = {self._canonical[field][match.lower()] for match in pattern.findall(text)}
+            if len(matches) != 1:
+                return None
+            arguments[field] = matches.pop()
+        return arguments
+
+    def route(self, text):
+        """提取参数并记录命中/未命中次数"""
+        arguments = self.extract(text)
+        if arguments is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return arguments
+
+    def stats(self):
+        """返回命中统计"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+# 全局路由器，性能数据存储被替换时重建（保留计数）
+_router_instance = None
+_router_store = None
+
+
+def get_query_router():
+    """获取与当前性能数据存储匹配的路由器"""
+    global _router_instance, _router_store
+
+    store = get_performance_store()
+    if _router_instance is None or _router_store is not store:
+        router = QueryRouter.from_store(store)
+        if _router_instance is not None:
+            router.hits, router.misses = _router_instance.hits, _router_instance.misses
+        _router_instance, _router_store = router, store
+    return _router_instance
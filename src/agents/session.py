@@ -0,0 +1,141 @@
+# 多轮会话：按 session_id 保存对话历史和 llama.cpp KV 状态快照，追问时只需预填充新的一轮
+import asyncio
+import logging
+import sys
+
+from src.utils.cache import TTLCache
+from src.utils.config import config_manager
+
+logger = logging.getLogger(__name__)
+
+
+def kv_state_bytes(state):
+    """KV 状态快照占用的内存：llama.cpp 状态数据加上 token 和 logits 数组"""
+    if state is None:
+        return 0
+    size = int(getattr(state, "llama_state_size", 0) or 0)
+    for name in ("input_ids", "scores"):
+        size += int(getattr(getattr(state, name, None), "nbytes", 0) or 0)
+    return size
+
+
+def _message_bytes(message):
+    content = message.content
+    size = sys.getsizeof(content) if isinstance(content, str) else sum(sys.getsizeof(str(part)) for part in content)
+    artifact = getattr(message, "artifact", None)
+    if artifact is not None:
+        size += sys.getsizeof(str(artifact))
+    return size + sys.getsizeof(str(getattr(message, "tool_calls", "") or ""))
+
+
+class Session:
+    """一个会话的状态：对话历史、最后一次模型调用后的 KV 状态快照和串行化同一会话请求的锁"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.messages = []
+        self.kv_state = None
+        self.turns = 0
+        self.lock = asyncio.Lock()
+
+    def memory_bytes(self):
+        """会话占用的内存估计，KV 状态快照通常占绝大部分"""
+        return sum(_message_bytes(message) for message in self.messages) + kv_state_bytes(self.kv_state)
+
+
+class SessionStore:
+    """有界的会话存储：LRU 淘汰、空闲超时（TTL）和按会话内存（历史 + KV 快照）计算的总内存上限，
+    正在执行一轮的会话不被淘汰"""
+
+    def __init__(self, max_sessions=256, ttl=1800.0, max_memory_bytes=None, max_history_messages=40,
+                 save_kv_state=True):
+        # 正在执行一轮的会话（锁被持有）不被淘汰或过期，否则下一个请求会得到新会话和新锁，
+        # 与正在执行的一轮同时修改同一会话的历史
+        self._sessions = TTLCache(max_size=max_sessions, ttl=ttl, max_memory_bytes=max_memory_bytes,
+                                  sizeof=Session.memory_bytes, pinned=lambda session: session.lock.locked())
+        self.max_history_messages = max_history_messages
+        self.save_kv_state = save_kv_state
+        self.kv_restores = 0
+        self.kv_saves = 0
+
+    @classmethod
+    def from_config(cls):
+        """按 session 配置创建会话存储"""
+        config = config_manager.get("session", {}) or {}
+        return cls(
+            max_sessions=int(config.get("max_sessions", 256)),
+            ttl=float(config.get("ttl", 1800)),
+            max_memory_bytes=int(float(config.get("capacity_mb", 512)) * 1024 * 1024),
+            max_history_messages=int(config.get("max_history_messages", 40)),
+            save_kv_state=bool(config.get("save_kv_state", True)),
+        )
+
+    def get(self, session_id):
+        """获取会话，不存在或已过期时创建新会话"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = Session(session_id)
+            self._sessions.set(session_id, session)
+        return session
+
+    def save(self, session, messages, kv_state=None):
+        """保存一轮对话后的历史和 KV 快照，并按新的内存占用重新计入存储"""
+        # 只保留最近的消息，从一条用户消息开始，避免以孤立的工具结果开头
+        if len(messages) > self.max_history_messages:
+            messages = messages[-self.max_history_messages:]
+            start = next((i for i, message in enumerate(messages) if message.type == "human"), len(messages))
+            messages = messages[start:]
+        session.messages = list(messages)
+        session.kv_state = kv_state
+        session.turns += 1
+        self._sessions.set(session.session_id, session)
+
+    def delete(self, session_id):
+        """删除会话"""
+        return self._sessions.pop(session_id) is not None
+
+    def stats(self):
+        return {**self._sessions.stats(), "kv_restores": self.kv_restores, "kv_saves": self.kv_saves}
+
+
+session_store = SessionStore.from_config()
+
+
+def _llama_client(llm):
+    client = getattr(llm, "client", None)
+    return client if client is not None and hasattr(client, "save_state") else None
+
+
+def capture_kv_state(llm):
+    """保存 llama.cpp 上下文的 KV 状态快照，模型不支持时返回 None
+
+    llama.cpp 总会重新计算提示词的最后一个 token，恢复后不会用到已保存的 logits，
+    所以快照中只保留一行（可广播回原形状的）logits，避免每个快照复制整个 logits 缓冲区。
+    """
+    client = _llama_client(llm)
+    if client is None:
+        return None
+    try:
+        state = client.save_state()
+        scores = getattr(state, "scores", None)
+        if scores is not None and getattr(scores, "ndim", 0) == 2 and len(scores) > 1:
+            state.scores = scores[:1] * 0
+    except Exception as e:
+        logger.warning(f"Could not save the session KV state: {e}")
+        return None
+    session_store.kv_saves += 1
+    return state
+
+
+def restore_kv_state(llm, state):
+    """把会话的 KV 状态快照载入 llama.cpp 上下文，之后的提示词只需预填充与快照不同的部分"""
+    client = _llama_client(llm)
+    if client is None or state is None:
+        return False
+    try:
+        client.load_state(state)
+    except Exception as e:
+        logger.warning(f"Could not restore the session KV state: {e}")
+        return False
+    session_store.kv_restores += 1
+    return True
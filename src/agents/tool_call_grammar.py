@@ -0,0 +1,126 @@
+# 工具调用语法约束：根据已注册工具的参数签名生成 GBNF 语法，约束 llama.cpp 采样
+import json
+import re
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.agents.tool_call_parser import TOOL_CALL_CLOSE, TOOL_CALL_OPEN
+from src.utils.config import config_manager
+
+# JSON 基本类型的语法规则
+_PRIMITIVE_RULES = {
+    "string": r'"\"" ( [^"\\\x00-\x1f] | "\\" ["\\/bfnrt] )* "\""',
+    "integer": r'"-"? [0-9]+',
+    "number": r'"-"? [0-9]+ ("." [0-9]+)? ([eE] [-+]? [0-9]+)?',
+    "boolean": r'"true" | "false"',
+    "null": r'"null"',
+}
+
+
+def _literal(text):
+    """把字符串编码为 GBNF 字面量"""
+    return json.dumps(text, ensure_ascii=False)
+
+
+def _json_literal(value):
+    """把 JSON 值（如带引号的工具名）编码为 GBNF 字面量"""
+    return _literal(json.dumps(value, ensure_ascii=False))
+
+
+def _rule_name(text):
+    return re.sub(r"[^a-zA-Z0-9]+", "-", text).strip("-").lower()
+
+
+def _value_rule(schema):
+    """返回参数取值的语法表达式"""
+    if "enum" in schema:
+        return "( " + " | ".join(_json_literal(value) for value in schema["enum"]) + " )"
+    if "anyOf" in schema:
+        return "( " + " | ".join(_value_rule(option) for option in schema["anyOf"]) + " )"
+    kind = schema.get("type", "string")
+    if kind not in _PRIMITIVE_RULES:
+        # 复杂类型退化为字符串
+        kind = "string"
+    return kind
+
+
+def _member(name, schema):
+    return f'{_json_literal(name)} ws ":" ws {_value_rule(schema)}'
+
+
+def _arguments_rule(parameters):
+    """参数对象：必填参数按声明顺序出现，可选参数按顺序可省略"""
+    properties = parameters.get("properties", {})
+    required = [name for name in properties if name in parameters.get("required", [])]
+    optional = [name for name in properties if name not in required]
+
+    if not required:
+        if not optional:
+            return '"{" ws "}"'
+        member = "( " + " | ".join(_member(name, properties[name]) for name in optional) + " )"
+        return f'"{{" ws ( {member} ( ws "," ws {member} )* )? ws "}}"'
+
+    parts = [_member(required[0], properties[required[0]])]
+    parts += [f'ws "," ws {_member(name, properties[name])}' for name in required[1:]]
+    parts += [f'( ws "," ws {_member(name, properties[name])} )?' for name in optional]
+    return '"{" ws ' + " ".join(parts) + ' ws "}"'
+
+
+# 工具调用块之前允许的简短说明（如 "我来查询一下。\n"）的最大长度
+_MAX_PREAMBLE_CHARS = 256
+
+
+def _text_segment_rule(tag):
+    """文本中 "<" 之后的片段：不含 "<"，且不以 tag 去掉 "<" 之后的部分开头
+
+    文本按 "<" 切分后每一段都满足该规则时，文本中不会出现 tag。
+    """
+    alternatives = []
+    for i in range(1, len(tag)):
+        prefix = f"{_literal(tag[1:i])} " if i > 1 else ""
+        char = json.dumps(tag[i])[1:-1]
+        alternatives.append(f"{prefix}( [^<{char}] [^<]* )?")
+    return " | ".join(alternatives)
+
+
+def build_tool_call_grammar(tools):
+    """根据工具签名生成 GBNF 语法
+
+    模型输出要么是一个或多个格式严格的 <tool_call>{"name": ..., "arguments": {...}}</tool_call> 块
+    （之前可以有空白或不超过 _MAX_PREAMBLE_CHARS 个字符、不含 "<" 的简短说明），
+    要么是不含 <tool_call> 开始标签的普通文本回答，因此输出中的工具调用都能被解析。
+    """
+    rules = []
+    call_names = []
+    for tool in tools:
+        function = convert_to_openai_tool(tool)["function"]
+        rule = _rule_name(function["name"])
+        call_names.append(f"call-{rule}")
+        rules.append(
+            f'call-{rule} ::= "{{" ws {_json_literal("name")} ws ":" ws {_json_literal(function["name"])} '
+            f'ws "," ws {_json_literal("arguments")} ws ":" ws args-{rule} ws "}}"'
+        )
+        rules.append(f"args-{rule} ::= {_arguments_rule(function.get('parameters', {}))}")
+
+    header = [
+        "root ::= preamble? tool-calls | text",
+        f"preamble ::= [^<]{{1,{_MAX_PREAMBLE_CHARS}}}",
+        "tool-calls ::= call-block ( ws call-block )* ws",
+        f"call-block ::= {_literal(TOOL_CALL_OPEN)} ws call ws {_literal(TOOL_CALL_CLOSE)}",
+        "call ::= " + " | ".join(call_names),
+        r'text ::= [^<]* ( "<" text-segment )*',
+        f"text-segment ::= {_text_segment_rule(TOOL_CALL_OPEN)}",
+        r"ws ::= [ \t\n]{0,8}",
+    ]
+    primitives = [f"{name} ::= {rule}" for name, rule in _PRIMITIVE_RULES.items()]
+    return "\n".join(header + rules + primitives) + "\n"
+
+
+def apply_tool_call_grammar(llm, tools):
+    """按配置（model.params.tool_call_grammar）为模型设置工具调用语法约束"""
+    if not config_manager.get("model.params.tool_call_grammar", False):
+        return None
+    from llama_cpp import LlamaGrammar
+
+    llm.grammar = LlamaGrammar.from_string(build_tool_call_grammar(tools), verbose=False)
+    return llm.grammar
@@ -0,0 +1,133 @@
+# 工具调用解析：从模型输出中提取 <tool_call> 块，支持流式增量解析
+import json
+import re
+import uuid
+
+TOOL_CALL_OPEN = "<tool_call>"
+TOOL_CALL_CLOSE = "</tool_call>"
+
+# 预编译正则：匹配所有 tool_call 块，最后一个块允许未闭合（生成被提前截断时）
+_TOOL_CALL_PATTERN = re.compile(r"<tool_call>(.*?)(?:</tool_call>|\Z)", re.DOTALL)
+
+
+class ToolCallStats:
+    """工具调用相关计数：解码 token 数、提前停止次数、解析结果和每个请求的模型轮数"""
+
+    def __init__(self):
+        self.generations = 0
+        self.decode_tokens = 0
+        self.early_stops = 0
+        self.parsed_calls = 0
+        self.parse_failures = 0
+        self.requests = 0
+        self.agent_turns = 0
+
+    def record_request(self, turns):
+        """记录一次智能体请求所用的模型调用轮数"""
+        self.requests += 1
+        self.agent_turns += turns
+
+    def as_dict(self):
+        attempts = self.parsed_calls + self.parse_failures
+        return {
+            "generations": self.generations,
+            "decode_tokens": self.decode_tokens,
+            "decode_tokens_per_generation": self.decode_tokens / self.generations if self.generations else 0.0,
+            "early_stops": self.early_stops,
+            "parsed_calls": self.parsed_calls,
+            "parse_failures": self.parse_failures,
+            "parse_failure_rate": self.parse_failures / attempts if attempts else 0.0,
+            "requests": self.requests,
+            "turns_per_request": self.agent_turns / self.requests if self.requests else 0.0,
+        }
+
+
+tool_call_stats = ToolCallStats()
+
+
+def new_tool_call_id():
+    """生成不会冲突的工具调用 ID"""
+    return f"call_{uuid.uuid4().hex}"
+
+
+def parse_tool_calls(text):
+    """解析文本中的全部 tool_call 块
+
+    Returns:
+        (tool_calls, cleaned_content, errors)：标准格式的工具调用列表、
+        去掉 tool_call 块后的文本，以及无法解析的块的错误信息列表
+    """
+    tool_calls = []
+    errors = []
+    for match in _TOOL_CALL_PATTERN.finditer(text):
+        body = match.group(1).strip()
+        try:
+            data = json.loads(body)
+        except json.JSONDecodeError as e:
+            errors.append(f"解析工具调用 JSON 失败: {e}")
+            continue
+        if not isinstance(data, dict) or 'name' not in data or 'arguments' not in data:
+            errors.append(f"工具调用格式不正确: {body}")
+            continue
+        arguments = data['arguments']
+        if isinstance(arguments, str):
+            # 部分模型会把 arguments 输出为 JSON 字符串
+            try:
+                arguments = json.loads(arguments)
+            except json.JSONDecodeError as e:
+                errors.append(f"解析工具调用参数失败: {e}")
+                continue
+        tool_calls.append({
+            'name': data['name'],
+            'args': arguments,
+            'id': new_tool_call_id(),
+            'type': 'tool_call'
+        })
+    cleaned_content = _TOOL_CALL_PATTERN.sub('', text).strip()
+    tool_call_stats.parsed_calls += len(tool_calls)
+    tool_call_stats.parse_failures += len(errors)
+    return tool_calls, cleaned_content, errors
+
+
+class ToolCallStreamParser:
+    """增量解析模型的 token 流，判断何时可以停止生成
+
+    至少一个 tool_call 块闭合后，如果后续输出既不是新的 <tool_call> 也不可能是它的前缀，
+    说明模型已经不会再发起工具调用，此时继续解码只是浪费，应立即停止。
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.closed_blocks = 0
+        self._last_close_end = -1
+        self._search_from = 0
+
+    def feed(self, chunk):
+        """追加一段输出，返回是否应停止生成"""
+        self.text += chunk
+        # 只在新增部分（加上可能跨块的标签长度）中查找闭合标签
+        while True:
+            index = self.text.find(TOOL_CALL_CLOSE, self._search_from)
+            if index < 0:
+                self._search_from = max(len(self.text) - len(TOOL_CALL_CLOSE) + 1, self._search_from)
+                break
+            self.closed_blocks += 1
+            self._last_close_end = index + len(TOOL_CALL_CLOSE)
+            self._search_from = self._last_close_end
+        return self.should_stop()
+
+    @property
+    def overflow(self):
+        """最后一个闭合标签之后的输出"""
+        if self._last_close_end < 0:
+            return ""
+        return self.text[self._last_close_end:]
+
+    def should_stop(self):
+        if not self.closed_blocks:
+            return False
+        tail = self.overflow.lstrip()
+        if not tail or tail.startswith(TOOL_CALL_OPEN) or TOOL_CALL_OPEN.startswith(tail):
+            # 尚无后续输出、正在输出新的工具调用，或还无法判断
+            return False
+        return True
@@ -0,0 +1,84 @@
+# 工具结果的紧凑编码：回传给模型的性能数据用表头 + 行表格表示，节省上下文 token
+import json
+
+from src.tools.performance_store import OBJECTIVES, table_records
+
+
+def _format_value(value, precision):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        return f"{round(value, precision):g}"
+    return str(value).replace("|", "/")
+
+
+def _is_empty(value):
+    """空值或默认值（None、""、0、False），所有行都为空的列不输出"""
+    return value is None or value is False or value == "" or (type(value) in (int, float) and value == 0)
+
+
+def encode_records(records, max_rows=20, precision=2):
+    """把性能数据行编码为紧凑表格
+
+    所有行都为空或默认值的列（如空的 scenario/quantization）不输出；所有行取值相同的列
+    只在 common 行中出现一次；其余列输出为 "|" 分隔的表头和数据行。指标列始终保留。
+    行数超过 max_rows 时按 throughput 从高到低保留前 max_rows 行并注明总行数。
+
+    Returns:
+        编码后的文本
+    """
+    if not records:
+        return "rows: 0"
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    common = []
+    varying = []
+    for column in columns:
+        values = [record.get(column) for record in records]
+        if column not in OBJECTIVES and all(_is_empty(value) for value in values):
+            continue
+        if len(records) > 1 and all(value == values[0] for value in values[1:]):
+            common.append(f"{column}={_format_value(values[0], precision)}")
+        else:
+            varying.append(column)
+
+    shown = records
+    if len(records) > max_rows:
+        if "throughput" in columns:
+            shown = sorted(records, key=lambda record: record.get("throughput") or 0, reverse=True)
+        shown = shown[:max_rows]
+        lines = [f"rows: {len(records)} (showing top {len(shown)} by throughput)"
+                 if "throughput" in columns else f"rows: {len(records)} (showing first {len(shown)})"]
+    else:
+        lines = [f"rows: {len(records)}"]
+    if common:
+        lines.append("common: " + ", ".join(common))
+    if varying:
+        lines.append("|".join(varying))
+        lines.extend("|".join(_format_value(record.get(column), precision) for column in varying)
+                     for record in shown)
+    return "\n".join(lines)
+
+
+def encode_tool_result(data, max_rows=20, precision=2):
+    """编码工具返回值：行列表和对比工具的表格编码为紧凑表格，其他结果（如名称有歧义时的
+    error/suggestions）编码为紧凑 JSON"""
+    if isinstance(data, list) and all(isinstance(item, dict) for item in data):
+        return encode_records(data, max_rows, precision)
+    if isinstance(data, dict) and "pareto_frontier" in data:
+        sections = [f"model_name: {data['model_name']}"]
+        for name in ("groups", "pareto_frontier"):
+            sections.append(f"[{name}]\n" + encode_records(table_records(data[name]), max_rows, precision))
+        return "\n".join(sections)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_tool_content(content):
+    """解析工具节点生成的 ToolMessage 内容（JSON 字符串，空列表时为列表），无法解析时返回 None"""
+    if isinstance(content, list):
+        return content
+    try:
+        return json.loads(content)
+    except (TypeError, ValueError):
+        return None
@@ -1,131 +1,255 @@
+import hashlib
+import json
+import logging
 import os
+import threading
+import time
 from src.utils.config import config_manager
-from modelscope.hub.snapshot_download import snapshot_download
-from langchain_community.chat_models import ChatLlamaCpp
+from src.models.prompt_cache import install_prompt_cache
+from src.models.speculative import create_draft_model
 
 
-# Singleton instance for ChatLlamaCpp
+# Singleton instance for ChatLlamaCpp, created on first use
 _chat_llm_instance = None
+_chat_llm_lock = threading.Lock()
 
+logger = logging.getLogger(__name__)
 
-def _download_model():
-    """Download model from ModelScope with GGUF versions filtering."""
-    # Get model configuration
+
+def _configured_quant(config):
+    """The GGUF quantization to load: quantization.type, else the first gguf_versions entry."""
+    quantization = config.get("quantization", {}) or {}
+    if quantization.get("enabled", True) and quantization.get("type"):
+        return quantization["type"].lower()
+    gguf_versions = config.get("download", {}).get("gguf_versions", [])
+    return gguf_versions[0].lower() if gguf_versions else None
+
+
+def _manifest_path(cache_dir):
+    return os.path.join(cache_dir, "manifest.json")
+
+
+def _load_manifest(cache_dir):
+    """Load the resolved-model manifest ({"<model>:<quant>": entry})."""
+    try:
+        with open(_manifest_path(cache_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(cache_dir, manifest):
+    """Write the manifest atomically so concurrent workers never read a partial file."""
+    path = _manifest_path(cache_dir)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _manifest_entry(path, quant):
+    stat = os.stat(path)
+    return {
+        "path": os.path.abspath(path),
+        "quant": quant,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": _sha256(path),
+    }
+
+
+def _cached_model_file(entry):
+    """Return the manifest entry's file if it is still the file we resolved (one stat call)."""
+    try:
+        stat = os.stat(entry["path"])
+    except (OSError, KeyError, TypeError):
+        return None
+    if stat.st_size != entry.get("size") or stat.st_mtime != entry.get("mtime"):
+        return None
+    return entry["path"]
+
+
+def _download_model(model_name, cache_dir, quant):
+    """Download model from ModelScope, restricted to the configured GGUF quantization."""
+    allow_patterns = None
+    if quant:
+        # Add both lowercase and uppercase patterns to ensure matching
+        allow_patterns = [f"*{quant.lower()}*.gguf", f"*{quant.upper()}*.gguf"]
+    
+    # Imported here: modelscope is slow to import and only needed when downloading
+    from modelscope.hub.snapshot_download import snapshot_download
+    logger.info(f"Downloading model from ModelScope: {model_name} ({quant or 'all versions'})")
+    model_path = snapshot_download(
+        model_name,
+        cache_dir=cache_dir,
+        revision="master",
+        allow_patterns=allow_patterns
+    )
+    logger.info(f"Model downloaded to: {model_path}")
+    return model_path
+
+
+def _find_gguf_file(directory, quant, fallback=False):
+    """Find the GGUF file in the directory whose name matches the quantization.
+
+    With `fallback`, a directory without a matching file yields its first GGUF file (a warning
+    is logged), e.g. a local directory holding a single `model.gguf`.
+    """
+    gguf_files = sorted(
+        os.path.join(root, file)
+        for root, dirs, files in os.walk(directory)
+        for file in files
+        if file.lower().endswith(".gguf")
+    )
+    if quant:
+        matching = [path for path in gguf_files if quant.lower() in os.path.basename(path).lower()]
+        if matching:
+            return matching[0]
+        if not (fallback and gguf_files):
+            return None
+        logger.warning(f"No GGUF file name in {directory} contains '{quant}', using {gguf_files[0]}")
+    return gguf_files[0] if gguf_files else None
+
+
+def resolve_model_file():
+    """Resolve the GGUF file to load.
+
+    A manifest in the cache directory records the resolved path, quant,
+    size, mtime and checksum, so warm boots skip the hub and the directory
+    walk and only stat the file. `download.reuse_cache: false` bypasses the
+    manifest. `download.force_redownload: true` replaces the cached file of
+    the configured quant once: the entry written afterwards is marked as
+    forced and reused on later starts until the flag is turned off.
+    """
     config = config_manager.get("model", {})
     model_name = config.get("name", "DevQuasar/openbmb.MiniCPM4-0.5B-GGUF")
     local_path = config.get("path", "")
     cache_dir = config.get("cache_dir", "./models")
+    download = config.get("download", {}) or {}
+    reuse_cache = download.get("reuse_cache", True)
+    force_redownload = download.get("force_redownload", False)
+    quant = _configured_quant(config)
     
-    # Ensure cache directories exist
-    os.makedirs(cache_dir, exist_ok=True)
-    
-    # Get GGUF versions to keep from config (guaranteed to have value)
-    gguf_versions = config.get("download", {}).get("gguf_versions", [])
-    
+    # Use local path if provided and exists
     if local_path and os.path.exists(local_path):
-        # Use local path if provided and exists
-        print(f"Using local model path: {local_path}")
-        model_path = local_path
-        print(f"GGUF versions to keep: {gguf_versions}")
-        
-        # Assume local path only contains the desired GGUF version
-        # No need to filter files for local paths
-    else:
-        print(f"GGUF versions to download: {gguf_versions}")
-        
-        # Create allow patterns for GGUF versions filtering
-        # Create patterns to match specified GGUF versions
-        allow_patterns = []
-        # Add patterns for specified GGUF versions
-        for version in gguf_versions:
-            # Add both lowercase and uppercase patterns to ensure matching
-            allow_patterns.append(f"*{version.lower()}*.gguf")
-            allow_patterns.append(f"*{version.upper()}*.gguf")
-        print(f"Created allow patterns: {allow_patterns}")
-        
-        # Download model with GGUF versions filtering
-        print(f"Downloading model from ModelScope: {model_name}")
-        model_path = snapshot_download(
-            model_name,
-            cache_dir=cache_dir,
-            revision="master",
-            allow_patterns=allow_patterns
-        )
-        print(f"Model downloaded to: {model_path}")
-        print(f"GGUF versions to keep: {gguf_versions}")
+        if os.path.isfile(local_path):
+            return local_path
+        model_file = _find_gguf_file(local_path, quant, fallback=True)
+        if not model_file:
+            raise FileNotFoundError(f"No GGUF model file found in: {local_path}")
+        return model_file
     
-    return model_path
+    # Ensure cache directories exist
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _load_manifest(cache_dir)
+    key = f"{model_name}:{quant or '*'}"
+    entry = manifest.get(key)
+    
+    # An entry written by a forced download already is the redownloaded file
+    if entry and reuse_cache and (not force_redownload or entry.get("forced")):
+        model_file = _cached_model_file(entry)
+        if model_file:
+            if entry.get("forced") and not force_redownload:
+                # The flag was turned off: turning it on again forces another download
+                manifest[key] = {**entry, "forced": False}
+                _save_manifest(cache_dir, manifest)
+            logger.info(f"Using cached model file from manifest: {model_file}")
+            return model_file
+    
+    stale_file = None
+    if force_redownload and entry and os.path.exists(entry.get("path", "")):
+        # Remove the stale copy of this quant so the hub download fetches it again
+        stale_file = entry["path"]
+        os.remove(stale_file)
+    
+    started = time.time()
+    model_path = _download_model(model_name, cache_dir, quant)
+    model_file = _find_gguf_file(model_path, quant)
+    if model_file and force_redownload and stale_file is None and os.stat(model_file).st_mtime < started:
+        # No manifest entry pointed at the cached copy the hub returned, so replace it now
+        os.remove(model_file)
+        model_path = _download_model(model_name, cache_dir, quant)
+        model_file = _find_gguf_file(model_path, quant)
+    if not model_file:
+        raise FileNotFoundError(f"No {quant or ''} GGUF model file found in: {model_path}")
+    
+    manifest[key] = {**_manifest_entry(model_file, quant), "forced": bool(force_redownload)}
+    _save_manifest(cache_dir, manifest)
+    return model_file
 
 
-def _find_gguf_file(directory, versions):
-    """Find GGUF model file in the directory."""
-    print(f"Searching for GGUF files in: {directory}")
-    print(f"Looking for versions: {versions}")
-    
-    # Print all files in the directory
-    all_files = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            all_files.append(file_path)
-            print(f"Found file: {file_path}")
-    
-    # Try to find any GGUF file regardless of version
-    for file_path in all_files:
-        if file_path.endswith('.gguf'):
-            print(f"Found GGUF file: {file_path}")
-            return file_path
-    
-    # Try to find any file that might be a model
-    for file_path in all_files:
-        if any(ext in file_path.lower() for ext in ['.bin', '.pth', '.pt', '.onnx']):
-            print(f"Found potential model file: {file_path}")
-            return file_path
-    
-    return None
+def is_chat_llm_loaded():
+    """Whether the ChatLlamaCpp instance has been created."""
+    return _chat_llm_instance is not None
 
 
 def get_chat_llm():
-    """Get or create the ChatLlamaCpp instance."""
-    global _chat_llm_instance
-    
+    """Get or create the ChatLlamaCpp instance (thread-safe, loads on first call)."""
     if _chat_llm_instance:
         return _chat_llm_instance
     
+    with _chat_llm_lock:
+        if _chat_llm_instance:
+            return _chat_llm_instance
+        return _create_chat_llm()
+
+
+def _create_chat_llm():
+    """Download (if needed) and load the GGUF model."""
+    global _chat_llm_instance
+    
+    # Imported here so that importing this module does not load llama.cpp
+    from src.models.llama_chat import ToolCallAwareChatLlamaCpp
+    
     # Get model configuration
     config = config_manager.get("model", {})
     model_params = config.get("params", {})
-    gguf_versions = config.get("download", {}).get("gguf_versions", [])
     
-    # Download model if needed
-    model_path = _download_model()
+    gguf_model_file = resolve_model_file()
+    logger.info(f"Using GGUF model file: {gguf_model_file}")
     
-    # Find GGUF model file (gguf_versions is guaranteed to have value)
-    gguf_model_file = _find_gguf_file(model_path, gguf_versions)
-    if gguf_model_file:
-        print(f"Found specified GGUF model file: {gguf_model_file}")
-    else:
-        raise Exception(f"No specified GGUF model file found in: {model_path}")
-    
-    print(f"Using GGUF model file: {gguf_model_file}")
+    # Extra llama.cpp constructor arguments not exposed as ChatLlamaCpp fields
+    model_kwargs = {}
+    if model_params.get("n_threads_batch"):
+        model_kwargs["n_threads_batch"] = model_params["n_threads_batch"]
+    # Speculative decoding: llama.cpp verifies the drafted tokens in one batch per step
+    draft_model = create_draft_model(
+        config.get("speculative", {}) or {},
+        n_ctx=model_params.get("max_length", 2048),
+        n_threads=model_params.get("n_threads"),
+    )
+    if draft_model is not None:
+        model_kwargs["draft_model"] = draft_model
     
-    # Create ChatLlamaCpp instance
-    llm = ChatLlamaCpp(
+    # Create ChatLlamaCpp instance (stops decoding once tool calls are complete)
+    llm = ToolCallAwareChatLlamaCpp(
         model_path=gguf_model_file,
         temperature=model_params.get("temperature", 0.7),
         max_tokens=model_params.get("max_length", 2048),
         top_p=model_params.get("top_p", 0.95),
         n_ctx=model_params.get("max_length", 2048),
-        n_gpu_layers=-1,  # Use all GPU layers if available
+        n_gpu_layers=model_params.get("n_gpu_layers", -1),  # -1 uses all GPU layers if available
+        n_threads=model_params.get("n_threads"),  # None lets llama.cpp pick
+        n_batch=model_params.get("n_batch", 512),  # Prompt tokens per prefill batch
+        use_mmap=model_params.get("use_mmap", True),  # Processes on one host share the weights' page cache
+        model_kwargs=model_kwargs,
         verbose=model_params.get("verbose", False),
+        early_stop_tool_calls=model_params.get("tool_call_early_stop", True),
     )
     
+    # Reuse KV state for shared prompt prefixes (system prompt + tool schema)
+    install_prompt_cache(llm)
+    
     # Store singleton instance
     _chat_llm_instance = llm
-    print(f"ChatLlamaCpp instance created successfully!")
+    logger.info("ChatLlamaCpp instance created successfully")
     
     return llm
-
-
-# Main export: ChatLlamaCpp instance ready for LangChain agent
-llm = get_chat_llm()
@@ -0,0 +1,96 @@
+import time
+from contextlib import nullcontext
+from typing import Any, Iterator, List, Optional
+
+from langchain_community.chat_models import ChatLlamaCpp
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from src.agents.tool_call_parser import ToolCallStreamParser, tool_call_stats
+from src.models.scheduler import cancellation_stats, current_cancel_token
+from src.models.speculative import begin_draft, speculative_stats
+from src.utils.metrics import DECODE_TOKENS_PER_SECOND, PREFILL_SECONDS
+
+
+class ToolCallAwareChatLlamaCpp(ChatLlamaCpp):
+    """ChatLlamaCpp that always decodes as a stream and stops once tool calls are complete.
+
+    The model writes tool calls as <tool_call>...</tool_call> text. As soon
+    as the output after the last closed block shows that no further tool
+    call is coming, generation is stopped instead of decoding the rest of
+    the turn (which the agent would throw away). Generation also stops
+    before the next token once the request's cancel token is cancelled or
+    past its deadline.
+    """
+
+    early_stop_tool_calls: bool = True
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if kwargs.get("tool_choice"):
+            return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        return generate_from_stream(self._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        parser = ToolCallStreamParser()
+        tool_call_stats.generations += 1
+        begin_draft(self)
+        # Cancel token of the request (inherited through the context of the executor thread)
+        cancel_token = current_cancel_token.get()
+        stream = super()._stream(messages, stop=stop, run_manager=None, **kwargs)
+        start = time.perf_counter()
+        first_token_at = None
+        tokens = 0
+        try:
+            while True:
+                if cancel_token is not None and cancel_token.cancelled:
+                    max_tokens = kwargs.get("max_tokens") or self.max_tokens or 0
+                    cancellation_stats.record_generation(cancel_token.reason, max(max_tokens - tokens, 0))
+                    cancel_token.raise_if_cancelled()
+                # Each decode step counts as running work of the request until it yields a token
+                with cancel_token.generating() if cancel_token is not None else nullcontext():
+                    chunk = next(stream, None)
+                if chunk is None:
+                    break
+                if first_token_at is None:
+                    # Time to the first token is dominated by prompt prefill
+                    first_token_at = time.perf_counter()
+                    PREFILL_SECONDS.observe(first_token_at - start)
+                tokens += 1
+                tool_call_stats.decode_tokens += 1
+                text = chunk.text
+                if self.early_stop_tool_calls and text and parser.feed(text):
+                    tool_call_stats.early_stops += 1
+                    # Keep only the part of this chunk before the trailing output
+                    keep = len(text) - len(parser.overflow)
+                    if keep > 0:
+                        yield self._emit(ChatGenerationChunk(message=AIMessageChunk(content=text[:keep])), run_manager)
+                    break
+                yield self._emit(chunk, run_manager)
+        finally:
+            # Closing the stream stops llama.cpp from decoding further tokens
+            stream.close()
+            if first_token_at is not None and tokens > 1:
+                elapsed = time.perf_counter() - first_token_at
+                if elapsed > 0:
+                    DECODE_TOKENS_PER_SECOND.observe((tokens - 1) / elapsed)
+                    speculative_stats.record_decode(tokens - 1, elapsed)
+
+    @staticmethod
+    def _emit(chunk, run_manager):
+        if run_manager:
+            run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+        return chunk
@@ -0,0 +1,106 @@
+import time
+
+from src.utils.config import config_manager
+
+
+class PromptCacheStats:
+    """Counters for prefix-state restores done by the llama.cpp cache."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.restores = 0
+        self.prefill_tokens_saved = 0
+        self.warmup_prompt_tokens = 0
+        self.warmup_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "restores": self.restores,
+            "prefill_tokens_saved": self.prefill_tokens_saved,
+            "warmup_prompt_tokens": self.warmup_prompt_tokens,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+    def record_hit(self, cached_ids, live_ids, prompt_ids):
+        """Count a cache hit and the prefill it actually avoids.
+
+        llama.cpp only loads the cached state when its common prefix with the prompt is
+        longer than that of the tokens already in the live context (consecutive requests
+        usually still hold the system prompt), and then only the difference is not re-evaluated.
+        """
+        self.hits += 1
+        saved = _common_prefix(cached_ids, prompt_ids) - _common_prefix(live_ids, prompt_ids)
+        if saved > 0:
+            self.restores += 1
+            self.prefill_tokens_saved += saved
+
+
+def _common_prefix(a, b):
+    length = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        length += 1
+    return length
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def _instrumented(cache_cls, client):
+    """Subclass a llama.cpp state cache so prefix restores are counted."""
+
+    class InstrumentedCache(cache_cls):
+        def __getitem__(self, key):
+            prompt_cache_stats.lookups += 1
+            state = super().__getitem__(key)
+            # Compared against the live context, as Llama does before calling load_state
+            prompt_cache_stats.record_hit(state.input_ids.tolist(), client.input_ids.tolist(), list(key))
+            return state
+
+    InstrumentedCache.__name__ = f"Instrumented{cache_cls.__name__}"
+    return InstrumentedCache
+
+
+def install_prompt_cache(llm, force=False):
+    """Attach a size-bounded KV state cache to the ChatLlamaCpp client.
+
+    llama.cpp looks up the longest cached token prefix of every prompt and
+    restores that state instead of re-prefilling it, so once the system
+    prompt + tool schema prefix has been evaluated (see warm_prompt_cache)
+    each request only prefills its own turn. With `disk_path` set the states
+    survive restarts and can be shared by worker processes. `force` installs
+    the cache even when it is disabled in the configuration.
+    """
+    config = config_manager.get("model.prompt_cache", {}) or {}
+    if not (config.get("enabled", False) or force):
+        return None
+
+    from llama_cpp import LlamaDiskCache, LlamaRAMCache
+
+    capacity_bytes = int(float(config.get("capacity_mb", 512)) * 1024 * 1024)
+    disk_path = config.get("disk_path", "")
+    if disk_path:
+        cache = _instrumented(LlamaDiskCache, llm.client)(cache_dir=disk_path, capacity_bytes=capacity_bytes)
+    else:
+        cache = _instrumented(LlamaRAMCache, llm.client)(capacity_bytes=capacity_bytes)
+    llm.client.set_cache(cache)
+    return cache
+
+
+def warm_prompt_cache(llm, tools, messages):
+    """Evaluate the fixed prompt prefix once so later requests can restore it.
+
+    The tools are bound exactly as the agent binds them, so the cached
+    prefix contains the same rendered tool schema.
+    """
+    start = time.perf_counter()
+    llm.bind_tools(tools).invoke(messages, max_tokens=1)
+    prompt_cache_stats.warmup_seconds = time.perf_counter() - start
+    client = getattr(llm, "client", None)
+    if client is not None:
+        prompt_cache_stats.warmup_prompt_tokens = client.n_tokens
+    return prompt_cache_stats.warmup_seconds
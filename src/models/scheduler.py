@@ -0,0 +1,281 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from src.utils.config import config_manager
+from src.utils.metrics import CANCELLED_GENERATIONS, CANCELLED_TOKENS_SAVED, QUEUE_WAIT_SECONDS
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when the inference queue is full and a request is rejected."""
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request does not finish before its deadline."""
+
+
+class RequestCancelled(Exception):
+    """Raised when a request is cancelled (e.g. its client disconnected) before it finishes."""
+
+
+class CancellationStats:
+    """Counters for requests cancelled while running and the decode tokens this saved."""
+
+    def __init__(self):
+        self.cancelled_requests = {"deadline": 0, "disconnected": 0}
+        self.stopped_generations = 0
+        self.decode_tokens_saved = 0
+
+    def record_request(self, reason):
+        self.cancelled_requests[reason] = self.cancelled_requests.get(reason, 0) + 1
+
+    def record_generation(self, reason, tokens_saved):
+        """Record a model call stopped early; `tokens_saved` is what was left of its max_tokens."""
+        self.stopped_generations += 1
+        self.decode_tokens_saved += tokens_saved
+        CANCELLED_GENERATIONS.labels(reason=reason).inc()
+        CANCELLED_TOKENS_SAVED.inc(tokens_saved)
+
+    def as_dict(self):
+        return {
+            "cancelled_requests": dict(self.cancelled_requests),
+            "stopped_generations": self.stopped_generations,
+            "decode_tokens_saved": self.decode_tokens_saved,
+        }
+
+
+cancellation_stats = CancellationStats()
+
+
+class CancelToken:
+    """Cancellation state of one request, shared with its model calls.
+
+    The token travels in the `current_cancel_token` context variable, which asyncio tasks and
+    LangChain's executor threads inherit, so the llama.cpp token loop can check it after every
+    token and stop decoding as soon as the request is cancelled or past its deadline. A token
+    is also cancelled when its `parent` token is, or when `cancel_event` (a multiprocessing
+    event set by the front-end process of a worker pool) is set.
+    """
+
+    def __init__(self, deadline=None, parent=None, cancel_event=None):
+        self.deadline = deadline
+        self.parent = parent
+        self.cancel_event = cancel_event
+        self.reason = None
+        self._generating = 0
+        self._idle = threading.Condition()
+
+    def cancel(self, reason="disconnected"):
+        """Mark the request as cancelled (the first reason wins)."""
+        if self.reason is None:
+            self.reason = reason
+            cancellation_stats.record_request(reason)
+
+    @property
+    def cancelled(self):
+        if self.reason is None:
+            if self.parent is not None and self.parent.cancelled:
+                # Already counted when the parent was cancelled
+                self.reason = self.parent.reason
+            elif self.cancel_event is not None and self.cancel_event.is_set():
+                self.cancel("disconnected")
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.cancel("deadline")
+        return self.reason is not None
+
+    def raise_if_cancelled(self):
+        """Raise DeadlineExceeded or RequestCancelled if the request should stop."""
+        if not self.cancelled:
+            return
+        if self.reason == "deadline":
+            raise DeadlineExceeded("Request deadline exceeded during inference")
+        raise RequestCancelled(f"Request cancelled ({self.reason})")
+
+    @contextmanager
+    def generating(self):
+        """Mark a model call of this request as running (see wait_idle)."""
+        with self._idle:
+            self._generating += 1
+        try:
+            yield self
+        finally:
+            with self._idle:
+                self._generating -= 1
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """Block until no model call of this request is running; False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._generating == 0, timeout)
+
+
+current_cancel_token = contextvars.ContextVar("current_cancel_token", default=None)
+
+
+def raise_if_cancelled():
+    """Stop the current request if its cancel token says so (no-op outside a request)."""
+    token = current_cancel_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+@contextmanager
+def cancel_scope(token):
+    """Make `token` the cancel token of the code (and the tasks and threads it starts) in the block."""
+    reset = current_cancel_token.set(token)
+    try:
+        yield token
+    finally:
+        try:
+            current_cancel_token.reset(reset)
+        except ValueError:
+            # Async generators may be finalized from another context
+            pass
+
+
+class InferenceScheduler:
+    """Admission control in front of the shared llama.cpp model.
+
+    At most `max_concurrency` requests run inference at once, at most
+    `max_queue_size` more wait for a slot, and anything beyond that is
+    rejected immediately instead of piling up. Each request carries a
+    deadline that covers both queue wait and execution.
+    """
+
+    def __init__(self, max_concurrency=1, max_queue_size=16, request_timeout=120.0, wait_window=1024,
+                 cancel_grace_seconds=5.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.request_timeout = request_timeout
+        self.cancel_grace_seconds = cancel_grace_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queue_waits = deque(maxlen=wait_window)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_config(cls):
+        """Create a scheduler from the `scheduler` configuration section."""
+        config = config_manager.get("scheduler", {}) or {}
+        return cls(
+            max_concurrency=int(config.get("max_concurrency", 1)),
+            max_queue_size=int(config.get("max_queue_size", 16)),
+            request_timeout=float(config.get("request_timeout", 120)),
+            cancel_grace_seconds=float(config.get("cancel_grace_seconds", 5)),
+        )
+
+    def is_overloaded(self):
+        """Whether a new request would be rejected right now."""
+        return self.active >= self.max_concurrency and self.waiting >= self.max_queue_size
+
+    def deadline(self, timeout=None):
+        """Absolute monotonic deadline for a request starting now."""
+        return time.monotonic() + (timeout if timeout is not None else self.request_timeout)
+
+    def cancel_token(self, timeout=None):
+        """CancelToken for a request starting now.
+
+        Inside another request's cancel scope (a worker process running a request of the
+        front-end process) the token is a child of that request's token: it stops when the
+        outer request is cancelled and its deadline is never later than the outer one.
+        """
+        parent = current_cancel_token.get()
+        deadline = self.deadline(timeout)
+        if parent is not None and parent.deadline is not None:
+            deadline = min(deadline, parent.deadline)
+        return CancelToken(deadline, parent=parent)
+
+    @asynccontextmanager
+    async def slot(self, deadline=None):
+        """Wait for an inference slot; yields the request deadline."""
+        if deadline is None:
+            deadline = self.deadline()
+        if self.is_overloaded():
+            self.rejected += 1
+            raise SchedulerOverloaded(
+                f"Inference queue is full ({self.waiting} waiting, {self.active} running)"
+            )
+
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(deadline - start, 0))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise DeadlineExceeded("Request deadline exceeded while waiting in queue")
+        finally:
+            self.waiting -= 1
+        wait = time.monotonic() - start
+        self._queue_waits.append(wait)
+        QUEUE_WAIT_SECONDS.observe(wait)
+
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield deadline
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    async def release_when_idle(self, token):
+        """After a request was cancelled, wait (up to cancel_grace_seconds) until its model call has
+        stopped decoding, so the slot is not handed to the next request while llama.cpp is busy."""
+        if token.cancelled:
+            await asyncio.to_thread(token.wait_idle, self.cancel_grace_seconds)
+
+    async def run(self, coro_factory, timeout=None):
+        """Run `coro_factory()` in a slot, bounded by the request deadline.
+
+        The deadline and cancellation of the calling task (client disconnect) reach the model
+        call through a CancelToken, which stops token generation.
+        """
+        token = self.cancel_token(timeout)
+        async with self.slot(token.deadline) as deadline:
+            with cancel_scope(token):
+                try:
+                    return await asyncio.wait_for(coro_factory(), timeout=max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    token.cancel("deadline")
+                    self.timed_out += 1
+                    await self.release_when_idle(token)
+                    raise DeadlineExceeded("Request deadline exceeded during inference")
+                except asyncio.CancelledError:
+                    token.cancel("disconnected")
+                    await self.release_when_idle(token)
+                    raise
+                except Exception:
+                    # e.g. DeadlineExceeded raised by the model call itself
+                    await self.release_when_idle(token)
+                    raise
+
+    def stats(self):
+        """Return queue depth, admission counters and queue wait percentiles."""
+        waits = sorted(self._queue_waits)
+
+        def percentile(p):
+            return waits[min(int(p * len(waits)), len(waits) - 1)] if waits else 0.0
+
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue_size": self.max_queue_size,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "queue_wait_seconds": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": waits[-1] if waits else 0.0,
+            },
+        }
+
+
+# Shared scheduler for the single in-process model
+inference_scheduler = InferenceScheduler.from_config()
@@ -0,0 +1,143 @@
+import logging
+
+import numpy as np
+
+from src.utils.metrics import SPECULATIVE_TOKENS
+
+logger = logging.getLogger(__name__)
+
+SPECULATIVE_METHODS = ("prompt_lookup", "draft_model")
+
+
+class SpeculativeStats:
+    """Draft acceptance of speculative decoding and the decode speed of all model calls."""
+
+    def __init__(self):
+        self.method = None
+        self.draft_calls = 0
+        self.drafted_tokens = 0
+        self.accepted_tokens = 0
+        self.decode_tokens = 0
+        self.decode_seconds = 0.0
+
+    def record_decode(self, tokens, seconds):
+        """Record the tokens decoded after the first token of a model call and the time they took."""
+        self.decode_tokens += tokens
+        self.decode_seconds += seconds
+
+    def as_dict(self):
+        return {
+            "method": self.method,
+            "draft_calls": self.draft_calls,
+            "drafted_tokens": self.drafted_tokens,
+            "accepted_tokens": self.accepted_tokens,
+            "acceptance_rate": self.accepted_tokens / self.drafted_tokens if self.drafted_tokens else 0.0,
+            "decode_tokens_per_second": self.decode_tokens / self.decode_seconds if self.decode_seconds else 0.0,
+        }
+
+
+speculative_stats = SpeculativeStats()
+
+
+class MeasuredDraftModel:
+    """Wrap a llama.cpp draft model and count how many drafted tokens the main model accepts.
+
+    llama.cpp verifies a draft of k tokens proposed at position p in one batch, then calls the
+    draft model again with the accepted tokens plus the token it sampled itself, so the common
+    prefix of the draft and the next input from p is the number of accepted tokens. The draft
+    of the last step of a generation is never verified and is not counted; call begin() at the
+    start of every generation.
+    """
+
+    def __init__(self, draft_model, stats=speculative_stats):
+        self.draft_model = draft_model
+        self.stats = stats
+        self._pending = None
+
+    def begin(self):
+        """Forget the unverified draft of the previous generation."""
+        self._pending = None
+
+    def __call__(self, input_ids, **kwargs):
+        self._verify(input_ids)
+        draft = self.draft_model(input_ids, **kwargs)
+        self.stats.draft_calls += 1
+        if len(draft):
+            self._pending = (len(input_ids), [int(token) for token in draft])
+        return draft
+
+    def _verify(self, input_ids):
+        if self._pending is None:
+            return
+        position, draft = self._pending
+        self._pending = None
+        accepted = 0
+        for drafted, actual in zip(draft, input_ids[position:position + len(draft)]):
+            if drafted != int(actual):
+                break
+            accepted += 1
+        self.stats.drafted_tokens += len(draft)
+        self.stats.accepted_tokens += accepted
+        SPECULATIVE_TOKENS.labels(kind="drafted").inc(len(draft))
+        SPECULATIVE_TOKENS.labels(kind="accepted").inc(accepted)
+
+
+class LlamaModelDraft:
+    """Draft the next tokens greedily with a small GGUF model sharing the main model's vocabulary.
+
+    The draft model keeps its own KV cache; llama.cpp reuses the longest evaluated prefix, so
+    each call only evaluates the tokens accepted since the previous one.
+    """
+
+    def __init__(self, model_path, num_pred_tokens=8, **llama_kwargs):
+        # Imported here so that importing this module does not load llama.cpp
+        from llama_cpp import Llama
+
+        self.llama = Llama(model_path=model_path, verbose=False, **llama_kwargs)
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids, **kwargs):
+        draft = []
+        eos = self.llama.token_eos()
+        for token in self.llama.generate(input_ids.tolist(), top_k=1, temp=0.0, reset=True):
+            draft.append(token)
+            if token == eos or len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+
+def create_draft_model(config, n_ctx=None, n_threads=None):
+    """Build the draft model configured under model.speculative, or None when it is disabled.
+
+    `prompt_lookup` drafts the continuation of the longest recent n-gram that already occurs
+    in the context (the tool rows an answer copies); `draft_model` runs a small GGUF model.
+    """
+    if not config.get("enabled", False):
+        return None
+    method = config.get("method", "prompt_lookup")
+    num_pred_tokens = int(config.get("num_pred_tokens", 10))
+    if method == "prompt_lookup":
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        draft_model = LlamaPromptLookupDecoding(
+            max_ngram_size=int(config.get("max_ngram_size", 2)),
+            num_pred_tokens=num_pred_tokens,
+        )
+    elif method == "draft_model":
+        model_path = config.get("draft_model_path")
+        if not model_path:
+            raise ValueError("model.speculative.draft_model_path is required for the draft_model method")
+        llama_kwargs = {key: value for key, value in (("n_ctx", n_ctx), ("n_threads", n_threads)) if value is not None}
+        draft_model = LlamaModelDraft(model_path, num_pred_tokens=num_pred_tokens, **llama_kwargs)
+    else:
+        raise ValueError(f"Unknown speculative decoding method {method!r}; expected one of {SPECULATIVE_METHODS}")
+    logger.info(f"Speculative decoding enabled ({method}, {num_pred_tokens} draft tokens)")
+    speculative_stats.method = method
+    return MeasuredDraftModel(draft_model)
+
+
+def begin_draft(llm):
+    """Reset the draft acceptance tracking of `llm` before a generation (no-op without a draft model)."""
+    draft_model = getattr(getattr(llm, "client", None), "draft_model", None)
+    if isinstance(draft_model, MeasuredDraftModel):
+        draft_model.begin()
@@ -0,0 +1,264 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from src.models.scheduler import CancelToken, cancel_scope, current_cancel_token
+from src.tools.ingestion import IngestWatcher
+from src.utils.config import ConfigWatcher, config_manager
+
+
+# Per-process state, set up once by _init_worker
+_worker_target = None
+_worker_stream_target = None
+_worker_loop = None
+
+
+def _resolve_target(target):
+    """Resolve a 'package.module:function' reference."""
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _init_worker(target, warmup, n_threads, stream_target=None):
+    """Worker process initializer: pin the thread count, import the target and load its model."""
+    global _worker_target, _worker_stream_target, _worker_loop
+
+    if n_threads:
+        # Pin this worker's slice of cores before the model is created
+        os.environ["MODEL_N_THREADS"] = str(n_threads)
+        os.environ["MODEL_N_THREADS_BATCH"] = str(n_threads)
+        config_manager.merge_with_env()
+    # Each worker has its own configuration copy, so it also watches the config files
+    watcher = ConfigWatcher.from_config(config_manager)
+    if watcher is not None:
+        watcher.start()
+    # ... and ingests the benchmark results into its own performance store
+    ingest_watcher = IngestWatcher.from_config()
+    if ingest_watcher is not None:
+        ingest_watcher.start()
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_target = _resolve_target(target)
+    # Resolved on the first streaming request
+    _worker_stream_target = stream_target
+    if warmup:
+        _resolve_target(warmup)()
+
+
+def _worker_cancel_token(deadline, cancel_event):
+    """Cancel token of a front-end request: `deadline` is its absolute wall-clock deadline (the
+    monotonic clocks of two processes are not comparable) and `cancel_event` is set by the front
+    end when the request is cancelled."""
+    if deadline is not None:
+        deadline = time.monotonic() + (deadline - time.time())
+    return CancelToken(deadline, cancel_event=cancel_event)
+
+
+def _run_in_worker(task, config, deadline=None, cancel_event=None):
+    """Execute one request inside a worker process."""
+    # The target's own scheduler nests its cancel token inside this one
+    with cancel_scope(_worker_cancel_token(deadline, cancel_event)):
+        result = _worker_target(task, config)
+        if asyncio.iscoroutine(result):
+            result = _worker_loop.run_until_complete(result)
+    return result
+
+
+def _stream_in_worker(task, config, events, deadline=None, cancel_event=None):
+    """Execute one streaming request inside a worker process, putting its events on the
+    `events` queue and None when the stream has ended (also after an error)."""
+    global _worker_stream_target
+    if isinstance(_worker_stream_target, str):
+        _worker_stream_target = _resolve_target(_worker_stream_target)
+
+    async def relay():
+        async for item in _worker_stream_target(task, config):
+            events.put(item)
+
+    try:
+        with cancel_scope(_worker_cancel_token(deadline, cancel_event)):
+            _worker_loop.run_until_complete(relay())
+    finally:
+        events.put(None)
+
+
+def _next_event(events, future):
+    """Block until the next streamed event; None at the end of the stream or if the worker died."""
+    while True:
+        try:
+            return events.get(timeout=0.5)
+        except queue.Empty:
+            if future.done():
+                return None
+
+
+class WorkerPool:
+    """Pool of model worker processes for multi-core scaling.
+
+    Each worker is a separate process that loads its own GGUF model with
+    `threads_per_worker` threads, so N workers use N slices of the CPU
+    instead of contending for one llama.cpp instance. Requests are sent to
+    the worker with the fewest in-flight requests over the executor's
+    local IPC channel. A request counts as in flight until its worker has
+    finished it, including after the caller gave up on it.
+    """
+
+    def __init__(self, num_workers, threads_per_worker=None, target="src.agents.agent:run",
+                 warmup="src.agents.agent:get_agent_instance", stream_target="src.agents.agent:stream"):
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker
+        self.target = target
+        self.warmup = warmup
+        self.stream_target = stream_target
+        self._executors = []
+        self._manager = None
+        self._in_flight = [0] * num_workers
+        self._completed = [0] * num_workers
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """Create a pool from the `workers` configuration section, or None if disabled."""
+        config = config_manager.get("workers", {}) or {}
+        if not config.get("enabled", False):
+            return None
+        cpu_count = os.cpu_count() or 1
+        threads_per_worker = int(config.get("threads_per_worker") or 0)
+        num_workers = int(config.get("num_workers") or 0)
+        if num_workers <= 0:
+            num_workers = max(cpu_count // threads_per_worker, 1) if threads_per_worker else cpu_count
+        if threads_per_worker <= 0:
+            threads_per_worker = max(cpu_count // num_workers, 1)
+        return cls(
+            num_workers,
+            threads_per_worker,
+            config.get("target", "src.agents.agent:run"),
+            config.get("warmup", "src.agents.agent:get_agent_instance"),
+            config.get("stream_target", "src.agents.agent:stream"),
+        )
+
+    def start(self):
+        """Spawn the worker processes and wait until each has loaded its target."""
+        context = multiprocessing.get_context("spawn")
+        # Serves the per-request cancel events, which have to be picklable to reach the workers
+        self._manager = context.Manager()
+        self._executors = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.target, self.warmup, self.threads_per_worker, self.stream_target),
+            )
+            for _ in range(self.num_workers)
+        ]
+        # Force every process to start (and load its model) now rather than on the first request
+        for future in [executor.submit(os.getpid) for executor in self._executors]:
+            future.result()
+
+    def shutdown(self):
+        """Stop all worker processes."""
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._executors = []
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def _pick_worker(self, config):
+        """Index of the worker for a request: requests of a session always go to the same worker,
+        which holds the session's history and KV state; others go to the least-loaded worker."""
+        session_id = (config or {}).get("session_id")
+        if session_id:
+            return zlib.crc32(str(session_id).encode("utf-8")) % self.num_workers
+        return min(range(self.num_workers), key=lambda i: self._in_flight[i])
+
+    def _finished(self, index, future):
+        """Done callback of a worker future (runs in the executor's management thread)."""
+        with self._lock:
+            self._in_flight[index] -= 1
+            if not future.cancelled() and future.exception() is None:
+                self._completed[index] += 1
+
+    def _send(self, index, fn, *args):
+        """Submit `fn(*args, deadline, cancel_event)` to a worker.
+
+        The deadline is the current request's cancel token deadline as wall-clock time.
+        Returns (future, cancel_event).
+        """
+        token = current_cancel_token.get()
+        deadline = None
+        if token is not None and token.deadline is not None:
+            deadline = time.time() + (token.deadline - time.monotonic())
+        cancel_event = self._manager.Event()
+        with self._lock:
+            self._in_flight[index] += 1
+        future = self._executors[index].submit(fn, *args, deadline, cancel_event)
+        future.add_done_callback(lambda f: self._finished(index, f))
+        return future, cancel_event
+
+    @staticmethod
+    async def _abandon(future, waiter, cancel_event):
+        """Stop a request the caller no longer waits for: drop it if the worker has not started it,
+        otherwise tell the worker to stop and wait until it has, so the caller's scheduler slot
+        is not handed to another request while the worker is still busy."""
+        if not future.cancel():
+            cancel_event.set()
+            await asyncio.gather(waiter, return_exceptions=True)
+
+    async def submit(self, task, config=None):
+        """Run a request on the least-loaded worker (or the session's worker).
+
+        The deadline of the caller's cancel token (see InferenceScheduler.run) and the
+        cancellation of the calling task reach the worker's model call, which stops decoding.
+        """
+        if not self._executors:
+            raise RuntimeError("Worker pool is not started")
+        index = self._pick_worker(config)
+        future, cancel_event = self._send(index, _run_in_worker, task, config)
+        waiter = asyncio.wrap_future(future)
+        try:
+            return await asyncio.shield(waiter)
+        except asyncio.CancelledError:
+            await self._abandon(future, waiter, cancel_event)
+            raise
+
+    async def stream(self, task, config=None):
+        """Run a streaming request (`stream_target`, an async generator of events) on the
+        least-loaded worker (or the session's worker) and relay its events.
+
+        Events come back over a Manager queue as they are produced; an error raised in the
+        worker is raised here after the events before it. Closing the stream early (client
+        disconnect) stops the worker as in submit().
+        """
+        if not self._executors:
+            raise RuntimeError("Worker pool is not started")
+        index = self._pick_worker(config)
+        events = self._manager.Queue()
+        future, cancel_event = self._send(index, _stream_in_worker, task, config, events)
+        waiter = asyncio.wrap_future(future)
+        try:
+            while True:
+                item = await asyncio.to_thread(_next_event, events, future)
+                if item is None:
+                    break
+                yield item
+            await waiter
+        except (asyncio.CancelledError, GeneratorExit):
+            await self._abandon(future, waiter, cancel_event)
+            raise
+
+    def stats(self):
+        """Return per-worker load."""
+        with self._lock:
+            return {
+                "num_workers": self.num_workers,
+                "threads_per_worker": self.threads_per_worker,
+                "in_flight": list(self._in_flight),
+                "completed": list(self._completed),
+            }
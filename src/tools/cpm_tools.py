@@ -1,7 +1,23 @@
+from typing import Optional, Union
+
 from langchain.tools import tool
+from src.tools.entity_index import get_entity_index
+from src.tools.performance_store import add_store_listener, get_performance_store
+from src.utils.cache import create_cache
+
+# 工具结果缓存，性能数据变更时清空
+tool_cache = create_cache("tool")
+add_store_listener(lambda store: tool_cache.clear())
+
+def _unresolved(suggestions):
+    """名称有歧义时返回给模型的候选取值"""
+    return {
+        "error": "以下参数有多个可能对应的名称，请从 suggestions 中选择后重试",
+        "suggestions": suggestions,
+    }
 
 @tool
-def get_performance_data(model_name: str, engine_name: str, device_type: str) -> list:
+def get_performance_data(model_name: str, engine_name: str, device_type: str) -> Union[list, dict]:
     """获取指定模型、引擎和设备类型的性能数据。
     
     Args:
@@ -10,123 +26,97 @@ def get_performance_data(model_name: str, engine_name: str, device_type: str) ->
         device_type: 设备类型，如 "nvidia/h800" 或 "nvidia/h100"
     
     Returns:
-        匹配输入参数的性能配置列表。
+        匹配输入参数的性能配置列表；名称有歧义时返回 error 和 suggestions（候选名称）。
+    """
+    # 名称不区分大小写和分隔符，简写（如 "qwen3 235b"、"H800"）会被规范为数据集中的名称
+    arguments, suggestions = get_entity_index().canonicalize(
+        model_name=model_name, engine_name=engine_name, device_type=device_type)
+    if suggestions:
+        return _unresolved(suggestions)
+    model_name, engine_name, device_type = (arguments[field] for field in ("model_name", "engine_name", "device_type"))
+    
+    store = get_performance_store()
+    cache_key = (store.version, model_name, engine_name, device_type)
+    cached = tool_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # 从已建索引的性能数据存储中查询，只物化命中的行
+    result = store.lookup(model_name, engine_name, device_type)
+    tool_cache.set(cache_key, result)
+    return result
+
+
+@tool
+def get_best_configs(
+    model_name: str,
+    engine_name: str,
+    device_type: str,
+    objective: str = "throughput",
+    top_k: int = 3,
+    max_node_num: Optional[int] = None,
+    dtype: Optional[str] = None,
+    quantization: Optional[str] = None,
+    max_ttft: Optional[float] = None,
+) -> Union[list, dict]:
+    """按优化目标和约束条件查询最佳配置，只返回排名前 top_k 的性能配置。
+
+    Args:
+        model_name: 模型的完整名称，如 "Qwen/Qwen3-235B-A22B"
+        engine_name: 引擎名称，如 "vllm" 或 "tensorrt-llm"
+        device_type: 设备类型，如 "nvidia/h800" 或 "nvidia/h100"
+        objective: 优化目标，"throughput"（最大吞吐）、"qps"（最大 QPS）、"ttft"（最小首 token 延迟）或 "tpot"（最小每 token 延迟）
+        top_k: 返回的配置数量
+        max_node_num: 可选，最大节点数
+        dtype: 可选，数据类型，如 "bfloat16"
+        quantization: 可选，量化方式
+        max_ttft: 可选，ttft 上限（毫秒）
+
+    Returns:
+        按优化目标从优到劣排序的性能配置列表；名称有歧义时返回 error 和 suggestions（候选名称）。
+    """
+    arguments, suggestions = get_entity_index().canonicalize(
+        model_name=model_name, engine_name=engine_name, device_type=device_type)
+    if suggestions:
+        return _unresolved(suggestions)
+    return get_performance_store().top_k(
+        objective=objective,
+        k=top_k,
+        **arguments,
+        max_node_num=max_node_num,
+        dtype=dtype,
+        quantization=quantization,
+        max_ttft=max_ttft,
+    )
+
+
+@tool
+def compare_configs(model_name: str, engine_name: Optional[str] = None, device_type: Optional[str] = None) -> dict:
+    """对比一个模型在所有引擎和设备上的性能，一次调用即可回答“哪个引擎/设备最好”。
+
+    Args:
+        model_name: 模型的完整名称，如 "Qwen/Qwen3-235B-A22B"
+        engine_name: 可选，只对比该引擎下的设备
+        device_type: 可选，只对比该设备上的引擎
+
+    Returns:
+        groups：按 (engine_name, device_type) 分组的配置数、最大吞吐量/QPS、最小 ttft/tpot
+        和 Pareto 前沿配置数；pareto_frontier：在 ttft、tpot、throughput 上不被其他配置
+        全面超越的配置。两者都是 {"columns": [...], "rows": [[...], ...]} 格式的表格。
+        名称有歧义时返回 error 和 suggestions（候选名称）。
     """
-    # Mock performance data with various configurations
-    mock_data = [
-        {
-            "id": 1,
-            "model_name": "Qwen/Qwen3-235B-A22B",
-            "engine_name": "vllm",
-            "device_type": "nvidia/h800",
-            "node_num": 1,
-            "device_per_node": 8,
-            "scenario": "",
-            "dtype": "bfloat16",
-            "quantization": "",
-            "gpu_memory_utilization": 0.9,
-            "data_parallel_size": 0,
-            "pipeline_parallel_size": 0,
-            "tensor_parallel_size": 8,
-            "enable_expert_parallel": False,
-            "enable_chunked_prefill": False,
-            "ttft": 476.1,
-            "tpot": 20.2,
-            "qps": 0.47,
-            "throughput": 968.73
-        },
-        {
-            "id": 2,
-            "model_name": "Qwen/Qwen3-235B-A22B",
-            "engine_name": "vllm",
-            "device_type": "nvidia/h100",
-            "node_num": 1,
-            "device_per_node": 8,
-            "scenario": "",
-            "dtype": "bfloat16",
-            "quantization": "",
-            "gpu_memory_utilization": 0.9,
-            "data_parallel_size": 0,
-            "pipeline_parallel_size": 0,
-            "tensor_parallel_size": 8,
-            "enable_expert_parallel": False,
-            "enable_chunked_prefill": True,
-            "ttft": 380.5,
-            "tpot": 15.3,
-            "qps": 0.62,
-            "throughput": 1250.45
-        },
-        {
-            "id": 3,
-            "model_name": "Qwen/Qwen3-72B-A22B",
-            "engine_name": "vllm",
-            "device_type": "nvidia/h800",
-            "node_num": 1,
-            "device_per_node": 4,
-            "scenario": "",
-            "dtype": "bfloat16",
-            "quantization": "",
-            "gpu_memory_utilization": 0.9,
-            "data_parallel_size": 0,
-            "pipeline_parallel_size": 0,
-            "tensor_parallel_size": 4,
-            "enable_expert_parallel": False,
-            "enable_chunked_prefill": False,
-            "ttft": 210.3,
-            "tpot": 8.7,
-            "qps": 1.15,
-            "throughput": 1850.22
-        },
-        {
-            "id": 4,
-            "model_name": "Meta/Llama-3-70B-Instruct",
-            "engine_name": "vllm",
-            "device_type": "nvidia/h800",
-            "node_num": 1,
-            "device_per_node": 4,
-            "scenario": "",
-            "dtype": "bfloat16",
-            "quantization": "",
-            "gpu_memory_utilization": 0.9,
-            "data_parallel_size": 0,
-            "pipeline_parallel_size": 0,
-            "tensor_parallel_size": 4,
-            "enable_expert_parallel": False,
-            "enable_chunked_prefill": False,
-            "ttft": 195.7,
-            "tpot": 7.9,
-            "qps": 1.26,
-            "throughput": 1980.56
-        },
-        {
-            "id": 5,
-            "model_name": "Qwen/Qwen3-235B-A22B",
-            "engine_name": "tensorrt-llm",
-            "device_type": "nvidia/h800",
-            "node_num": 1,
-            "device_per_node": 8,
-            "scenario": "",
-            "dtype": "bfloat16",
-            "quantization": "",
-            "gpu_memory_utilization": 0.9,
-            "data_parallel_size": 0,
-            "pipeline_parallel_size": 0,
-            "tensor_parallel_size": 8,
-            "enable_expert_parallel": False,
-            "enable_chunked_prefill": False,
-            "ttft": 420.8,
-            "tpot": 18.5,
-            "qps": 0.52,
-            "throughput": 1050.34
-        }
-    ]
+    arguments, suggestions = get_entity_index().canonicalize(
+        model_name=model_name, engine_name=engine_name, device_type=device_type)
+    if suggestions:
+        return _unresolved(suggestions)
+    model_name, engine_name, device_type = (arguments[field] for field in ("model_name", "engine_name", "device_type"))
     
-    # Filter data by input parameters
-    filtered_data = [
-        item for item in mock_data
-        if item["model_name"] == model_name and
-           item["engine_name"] == engine_name and
-           item["device_type"] == device_type
-    ]
+    store = get_performance_store()
+    cache_key = ("compare", store.version, model_name, engine_name, device_type)
+    cached = tool_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    return filtered_data
+    result = store.compare(model_name, engine_name=engine_name, device_type=device_type)
+    tool_cache.set(cache_key, result)
+    return result
@@ -0,0 +1,149 @@
+# 实体名称解析：把用户或模型写出的模型/引擎/设备名称规范为数据集中的取值
+import re
+
+import numpy as np
+
+from src.tools.performance_store import KEY_FIELDS, get_performance_store
+from src.utils.config import config_manager
+
+# 规范化时去掉的分隔符
+_SEPARATORS = re.compile(r"[\s_./\-:]+")
+
+# n-gram 长度
+_NGRAM = 3
+
+
+def normalize_name(value):
+    """小写并去掉分隔符，如 "Qwen/Qwen3-235B-A22B" -> "qwenqwen3235ba22b" """
+    return _SEPARATORS.sub("", str(value).lower())
+
+
+def _ngrams(text):
+    padded = f"^{text}$"
+    return {padded[i:i + _NGRAM] for i in range(max(len(padded) - _NGRAM + 1, 1))}
+
+
+class _FieldIndex:
+    """单个字段的别名表和 n-gram 倒排索引"""
+
+    def __init__(self, values, aliases):
+        self.values = [value for value in values if value]
+        self.exact = {}
+        for value in self.values:
+            self.exact[normalize_name(value)] = value
+        # "/" 后面的短名称（如 "h800"、"Qwen3-235B-A22B"）只在不冲突时作为别名
+        short_names = {}
+        for value in self.values:
+            if "/" in value:
+                short_names.setdefault(normalize_name(value.rsplit("/", 1)[1]), set()).add(value)
+        for short, owners in short_names.items():
+            if len(owners) == 1 and short not in self.exact:
+                self.exact[short] = owners.pop()
+        for alias, value in (aliases or {}).items():
+            if value in self.values:
+                self.exact[normalize_name(alias)] = value
+
+        # 倒排索引：n-gram -> 包含它的取值编号数组
+        postings = {}
+        gram_counts = []
+        for position, value in enumerate(self.values):
+            grams = _ngrams(normalize_name(value))
+            gram_counts.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self.postings = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self.gram_counts = np.asarray(gram_counts, dtype=np.float64)
+
+    def rank(self, text, limit):
+        """按相似度返回 [(取值, 分数)]，分数综合查询 n-gram 的覆盖率和 Jaccard 相似度"""
+        grams = _ngrams(normalize_name(text))
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits or not self.values:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.values)).astype(np.float64)
+        coverage = shared / len(grams)
+        jaccard = shared / (len(grams) + self.gram_counts - shared)
+        scores = 0.7 * coverage + 0.3 * jaccard
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(self.values[i], float(scores[i])) for i in order if shared[i] > 0]
+
+
+class EntityIndex:
+    """model_name / engine_name / device_type 取值的名称解析索引。
+
+    先查规范化后的精确名称和别名表（大小写、空格和分隔符不敏感，"/" 后的短名称
+    和配置的别名也可命中），未命中时用字符 n-gram 倒排索引打分：最高分足够高且
+    明显领先第二名时直接采用，否则视为有歧义并返回候选列表。
+    """
+
+    def __init__(self, vocabularies, aliases=None, min_score=0.6, min_margin=0.1, max_suggestions=5):
+        aliases = aliases or {}
+        self.fields = {field: _FieldIndex(vocabularies.get(field, []), aliases.get(field))
+                       for field in KEY_FIELDS}
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.max_suggestions = max_suggestions
+
+    @classmethod
+    def from_store(cls, store):
+        """用性能数据存储的词表和 data.aliases 配置构建索引"""
+        config = config_manager.get("data.entity_resolution", {}) or {}
+        return cls(
+            {field: store.distinct(field) for field in KEY_FIELDS},
+            aliases=config_manager.get("data.aliases", {}) or {},
+            min_score=float(config.get("min_score", 0.6)),
+            min_margin=float(config.get("min_margin", 0.1)),
+            max_suggestions=int(config.get("max_suggestions", 5)),
+        )
+
+    def resolve(self, field, value):
+        """解析一个字段的取值
+
+        Returns:
+            (canonical, suggestions)：能确定时 canonical 为数据集中的取值；
+            否则 canonical 为 None，suggestions 为按相似度排序的候选取值
+        """
+        index = self.fields[field]
+        exact = index.exact.get(normalize_name(value))
+        if exact is not None:
+            return exact, []
+        ranked = index.rank(value, self.max_suggestions)
+        if ranked and ranked[0][1] >= self.min_score:
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            if ranked[0][1] - runner_up >= self.min_margin:
+                return ranked[0][0], []
+        # 分数过低的取值与查询基本无关，不作为候选
+        return None, [candidate for candidate, score in ranked if score >= self.min_score / 2]
+
+    def canonicalize(self, **arguments):
+        """规范化多个字段的取值，空值和没有相近候选的取值保持不变
+
+        Returns:
+            (arguments, suggestions)：规范化后的参数，以及有歧义的字段 -> 候选取值
+        """
+        canonical = dict(arguments)
+        suggestions = {}
+        for field, value in arguments.items():
+            if not value or field not in self.fields:
+                continue
+            resolved, candidates = self.resolve(field, value)
+            if resolved is not None:
+                canonical[field] = resolved
+            elif candidates:
+                suggestions[field] = candidates
+        return canonical, suggestions
+
+
+# 全局索引，性能数据存储被替换时重建
+_index_instance = None
+_index_store = None
+
+
+def get_entity_index():
+    """获取与当前性能数据存储匹配的名称解析索引"""
+    global _index_instance, _index_store
+
+    store = get_performance_store()
+    if _index_instance is None or _index_store is not store:
+        _index_instance, _index_store = EntityIndex.from_store(store), store
+    return _index_instance
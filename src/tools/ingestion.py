@@ -0,0 +1,311 @@
+# 性能数据增量导入：监视目录中基准任务持续产出的 JSONL/CSV 结果文件，只读取新增或变更的部分
+import csv
+import fnmatch
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+from src.tools.performance_store import (
+    PerformanceStore,
+    get_performance_store,
+    set_performance_store,
+    validate_record,
+)
+from src.utils.config import config_manager
+
+logger = logging.getLogger(__name__)
+
+# 判断文件是否只是追加写入时比较的文件头字节数
+_HEAD_BYTES = 4096
+
+
+class IngestStats:
+    """导入统计：读取、接受、拒绝和重复的行数，以及解析校验的速度"""
+
+    def __init__(self):
+        self.scans = 0
+        self.files_applied = 0
+        self.rows_read = 0
+        self.rows_accepted = 0
+        self.rows_rejected = 0
+        self.rows_replaced = 0
+        self.parse_seconds = 0.0
+        self.rebuild_seconds = 0.0
+        self.store_appends = 0
+        self.store_rebuilds = 0
+
+    def as_dict(self):
+        return {
+            "scans": self.scans,
+            "files_applied": self.files_applied,
+            "rows_read": self.rows_read,
+            "rows_accepted": self.rows_accepted,
+            "rows_rejected": self.rows_rejected,
+            "rows_replaced": self.rows_replaced,
+            "rows_per_second": self.rows_read / self.parse_seconds if self.parse_seconds else 0.0,
+            "rebuild_seconds": self.rebuild_seconds,
+            "store_appends": self.store_appends,
+            "store_rebuilds": self.store_rebuilds,
+        }
+
+
+class _FileState:
+    """已导入文件的进度：修改时间、大小、已读取到的偏移、文件头摘要、CSV 表头和该文件中的记录（id -> 记录）"""
+
+    def __init__(self):
+        self.mtime_ns = None
+        self.size = 0
+        self.offset = 0
+        self.head_length = 0
+        self.head = b""
+        self.header = None
+        self.records = {}
+
+
+def _head_digest(path, length):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(length)).digest()
+
+
+def _parse_lines(text, extension, header):
+    """解析完整的行，返回 (记录列表, CSV 表头)"""
+    if extension == ".csv":
+        reader = csv.reader(io.StringIO(text))
+        if header is None:
+            header = next(reader, None)
+        return [dict(zip(header, row)) for row in reader if row], header
+    records = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                # 留给校验统计为拒绝的行
+                records.append({"_error": f"invalid JSON: {e}"})
+    return records, header
+
+
+class ResultIngestor:
+    """把目录中的基准结果文件增量合并到性能数据存储
+
+    每个文件记录修改时间、大小和已读取的偏移：文件只是追加了内容时只读取新增的完整行，
+    文件被改写（变小或文件头变化）时重新读取整个文件，文件被删除时移除它提供的记录。
+    记录按 PERFORMANCE_SCHEMA 校验，按 id 去重（后导入的同 id 记录替换先前的记录，包括
+    原始数据文件中的记录）；每个 id 记录所有包含它的文件，只要还有文件包含该记录就保留它
+    （以其中最后导入的为准）。只新增了 id 时把新记录追加到当前存储之后，有记录被替换或移除时
+    用全部记录重建存储；新存储通过 set_performance_store 原子替换，读者始终使用完整的旧存储
+    或新存储，不会被阻塞。
+    """
+
+    def __init__(self, directory, patterns=("*.jsonl", "*.csv"), base_records=None):
+        self.directory = directory
+        self.patterns = tuple(patterns)
+        self.stats = IngestStats()
+        # 原始数据文件中的记录（id -> 记录），未给出时在第一次导入时从当前存储取得
+        self._base = None if base_records is None else {record["id"]: record for record in base_records}
+        # id -> 包含该记录的文件状态列表，按导入顺序排列，最后一个提供当前的记录
+        self._owners = {}
+        self._files = {}
+        # 上次导入构建的存储，以及之后新增的、可以直接追加到它之后的记录
+        self._store = None
+        self._appended = []
+        # 有记录被替换或移除，下次导入需要重建存储
+        self._rebuild = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls):
+        """按 data.ingest 配置创建导入器，未启用时返回 None"""
+        config = config_manager.get("data.ingest", {}) or {}
+        if not config.get("enabled", False) or not config.get("directory"):
+            return None
+        return cls(config["directory"], patterns=config.get("patterns") or ("*.jsonl", "*.csv"))
+
+    def _scan(self):
+        """目录中匹配的文件 -> (修改时间, 大小)"""
+        files = {}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return files
+        for name in sorted(names):
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    def _forget(self, state):
+        """移除文件提供的全部记录，其他文件中仍有的记录改用其中最后导入的版本"""
+        for record_id in state.records:
+            owners = self._owners[record_id]
+            owners.remove(state)
+            if not owners:
+                del self._owners[record_id]
+        if state.records:
+            self._rebuild = True
+        state.records = {}
+
+    def _current_records(self):
+        """原始数据和导入文件中的全部当前记录（id -> 记录）"""
+        records = dict(self._base)
+        for record_id, owners in self._owners.items():
+            records[record_id] = owners[-1].records[record_id]
+        return records
+
+    def _read_file(self, path, state, mtime_ns, size):
+        """读取文件中上次之后新增的完整行，返回新增的记录数"""
+        if size < state.offset or (state.head_length and _head_digest(path, state.head_length) != state.head):
+            # 文件被改写：重新读取整个文件
+            self._forget(state)
+            state.offset = state.head_length = 0
+            state.header = None
+        with open(path, "rb") as f:
+            f.seek(state.offset)
+            data = f.read(size - state.offset)
+        # 只处理到最后一个换行符，正在写入的半行留到下次
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            state.mtime_ns, state.size = mtime_ns, size
+            return 0
+
+        start = time.perf_counter()
+        extension = os.path.splitext(path)[1].lower()
+        records, state.header = _parse_lines(data[:end].decode("utf-8"), extension, state.header)
+        accepted = rejected = 0
+        first_error = None
+        for record in records:
+            try:
+                if "_error" in record:
+                    raise ValueError(record["_error"])
+                record = validate_record(record)
+            except ValueError as e:
+                rejected += 1
+                first_error = first_error or str(e)
+                continue
+            record_id = record["id"]
+            owners = self._owners.setdefault(record_id, [])
+            if owners or record_id in self._base:
+                self.stats.rows_replaced += 1
+                self._rebuild = True
+                if state in owners:
+                    owners.remove(state)
+            else:
+                self._appended.append(record)
+            owners.append(state)
+            state.records[record_id] = record
+            accepted += 1
+        self.stats.parse_seconds += time.perf_counter() - start
+        self.stats.rows_read += len(records)
+        self.stats.rows_accepted += accepted
+        self.stats.rows_rejected += rejected
+        if rejected:
+            logger.warning(f"Rejected {rejected} invalid rows in {path} (first: {first_error})")
+
+        state.offset += end
+        state.mtime_ns, state.size = mtime_ns, size
+        if state.head_length < _HEAD_BYTES:
+            state.head_length = min(_HEAD_BYTES, state.offset)
+            state.head = _head_digest(path, state.head_length)
+        return accepted
+
+    def ingest(self):
+        """导入新增或变更的文件，数据有变化时替换全局存储
+
+        Returns:
+            新的存储，没有变化时返回 None
+        """
+        with self._lock:
+            if self._base is None:
+                store = get_performance_store()
+                self._base = {record["id"]: record for record in store.records(list(range(len(store))))}
+                self._store = store
+            self.stats.scans += 1
+            files = self._scan()
+            changed = False
+            for path in [path for path in self._files if path not in files]:
+                # 文件被删除：移除它提供的记录
+                self._forget(self._files.pop(path))
+                changed = True
+            for path, (mtime_ns, size) in files.items():
+                state = self._files.setdefault(path, _FileState())
+                if (mtime_ns, size) == (state.mtime_ns, state.size):
+                    continue
+                try:
+                    removed = len(state.records)
+                    added = self._read_file(path, state, mtime_ns, size)
+                except (OSError, UnicodeDecodeError, csv.Error) as e:
+                    logger.error(f"Could not ingest {path}: {e}")
+                    continue
+                if added or len(state.records) != removed:
+                    self.stats.files_applied += 1
+                    changed = True
+            if not changed:
+                return None
+
+            start = time.perf_counter()
+            current = get_performance_store()
+            if self._rebuild or current is not self._store:
+                store = PerformanceStore.from_records(list(self._current_records().values()))
+                self.stats.store_rebuilds += 1
+            else:
+                # 只新增了 id：已有的行不变，只转换新记录
+                store = current.append(self._appended)
+                self.stats.store_appends += 1
+            self.stats.rebuild_seconds = time.perf_counter() - start
+            self._store = store
+            self._appended = []
+            self._rebuild = False
+        set_performance_store(store)
+        logger.info(f"Ingested benchmark results: {len(store)} records (store version {store.version})")
+        return store
+
+
+class IngestWatcher:
+    """后台线程定期检查导入目录，有新增或变更的文件时增量导入"""
+
+    def __init__(self, ingestor, interval=5.0):
+        self.ingestor = ingestor
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls):
+        """按 data.ingest 配置创建监视器，未启用时返回 None"""
+        ingestor = ResultIngestor.from_config()
+        if ingestor is None:
+            return None
+        return cls(ingestor, interval=float(config_manager.get("data.ingest.interval_seconds", 5.0)))
+
+    def _run(self):
+        while True:
+            try:
+                self.ingestor.ingest()
+            except Exception as e:
+                logger.error(f"Ingest watcher error: {e}")
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        """在守护线程中开始监视（启动时先导入一次）"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ingest-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止监视并等待线程退出"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
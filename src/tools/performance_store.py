@@ -0,0 +1,431 @@
+# 性能数据存储模块：列式存储 + 哈希索引
+import csv
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from src.utils.config import config_manager
+
+
+# 性能记录字段定义（字段名 -> 类型），顺序即工具返回的字段顺序
+PERFORMANCE_SCHEMA = {
+    "id": int,
+    "model_name": str,
+    "engine_name": str,
+    "device_type": str,
+    "node_num": int,
+    "device_per_node": int,
+    "scenario": str,
+    "dtype": str,
+    "quantization": str,
+    "gpu_memory_utilization": float,
+    "data_parallel_size": int,
+    "pipeline_parallel_size": int,
+    "tensor_parallel_size": int,
+    "enable_expert_parallel": bool,
+    "enable_chunked_prefill": bool,
+    "ttft": float,
+    "tpot": float,
+    "qps": float,
+    "throughput": float,
+}
+
+# 复合索引的键字段
+KEY_FIELDS = ("model_name", "engine_name", "device_type")
+
+# 字符串字段做字典编码，并为每个字段建立二级索引
+CATEGORICAL_FIELDS = tuple(name for name, kind in PERFORMANCE_SCHEMA.items() if kind is str)
+
+# 优化目标：目标名 -> 是否越大越好
+OBJECTIVES = {
+    "throughput": True,
+    "qps": True,
+    "ttft": False,
+    "tpot": False,
+}
+
+# Pareto 前沿的指标：指标名 -> 是否越大越好
+PARETO_OBJECTIVES = {
+    "ttft": False,
+    "tpot": False,
+    "throughput": True,
+}
+
+# 对比结果中每个前沿配置保留的字段
+COMPARE_FIELDS = (
+    "id", "engine_name", "device_type", "node_num", "device_per_node", "tensor_parallel_size",
+    "dtype", "quantization", "ttft", "tpot", "qps", "throughput",
+)
+
+_NUMPY_DTYPES = {int: np.int64, float: np.float64, bool: np.bool_}
+_DEFAULTS = {int: 0, float: 0.0, bool: False, str: ""}
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+# 默认数据文件，随代码一起发布
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "performance_data.jsonl")
+
+
+def _coerce(value, kind):
+    """把原始值（JSON 或 CSV 字符串）转换为字段声明的类型"""
+    if value is None or value == "":
+        return _DEFAULTS[kind]
+    if kind is bool:
+        if isinstance(value, str):
+            return value.strip().lower() in ("1", "true", "yes", "y")
+        return bool(value)
+    if kind is int:
+        return int(float(value))
+    return kind(value)
+
+
+def validate_record(record):
+    """按 PERFORMANCE_SCHEMA 校验并转换一条记录，不合法时抛出 ValueError
+
+    id 和 (model_name, engine_name, device_type) 必须有值；数值字段必须能转换为声明的类型，
+    且为有限的非负数。未声明的字段被忽略，缺少的其他字段取默认值。
+    """
+    if record.get("id") in (None, ""):
+        raise ValueError("missing id")
+    for name in KEY_FIELDS:
+        if not record.get(name):
+            raise ValueError(f"missing {name}")
+    result = {}
+    for name, kind in PERFORMANCE_SCHEMA.items():
+        value = record.get(name)
+        try:
+            result[name] = _coerce(value, kind)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f"invalid {name}: {value!r}")
+        if kind in (int, float) and not (math.isfinite(result[name]) and result[name] >= 0):
+            raise ValueError(f"{name} must be a finite non-negative number: {value!r}")
+    return result
+
+
+def _group_rows(keys):
+    """按整数键分组，返回 {键: 行号数组}，一次排序完成"""
+    if len(keys) == 0:
+        return {}
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = np.concatenate(([0], boundaries))
+    groups = np.split(order, boundaries)
+    return {int(sorted_keys[start]): rows for start, rows in zip(starts, groups)}
+
+
+def pareto_mask(values):
+    """返回不被任何其他行支配的行（Pareto 前沿）的布尔掩码
+
+    values 为 (n, m) 数组，每列指标都已转换为“越小越好”。行 j 支配行 i 当且仅当
+    j 在所有指标上都不差于 i，且至少一个指标严格更好。每轮取一个尚未处理的候选点，
+    用一次向量化比较删掉它支配的全部行，耗时与 n * 前沿大小成正比。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    candidates = np.arange(len(values))
+    remaining = values
+    index = 0
+    while index < len(remaining):
+        pivot = remaining[index]
+        # 保留至少一个指标严格更好或与候选点完全相同的行，其余行被候选点支配
+        keep = (remaining < pivot).any(axis=1) | (remaining == pivot).all(axis=1)
+        candidates = candidates[keep]
+        remaining = remaining[keep]
+        index = int(keep[:index].sum()) + 1
+    mask = np.zeros(len(values), dtype=bool)
+    mask[candidates] = True
+    return mask
+
+
+def table_records(table):
+    """把 {"columns", "rows"} 格式的紧凑表格还原为记录字典列表"""
+    return [dict(zip(table["columns"], row)) for row in table["rows"]]
+
+
+class PerformanceStore:
+    """列式存储的性能数据。
+
+    字符串字段做字典编码（codes + 词表），数值字段存为 NumPy 数组；
+    构建时一次性生成 (model_name, engine_name, device_type) 复合哈希索引
+    以及每个字符串字段的二级索引，查询只需一次字典查找。
+    """
+
+    def __init__(self, columns, vocabularies, version=0):
+        self.columns = columns
+        self.vocabularies = vocabularies
+        self.version = version
+        self._size = len(columns["id"])
+        self._build_indexes()
+
+    @classmethod
+    def from_records(cls, records, version=0):
+        """从记录字典列表构建存储"""
+        raw = {name: [] for name in PERFORMANCE_SCHEMA}
+        for record in records:
+            for name, kind in PERFORMANCE_SCHEMA.items():
+                raw[name].append(_coerce(record.get(name), kind))
+
+        columns = {}
+        vocabularies = {}
+        for name, kind in PERFORMANCE_SCHEMA.items():
+            if kind is str:
+                vocab, codes = np.unique(np.asarray(raw[name], dtype=object).astype(str), return_inverse=True)
+                vocabularies[name] = vocab.tolist()
+                columns[name] = codes.astype(np.int32).reshape(-1)
+            else:
+                columns[name] = np.asarray(raw[name], dtype=_NUMPY_DTYPES[kind])
+        return cls(columns, vocabularies, version=version)
+
+    def append(self, records, version=0):
+        """返回在本存储的行之后追加记录的新存储（本存储不变）
+
+        已有行的列和字符串编码直接复用，只转换新增的记录；新出现的字符串取值追加到词表末尾。
+        """
+        columns = {}
+        vocabularies = {}
+        for name, kind in PERFORMANCE_SCHEMA.items():
+            values = [_coerce(record.get(name), kind) for record in records]
+            if kind is str:
+                vocab = list(self.vocabularies[name])
+                codes = dict(self._codes[name])
+                for value in values:
+                    if value not in codes:
+                        codes[value] = len(vocab)
+                        vocab.append(value)
+                vocabularies[name] = vocab
+                appended = np.asarray([codes[value] for value in values], dtype=np.int32)
+            else:
+                appended = np.asarray(values, dtype=_NUMPY_DTYPES[kind])
+            columns[name] = np.concatenate([self.columns[name], appended])
+        return type(self)(columns, vocabularies, version=version)
+
+    @classmethod
+    def from_file(cls, path, version=0):
+        """从 JSONL 或 CSV 文件加载"""
+        return cls.from_records(read_records(path), version=version)
+
+    def _build_indexes(self):
+        """构建复合键索引和二级索引"""
+        self._codes = {name: {value: code for code, value in enumerate(self.vocabularies[name])}
+                       for name in CATEGORICAL_FIELDS}
+
+        # 二级索引：字段 -> {值: 行号数组}
+        self._secondary = {}
+        for name in CATEGORICAL_FIELDS:
+            vocab = self.vocabularies[name]
+            groups = _group_rows(self.columns[name])
+            self._secondary[name] = {vocab[code]: rows for code, rows in groups.items()}
+
+        # 复合索引：把三个字段的编码合成一个 int64 键后分组
+        model_codes, engine_codes, device_codes = (self.columns[name].astype(np.int64) for name in KEY_FIELDS)
+        n_engine = max(len(self.vocabularies["engine_name"]), 1)
+        n_device = max(len(self.vocabularies["device_type"]), 1)
+        composite = (model_codes * n_engine + engine_codes) * n_device + device_codes
+        self._key_index = {}
+        for key, rows in _group_rows(composite).items():
+            model_code, rest = divmod(key, n_engine * n_device)
+            engine_code, device_code = divmod(rest, n_device)
+            self._key_index[(
+                self.vocabularies["model_name"][model_code],
+                self.vocabularies["engine_name"][engine_code],
+                self.vocabularies["device_type"][device_code],
+            )] = rows
+
+    def __len__(self):
+        return self._size
+
+    def rows_for_key(self, model_name, engine_name, device_type):
+        """返回复合键对应的行号数组"""
+        return self._key_index.get((model_name, engine_name, device_type), _EMPTY_ROWS)
+
+    def rows_for(self, field, value):
+        """通过二级索引返回某个字段取值对应的行号数组"""
+        return self._secondary[field].get(value, _EMPTY_ROWS)
+
+    def distinct(self, field):
+        """返回字符串字段的全部取值"""
+        return list(self.vocabularies[field])
+
+    def column(self, field, rows=None):
+        """返回字段的原始值数组（字符串字段会解码）"""
+        values = self.columns[field] if rows is None else self.columns[field][rows]
+        if field in self.vocabularies:
+            vocab = np.asarray(self.vocabularies[field], dtype=object)
+            return vocab[values] if len(vocab) else np.empty(0, dtype=object)
+        return values
+
+    def records(self, rows):
+        """把行号数组还原为记录字典列表（仅物化命中的行）"""
+        if len(rows) == 0:
+            return []
+        names = list(PERFORMANCE_SCHEMA)
+        values = [self.column(name, rows).tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def lookup(self, model_name, engine_name, device_type):
+        """按 (model_name, engine_name, device_type) 精确查询"""
+        return self.records(self.rows_for_key(model_name, engine_name, device_type))
+
+    def candidate_rows(self, model_name=None, engine_name=None, device_type=None):
+        """用索引缩小候选行：三个键齐全时走复合索引，否则求二级索引交集"""
+        if model_name and engine_name and device_type:
+            return self.rows_for_key(model_name, engine_name, device_type)
+
+        rows = None
+        for field, value in zip(KEY_FIELDS, (model_name, engine_name, device_type)):
+            if not value:
+                continue
+            matched = self.rows_for(field, value)
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        return np.arange(self._size) if rows is None else rows
+
+    def top_k(self, objective="throughput", k=3, model_name=None, engine_name=None, device_type=None,
+              max_node_num=None, dtype=None, quantization=None, max_ttft=None):
+        """按优化目标返回满足约束的前 k 条记录（从优到劣）
+
+        约束条件在候选行上以向量化掩码计算，排序用 argpartition 只对前 k 个做完整排序。
+        """
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective '{objective}', expected one of {sorted(OBJECTIVES)}")
+
+        rows = self.candidate_rows(model_name, engine_name, device_type)
+        if len(rows) == 0 or k <= 0:
+            return []
+
+        mask = np.ones(len(rows), dtype=bool)
+        if max_node_num is not None:
+            mask &= self.columns["node_num"][rows] <= max_node_num
+        if max_ttft is not None:
+            mask &= self.columns["ttft"][rows] <= max_ttft
+        for field, value in (("dtype", dtype), ("quantization", quantization)):
+            if value:
+                code = self._codes[field].get(value)
+                if code is None:
+                    return []
+                mask &= self.columns[field][rows] == code
+        rows = rows[mask]
+        if len(rows) == 0:
+            return []
+
+        # 统一转成“越小越好”再取前 k
+        scores = self.columns[objective][rows]
+        if OBJECTIVES[objective]:
+            scores = -scores
+        if k < len(rows):
+            best = np.argpartition(scores, k - 1)[:k]
+        else:
+            best = np.arange(len(rows))
+        best = best[np.argsort(scores[best], kind="stable")]
+        return self.records(rows[best])
+
+    def compare(self, model_name, engine_name=None, device_type=None):
+        """对比一个模型在各引擎和设备上的表现
+
+        一次向量化计算得到按 (engine_name, device_type) 分组的汇总，以及全部配置在
+        ttft/tpot/throughput 上的 Pareto 前沿。两者都以 {"columns", "rows"} 紧凑表格返回，
+        分组按最大吞吐量降序，前沿配置按吞吐量降序。
+        """
+        rows = self.candidate_rows(model_name, engine_name, device_type) if model_name else _EMPTY_ROWS
+        group_columns = ["engine_name", "device_type", "configs", "max_throughput", "max_qps",
+                         "min_ttft", "min_tpot", "pareto_configs"]
+        result = {
+            "model_name": model_name,
+            "groups": {"columns": group_columns, "rows": []},
+            "pareto_frontier": {"columns": list(COMPARE_FIELDS), "rows": []},
+        }
+        if len(rows) == 0:
+            return result
+
+        # Pareto 前沿：所有指标统一为越小越好
+        metrics = np.column_stack([
+            -self.columns[name][rows] if maximize else self.columns[name][rows]
+            for name, maximize in PARETO_OBJECTIVES.items()
+        ])
+        on_frontier = pareto_mask(metrics)
+
+        # 分组汇总：排序后用 reduceat 一次算出每组的聚合值
+        n_device = max(len(self.vocabularies["device_type"]), 1)
+        groups = self.columns["engine_name"][rows].astype(np.int64) * n_device + self.columns["device_type"][rows]
+        order = np.argsort(groups, kind="stable")
+        sorted_groups = groups[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_groups)) + 1))
+        ordered = rows[order]
+        aggregates = [
+            np.diff(np.append(starts, len(order))),
+            np.maximum.reduceat(self.columns["throughput"][ordered], starts),
+            np.maximum.reduceat(self.columns["qps"][ordered], starts),
+            np.minimum.reduceat(self.columns["ttft"][ordered], starts),
+            np.minimum.reduceat(self.columns["tpot"][ordered], starts),
+            np.add.reduceat(on_frontier[order].astype(np.int64), starts),
+        ]
+        engine_codes, device_codes = np.divmod(sorted_groups[starts], n_device)
+        engines = np.asarray(self.vocabularies["engine_name"], dtype=object)[engine_codes]
+        devices = np.asarray(self.vocabularies["device_type"], dtype=object)[device_codes]
+        group_order = np.argsort(-aggregates[1], kind="stable")
+        result["groups"]["rows"] = [
+            list(row) for row in zip(*(column[group_order].tolist() for column in [engines, devices] + aggregates))
+        ]
+
+        frontier = rows[on_frontier]
+        frontier = frontier[np.argsort(-self.columns["throughput"][frontier], kind="stable")]
+        result["pareto_frontier"]["rows"] = [
+            list(row) for row in zip(*(self.column(name, frontier).tolist() for name in COMPARE_FIELDS))
+        ]
+        return result
+
+
+def read_records(path):
+    """逐行读取 JSONL 或 CSV 文件中的记录"""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if extension == ".csv":
+            yield from csv.DictReader(f)
+        elif extension in (".jsonl", ".ndjson"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported performance data format: {path}")
+
+
+# 全局单例，首次使用时从配置的数据文件加载
+_store_instance = None
+_store_lock = threading.Lock()
+
+# 数据变更监听器（如缓存失效回调）
+_store_listeners = []
+
+
+def get_performance_store():
+    """获取（必要时加载）全局性能数据存储"""
+    global _store_instance
+
+    if _store_instance is not None:
+        return _store_instance
+
+    with _store_lock:
+        if _store_instance is None:
+            path = config_manager.get("data.performance_path") or DEFAULT_DATA_PATH
+            _store_instance = PerformanceStore.from_file(path)
+    return _store_instance
+
+
+def set_performance_store(store):
+    """替换全局性能数据存储（引用赋值是原子的，读者不会被阻塞）
+
+    新存储的版本号总是大于旧存储，替换后通知所有监听器。
+    """
+    global _store_instance
+    if _store_instance is not None and store.version <= _store_instance.version:
+        store.version = _store_instance.version + 1
+    _store_instance = store
+    for listener in list(_store_listeners):
+        listener(store)
+
+
+def add_store_listener(listener):
+    """注册性能数据变更回调，参数为新的存储"""
+    _store_listeners.append(listener)
@@ -0,0 +1,164 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from src.utils.config import config_manager
+
+
+def estimate_size(obj, _seen=None):
+    """Roughly estimate the memory footprint of an object in bytes."""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(k, _seen) + estimate_size(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, _seen) for item in obj)
+    return size
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache whose entries expire after a TTL.
+
+    Besides the entry count, the total size of the stored entries can be bounded with
+    `max_memory_bytes`; entry sizes come from `sizeof(value)` (default: estimate_size of
+    key and value) and are measured when the entry is set. Entries for which `pinned(value)`
+    is true (e.g. in use) are neither evicted nor expired until they are released.
+    """
+
+    def __init__(self, max_size=256, ttl=300.0, clock=time.monotonic, max_memory_bytes=None, sizeof=None,
+                 pinned=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_memory_bytes = max_memory_bytes
+        self._sizeof = sizeof
+        self._pinned = pinned
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the cached value, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at, size = entry
+                if expires_at > self._clock() or self._is_pinned(value):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self._memory -= size
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if full."""
+        if self.max_size <= 0:
+            return
+        size = self._sizeof(value) if self._sizeof is not None else estimate_size(key) + estimate_size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._memory -= old[2]
+            self._entries[key] = (value, self._clock() + self.ttl, size)
+            self._memory += size
+            self._evict()
+
+    def _is_pinned(self, value):
+        return self._pinned is not None and self._pinned(value)
+
+    def _evict(self):
+        """Drop least recently used entries while over the size or memory limit (lock held).
+
+        Pinned entries are skipped, so the cache can stay over its limits while they are in use.
+        """
+        candidates = None
+        while self._entries and (
+            len(self._entries) > max(self.max_size, 0)
+            or (self.max_memory_bytes is not None and self._memory > self.max_memory_bytes)
+        ):
+            if self._pinned is None:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            else:
+                if candidates is None:
+                    candidates = iter(list(self._entries))
+                key = next(candidates, None)
+                if key is None:
+                    break
+                value, _, evicted_size = self._entries[key]
+                if self._pinned(value):
+                    continue
+                del self._entries[key]
+            self._memory -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Remove an entry and return its value, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            value, expires_at, size = entry
+            self._memory -= size
+            return value if expires_at > self._clock() else default
+
+    def resize(self, max_size=None, ttl=None):
+        """Change the size limit and/or TTL, evicting least recently used entries over the new limit.
+
+        A new TTL applies to entries stored after the change.
+        """
+        with self._lock:
+            if ttl is not None:
+                self.ttl = ttl
+            if max_size is not None:
+                self.max_size = max_size
+            self._evict()
+
+    def clear(self):
+        """Drop all entries (statistics are kept)."""
+        with self._lock:
+            self._entries.clear()
+            self._memory = 0
+
+    def stats(self):
+        """Return hit ratio and memory usage statistics."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "memory_bytes": self._memory,
+            "max_memory_bytes": self.max_memory_bytes,
+        }
+
+
+def _cache_settings(config):
+    config = config or {}
+    return {"max_size": int(config.get("max_size", 256)), "ttl": float(config.get("ttl", 300))}
+
+
+def create_cache(name):
+    """Create a cache sized from the `cache.<name>` configuration section.
+
+    The cache is resized in place when the configuration is reloaded.
+    """
+    cache = TTLCache(**_cache_settings(config_manager.get(f"cache.{name}", {})))
+    config_manager.add_reload_listener(
+        lambda snapshot: cache.resize(**_cache_settings(snapshot.get(f"cache.{name}", {}))))
+    return cache
@@ -1,70 +1,354 @@
+import json
+import logging
 import os
+import re
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+
 import yaml
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 load_dotenv()
 
+# Settings read only when the model is loaded; changing them in a running process has no effect
+RESTART_ONLY_KEYS = (
+    "model.name",
+    "model.path",
+    "model.cache_dir",
+    "model.device",
+    "model.quantization",
+    "model.prompt_cache",
+    "model.speculative",
+    "model.params.max_length",
+    "model.params.n_threads",
+    "model.params.n_threads_batch",
+    "model.params.n_batch",
+    "model.params.n_gpu_layers",
+    "model.params.use_mmap",
+    "data.ingest",
+    "workers",
+)
+
+
+def _lookup(configs, config_path, default=None):
+    """Look up a dotted path (e.g., 'model.params.max_length') in nested mappings."""
+    value = configs
+    for part in config_path.split("."):
+        if isinstance(value, Mapping) and part in value:
+            value = value[part]
+        else:
+            return default
+    return value
+
+
+# A "key: value" line in a YAML file, possibly commented out ("# key: value")
+_KEY_LINE = re.compile(r"^(\s*)(#\s*)?([A-Za-z0-9_]+):(.*)$")
+
+
+def _set_yaml_value(lines, config_path, value):
+    """Set a dotted key in the lines of a YAML file, keeping comments and layout.
+    
+    An existing "key: value" line is replaced in place (keeping its trailing comment),
+    a commented-out "# key: value" line in the same mapping is uncommented, and
+    otherwise the key is appended after the last entry of its mapping.
+    """
+    start, end, indent = 0, len(lines), 0
+    parts = config_path.split(".")
+    for depth, key in enumerate(parts):
+        child_indent = indent if depth == 0 else None
+        found = None
+        commented = []
+        last_entry = start - 1
+        for i in range(start, end):
+            match = _KEY_LINE.match(lines[i])
+            if match is None:
+                if lines[i].strip() and not lines[i].lstrip().startswith("#"):
+                    last_entry = i
+                continue
+            line_indent = len(match.group(1))
+            if match.group(2):
+                if match.group(3) == key:
+                    commented.append((i, line_indent))
+                continue
+            if child_indent is None:
+                child_indent = line_indent
+            if line_indent < child_indent:
+                break
+            last_entry = i
+            if line_indent == child_indent and match.group(3) == key and found is None:
+                found = i
+        if child_indent is None:
+            raise ValueError(f"Cannot set {config_path}: {'.'.join(parts[:depth])} is not a mapping")
+        prefix = " " * child_indent
+        
+        if depth < len(parts) - 1:
+            if found is None:
+                raise ValueError(f"Cannot set {config_path}: {'.'.join(parts[:depth + 1])} not found")
+            # The nested mapping runs until the next line indented at or above its key
+            start, end, indent = found + 1, end, child_indent
+            for i in range(found + 1, end):
+                stripped = lines[i].strip()
+                if stripped and not stripped.startswith("#") and len(lines[i]) - len(lines[i].lstrip()) <= child_indent:
+                    end = i
+                    break
+            continue
+        
+        text = f"{prefix}{key}: {json.dumps(value)}"
+        if found is not None:
+            comment = re.search(r"\s+#.*$", _KEY_LINE.match(lines[found]).group(4))
+            lines[found] = text + (comment.group(0) if comment else "")
+        else:
+            same_level = [i for i, line_indent in commented if line_indent == child_indent]
+            if same_level:
+                lines[same_level[0]] = text
+            else:
+                lines.insert(last_entry + 1, text)
+
+
+def _freeze(value):
+    """Recursively convert dicts to read-only mappings and lists to tuples."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+class ConfigSnapshot:
+    """Immutable view of one version of the configuration.
+
+    Readers that need several settings to be consistent with each other take one
+    snapshot and read from it, so a concurrent reload never mixes old and new values.
+    """
+
+    def __init__(self, configs, version=0):
+        self._configs = _freeze(configs)
+        self.version = version
+
+    def get(self, config_path, default=None):
+        """Get a configuration value by path (e.g., 'model.params.temperature')."""
+        return _lookup(self._configs, config_path, default)
+
+
 class ConfigManager:
     """Configuration manager for loading and accessing YAML configuration files."""
     
     def __init__(self):
         self.configs = {}
         self.config_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config")
+        self._snapshot = ConfigSnapshot({})
+        self._listeners = []
+        self._lock = threading.Lock()
+    
+    def _read_config(self, config_name):
+        """Read a configuration file by name and return its content."""
+        config_path = os.path.join(self.config_dir, f"{config_name}_config.yaml")
+        if not os.path.exists(config_path):
+            raise FileNotFoundError(f"Configuration file not found: {config_path}")
+        with open(config_path, "r", encoding="utf-8") as f:
+            config_content = yaml.safe_load(f)
+        # 如果配置文件的内容是一个字典，并且包含与配置文件名称相同的键，
+        # 则直接使用该键的值作为配置，否则使用整个配置文件的内容
+        if isinstance(config_content, dict) and config_name in config_content:
+            return config_content[config_name]
+        return config_content
+    
+    def _read_all_configs(self):
+        """Read all configuration files into a new dict."""
+        configs = {}
+        for file in sorted(os.listdir(self.config_dir)):
+            if file.endswith("_config.yaml"):
+                config_name = file.replace("_config.yaml", "")
+                configs[config_name] = self._read_config(config_name)
+        return configs
         
     def load_config(self, config_name):
         """Load a configuration file by name."""
-        config_path = os.path.join(self.config_dir, f"{config_name}_config.yaml")
-        if os.path.exists(config_path):
-            with open(config_path, "r", encoding="utf-8") as f:
-                config_content = yaml.safe_load(f)
-                # 如果配置文件的内容是一个字典，并且包含与配置文件名称相同的键，
-                # 则直接使用该键的值作为配置，否则使用整个配置文件的内容
-                if isinstance(config_content, dict) and config_name in config_content:
-                    self.configs[config_name] = config_content[config_name]
-                else:
-                    self.configs[config_name] = config_content
-        else:
-            raise FileNotFoundError(f"Configuration file not found: {config_path}")
+        self.configs[config_name] = self._read_config(config_name)
+        self._refresh_snapshot()
     
     def load_all_configs(self):
         """Load all configuration files."""
-        config_files = os.listdir(self.config_dir)
-        for file in config_files:
-            if file.endswith("_config.yaml"):
-                config_name = file.replace("_config.yaml", "")
-                self.load_config(config_name)
+        self.configs.update(self._read_all_configs())
+        self._refresh_snapshot()
     
     def get(self, config_path, default=None):
         """Get a configuration value by path (e.g., 'model.params.max_length')."""
-        parts = config_path.split(".")
-        value = self.configs
+        return _lookup(self.configs, config_path, default)
+    
+    def write_values(self, config_name, values):
+        """Write values into a configuration file, keeping its comments and layout.
         
-        for part in parts:
-            if isinstance(value, dict) and part in value:
-                value = value[part]
-            else:
-                return default
+        Args:
+            config_name: Configuration file name (e.g., 'model' for model_config.yaml)
+            values: Dotted paths as they appear in the file (e.g., 'model.params.n_threads') -> value
+            
+        Returns:
+            The path of the updated file. The running configuration is not changed; the
+            config watcher (or the next start) picks up the new file.
+        """
+        config_path = os.path.join(self.config_dir, f"{config_name}_config.yaml")
+        with open(config_path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        for key, value in values.items():
+            _set_yaml_value(lines, key, value)
+        text = "\n".join(lines) + "\n"
+        written = yaml.safe_load(text)
+        for key, value in values.items():
+            if _lookup(written, key) != value:
+                raise ValueError(f"Could not write {key} to {config_path}")
+        tmp_path = f"{config_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, config_path)
+        return config_path
+    
+    def snapshot(self):
+        """Return the current immutable configuration snapshot."""
+        return self._snapshot
+    
+    def _refresh_snapshot(self):
+        with self._lock:
+            self._snapshot = ConfigSnapshot(self.configs, self._snapshot.version + 1)
+    
+    def add_reload_listener(self, listener):
+        """Register a callback invoked with the new snapshot after each successful reload."""
+        self._listeners.append(listener)
+    
+    def reload(self):
+        """Re-read all configuration files and atomically swap in the new configuration.
+        
+        The loaded model is not touched: settings read per call (sampling parameters) and
+        settings applied by reload listeners (cache sizes) take effect immediately, while
+        changes to RESTART_ONLY_KEYS are logged and only apply after a restart. If a file
+        cannot be read or parsed, the current configuration is kept.
         
-        return value
+        Returns:
+            True if the new configuration was applied.
+        """
+        try:
+            configs = self._read_all_configs()
+        except Exception as e:
+            logger.error(f"Config reload failed, keeping the current configuration: {e}")
+            return False
+        self.merge_with_env(configs)
+        
+        with self._lock:
+            previous = self._snapshot
+            self.configs = configs
+            self._snapshot = ConfigSnapshot(configs, previous.version + 1)
+            snapshot = self._snapshot
+        
+        changed = [key for key in RESTART_ONLY_KEYS if previous.get(key) != snapshot.get(key)]
+        if changed:
+            logger.warning(f"Config changes to {', '.join(changed)} only take effect after a restart")
+        logger.info(f"Configuration reloaded (version {snapshot.version})")
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Config reload listener failed: {e}")
+        return True
     
     def get_env(self, env_var, default=None):
         """Get an environment variable value."""
         return os.getenv(env_var, default)
     
-    def merge_with_env(self):
-        """Merge configuration with environment variables."""
+    def merge_with_env(self, configs=None):
+        """Merge configuration with environment variables.
+        
+        Merges into the given configuration dict, or into the current configuration
+        (refreshing the snapshot) when none is given.
+        """
+        refresh = configs is None
+        if configs is None:
+            configs = self.configs
         # Merge model configuration with environment variables
-        if "model" in self.configs:
-            self.configs["model"]["name"] = self.get_env("MODEL_NAME", self.configs["model"].get("name"))
-            self.configs["model"]["path"] = self.get_env("MODEL_PATH", self.configs["model"].get("path"))
-            if "params" in self.configs["model"]:
-                max_length = self.get_env("MODEL_MAX_LENGTH", self.configs["model"]["params"].get("max_length"))
+        if "model" in configs:
+            configs["model"]["name"] = self.get_env("MODEL_NAME", configs["model"].get("name"))
+            configs["model"]["path"] = self.get_env("MODEL_PATH", configs["model"].get("path"))
+            if "params" in configs["model"]:
+                max_length = self.get_env("MODEL_MAX_LENGTH", configs["model"]["params"].get("max_length"))
                 if max_length is not None:
-                    self.configs["model"]["params"]["max_length"] = int(max_length)
-                temperature = self.get_env("MODEL_TEMPERATURE", self.configs["model"]["params"].get("temperature"))
+                    configs["model"]["params"]["max_length"] = int(max_length)
+                temperature = self.get_env("MODEL_TEMPERATURE", configs["model"]["params"].get("temperature"))
                 if temperature is not None:
-                    self.configs["model"]["params"]["temperature"] = float(temperature)
+                    configs["model"]["params"]["temperature"] = float(temperature)
+                for key in ("n_threads", "n_threads_batch", "n_batch"):
+                    value = self.get_env(f"MODEL_{key.upper()}", configs["model"]["params"].get(key))
+                    if value is not None:
+                        configs["model"]["params"][key] = int(value)
+        if "logging" in configs:
+            configs["logging"]["level"] = self.get_env("LOG_LEVEL", configs["logging"].get("level"))
+        if refresh:
+            self._refresh_snapshot()
+
+
+class ConfigWatcher:
+    """Background thread that polls the *_config.yaml files and reloads the configuration
+    when one of them is added, removed or modified."""
+    
+    def __init__(self, manager, interval=2.0):
+        self.manager = manager
+        self.interval = interval
+        self._mtimes = self._scan()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @classmethod
+    def from_config(cls, manager):
+        """Create a watcher from the `reload` configuration section, or None if disabled."""
+        config = manager.get("reload", {}) or {}
+        if not config.get("enabled", False):
+            return None
+        return cls(manager, interval=float(config.get("interval_seconds", 2.0)))
+    
+    def _scan(self):
+        mtimes = {}
+        for file in os.listdir(self.manager.config_dir):
+            if file.endswith("_config.yaml"):
+                try:
+                    mtimes[file] = os.stat(os.path.join(self.manager.config_dir, file)).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+        return mtimes
+    
+    def check(self):
+        """Reload if any configuration file changed since the last check.
+        
+        Returns:
+            True if a reload was applied.
+        """
+        mtimes = self._scan()
+        if mtimes == self._mtimes:
+            return False
+        self._mtimes = mtimes
+        return self.manager.reload()
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Config watcher error: {e}")
+    
+    def start(self):
+        """Start polling in a daemon thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        """Stop polling and wait for the thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
         
 
 
@@ -0,0 +1,114 @@
+import atexit
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from src.utils.config import config_manager
+
+# With the worker pool enabled, model and tool calls run in the worker processes. Every process
+# then records its metrics in PROMETHEUS_MULTIPROC_DIR (inherited by the spawned workers) and
+# render_metrics merges them. The directory must be set before prometheus_client is imported.
+if (config_manager.get("workers", {}) or {}).get("enabled", False) and not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="cpm-metrics-")
+    atexit.register(shutil.rmtree, os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Latency buckets from sub-millisecond parsing up to multi-second agent runs
+_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+QUEUE_WAIT_SECONDS = Histogram(
+    "cpm_queue_wait_seconds",
+    "Time a request waits for an inference slot.",
+    buckets=_LATENCY_BUCKETS,
+)
+PREFILL_SECONDS = Histogram(
+    "cpm_prefill_seconds",
+    "Time from the start of a model call to its first generated token.",
+    buckets=_LATENCY_BUCKETS,
+)
+DECODE_TOKENS_PER_SECOND = Histogram(
+    "cpm_decode_tokens_per_second",
+    "Decode throughput of a model call after its first token.",
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500),
+)
+TOOL_LATENCY_SECONDS = Histogram(
+    "cpm_tool_latency_seconds",
+    "Tool execution time.",
+    ["tool"],
+    buckets=_LATENCY_BUCKETS,
+)
+MIDDLEWARE_PARSE_SECONDS = Histogram(
+    "cpm_middleware_parse_seconds",
+    "Time spent extracting tool calls from a model response.",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+REQUEST_LATENCY_SECONDS = Histogram(
+    "cpm_request_latency_seconds",
+    "End-to-end request latency.",
+    ["endpoint"],
+    buckets=_LATENCY_BUCKETS,
+)
+PROMPT_TOKENS = Histogram(
+    "cpm_prompt_tokens",
+    "Prompt tokens of the last model call of a request, as sent (kind=sent) and with tool results "
+    "as uncompacted JSON (kind=uncompacted).",
+    ["kind"],
+    buckets=(64, 128, 256, 512, 768, 1024, 1536, 2048, 3072, 4096, 8192, 16384),
+)
+AGENT_TURNS = Counter(
+    "cpm_agent_turns_total",
+    "Model calls made by the agent.",
+)
+SPECULATIVE_TOKENS = Counter(
+    "cpm_speculative_tokens_total",
+    "Tokens proposed by the speculative draft model (kind=drafted) and accepted by the main model "
+    "(kind=accepted).",
+    ["kind"],
+)
+CANCELLED_GENERATIONS = Counter(
+    "cpm_cancelled_generations_total",
+    "Model calls stopped early because their request was cancelled (reason=disconnected) or "
+    "ran past its deadline (reason=deadline).",
+    ["reason"],
+)
+CANCELLED_TOKENS_SAVED = Counter(
+    "cpm_cancelled_tokens_saved_total",
+    "Decode tokens left unused in the max_tokens budget of model calls stopped by cancellation.",
+)
+TOOL_CALL_FAILURES = Counter(
+    "cpm_tool_call_failures_total",
+    "Tool calls that could not be parsed or whose execution failed.",
+    ["stage"],
+)
+# Export both failure series from the start so rates are defined before the first failure
+for _stage in ("parse", "execution"):
+    TOOL_CALL_FAILURES.labels(stage=_stage)
+for _kind in ("drafted", "accepted"):
+    SPECULATIVE_TOKENS.labels(kind=_kind)
+
+
+@contextmanager
+def observe_seconds(histogram):
+    """Observe the wall time of the enclosed block on `histogram`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+
+def render_metrics():
+    """Return the metrics in the Prometheus text format and its content type.
+
+    In multiprocess mode the values of all processes (front end and workers) are merged.
+    """
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
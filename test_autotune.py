@@ -0,0 +1,91 @@
+# llama.cpp 运行参数自动调优测试文件
+import pytest
+import yaml
+
+from benchmarks.autotune import tune, tuned_values
+from src.utils.config import ConfigManager
+
+MODEL_CONFIG = """# Model Configuration
+model:
+  name: "test"
+  params:
+    max_length: 2048
+    # CPU threads (unset lets llama.cpp choose)
+    # n_threads: 8
+    n_batch: 512  # prefill batch
+  # Quantization configuration
+  quantization:
+    bits: 4
+    type: "q4_k_s"  # q4_k_s, q8_0
+"""
+
+
+def fake_measure(calls):
+    """解码速度只取决于 n_threads（4 最快），预填充速度取决于 n_threads_batch 和 n_batch，q8_0 整体更慢"""
+
+    def measure(quant, n_threads, n_threads_batch, n_batch):
+        calls.append((quant, n_threads, n_threads_batch, n_batch))
+        scale = 0.5 if quant == "q8_0" else 1.0
+        return {
+            "prompt_tokens": 1000,
+            "prefill_tokens_per_second": scale * 100 * n_threads_batch * min(n_batch, 256) / 256,
+            "decode_tokens_per_second": scale * 10 * min(n_threads, 4) / (1 + (n_threads > 4)),
+        }
+
+    return measure
+
+
+class TestTune:
+    """参数搜索测试类"""
+
+    def test_picks_fastest_settings(self):
+        """测试依次选出解码最快的 n_threads、预填充最快的 n_threads_batch 和 n_batch，并按单次调用耗时比较量化版本"""
+        calls = []
+        best, trials = tune(fake_measure(calls), ["q8_0", "q4_k_s"], [2, 4, 8], [128, 256, 512], decode_tokens=64)
+        assert (best["quant"], best["n_threads"], best["n_threads_batch"], best["n_batch"]) == ("q4_k_s", 4, 8, 256)
+        assert best["estimated_seconds"] == pytest.approx(1000 / 800 + 64 / 40)
+        # 逐项搜索，每种量化最多 3 + 3 + 3 次加载，且相同参数不重复测量
+        assert len(calls) == len(set(calls)) == len(trials) <= 2 * 9
+
+    def test_tuned_values(self):
+        """测试写入配置的参数包含量化位数"""
+        values = tuned_values({"quant": "q8_0", "n_threads": 4, "n_threads_batch": 8, "n_batch": 256})
+        assert values["model.quantization.type"] == "q8_0" and values["model.quantization.bits"] == 8
+        assert values["model.params.n_threads"] == 4
+
+
+class TestWriteValues:
+    """配置文件写入测试类"""
+
+    def test_keeps_comments(self, tmp_path):
+        """测试写入时保留注释：替换已有的键、取消注释掉的键、在映射末尾添加缺少的键"""
+        path = tmp_path / "model_config.yaml"
+        path.write_text(MODEL_CONFIG, encoding="utf-8")
+        manager = ConfigManager()
+        manager.config_dir = str(tmp_path)
+        manager.write_values("model", {
+            "model.params.n_threads": 4,
+            "model.params.n_batch": 256,
+            "model.params.n_threads_batch": 8,
+            "model.quantization.type": "q8_0",
+        })
+        text = path.read_text(encoding="utf-8")
+        assert "    n_threads: 4\n" in text and "# n_threads" not in text
+        assert '    n_batch: 256  # prefill batch\n    n_threads_batch: 8\n  # Quantization' in text
+        assert 'type: "q8_0"  # q4_k_s, q8_0' in text
+        assert yaml.safe_load(text)["model"]["params"] == {
+            "max_length": 2048, "n_threads": 4, "n_batch": 256, "n_threads_batch": 8}
+
+    def test_missing_section(self, tmp_path):
+        """测试父级映射不存在时报错且不修改文件"""
+        path = tmp_path / "model_config.yaml"
+        path.write_text(MODEL_CONFIG, encoding="utf-8")
+        manager = ConfigManager()
+        manager.config_dir = str(tmp_path)
+        with pytest.raises(ValueError, match="model.speculative not found"):
+            manager.write_values("model", {"model.speculative.enabled": True})
+        assert path.read_text(encoding="utf-8") == MODEL_CONFIG
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
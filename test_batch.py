@@ -0,0 +1,75 @@
+# 批量接口测试文件
+import asyncio
+
+import httpx
+import pytest
+
+import app as web_app
+
+QUESTION_A = "What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?"
+QUESTION_A_REPHRASED = "Qwen/Qwen3-235B-A22B vllm nvidia/h800 performance"
+QUESTION_B = "Best config for Meta/Llama-3-70B-Instruct with vllm on nvidia/h800"
+AGENT_QUESTION = "Which engine is fastest for Qwen/Qwen3-235B-A22B?"
+
+
+def post_batch(messages):
+    async def send():
+        transport = httpx.ASGITransport(app=web_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/chat/batch", json={"messages": messages})
+    return asyncio.run(send())
+
+
+class TestChatBatch:
+    """批量聊天接口测试类"""
+
+    def setup_method(self):
+        web_app.result_cache.clear()
+
+    def test_dedupes_and_shares_lookups(self, monkeypatch):
+        """测试相同查询去重、相同工具参数只查询一次，结果按请求顺序返回"""
+        lookups = []
+        original = web_app.fast_path_result
+
+        def counting_fast_path(arguments):
+            lookups.append(arguments)
+            return original(arguments)
+
+        monkeypatch.setattr(web_app, "fast_path_result", counting_fast_path)
+        response = post_batch([QUESTION_A, QUESTION_B, QUESTION_A_REPHRASED, QUESTION_A.upper()])
+        assert response.status_code == 200
+        items = response.json()["responses"]
+        assert [item["status_code"] for item in items] == [200] * 4
+        assert items[0]["response"] == items[2]["response"] == items[3]["response"]
+        assert "Llama-3-70B" in items[1]["response"]
+        assert len(lookups) == 2
+
+    def test_agent_queries_run_within_limit(self, monkeypatch):
+        """测试需要模型的查询跳过快速路径，并发数不超过调度器上限，失败只影响对应结果"""
+        running = {"now": 0, "max": 0}
+
+        async def fake_dispatch(message, config):
+            assert config["fast_path"] is False
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            if "fail" in message:
+                raise web_app.DeadlineExceeded("too slow")
+            return {"message": message, "performance_data": []}
+
+        monkeypatch.setattr(web_app, "dispatch", fake_dispatch)
+        messages = [f"{AGENT_QUESTION} #{i}" for i in range(5)] + [f"{AGENT_QUESTION} fail"]
+        items = post_batch(messages).json()["responses"]
+        assert [item["status_code"] for item in items] == [200] * 5 + [503]
+        assert f"#{3}" in items[3]["response"]
+        assert running["max"] <= web_app.inference_scheduler.max_concurrency
+
+    def test_rejects_oversized_batch(self):
+        """测试超过批量上限时返回 413"""
+        limit = web_app.config_manager.get("scheduler.max_batch_size", 128)
+        assert post_batch([QUESTION_A] * (limit + 1)).status_code == 413
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,82 @@
+# 缓存测试文件
+import pytest
+
+from src.tools.cpm_tools import get_performance_data, tool_cache
+from src.tools.performance_store import PerformanceStore, get_performance_store, set_performance_store
+from src.utils.cache import TTLCache
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    """LRU + TTL 缓存测试类"""
+
+    def test_hit_and_miss(self):
+        """测试命中与未命中统计"""
+        cache = TTLCache(max_size=2, ttl=10)
+        assert cache.get("a") is None
+        cache.set("a", [1, 2, 3])
+        assert cache.get("a") == [1, 2, 3]
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_ratio"] == 0.5
+        assert stats["memory_bytes"] > 0
+
+    def test_lru_eviction(self):
+        """测试超出容量时淘汰最久未使用的条目"""
+        cache = TTLCache(max_size=2, ttl=10)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.stats()["evictions"] == 1
+
+    def test_ttl_expiry(self):
+        """测试条目过期"""
+        clock = FakeClock()
+        cache = TTLCache(max_size=2, ttl=5, clock=clock)
+        cache.set("a", 1)
+        clock.now = 4.9
+        assert cache.get("a") == 1
+        clock.now = 5.0
+        assert cache.get("a") is None
+        assert cache.stats()["memory_bytes"] == 0
+
+    def test_clear(self):
+        """测试清空缓存"""
+        cache = TTLCache(max_size=2, ttl=10)
+        cache.set("a", 1)
+        cache.clear()
+        assert len(cache) == 0
+        assert cache.stats()["memory_bytes"] == 0
+
+
+class TestToolCacheInvalidation:
+    """工具结果缓存失效测试类"""
+
+    def test_store_swap_invalidates(self):
+        """测试替换性能数据存储后缓存被清空且返回新数据"""
+        original = get_performance_store()
+        arguments = {"model_name": "A/B", "engine_name": "vllm", "device_type": "nvidia/h100"}
+        try:
+            assert get_performance_data.invoke(arguments) == []
+            assert len(tool_cache) > 0
+            set_performance_store(PerformanceStore.from_records([dict(arguments, id=1, throughput=10.0)]))
+            assert len(tool_cache) == 0
+            assert get_performance_data.invoke(arguments)[0]["throughput"] == 10.0
+        finally:
+            set_performance_store(original)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,129 @@
+# 配置热加载与按请求生成参数测试文件
+import os
+from types import SimpleNamespace
+
+import pytest
+from langchain.agents.middleware.types import ModelRequest
+
+from src.agents.agent import runtime_context
+from src.agents.middleware import GenerationSettingsMiddleware, generation_defaults
+from src.utils.cache import TTLCache
+from src.utils.config import ConfigManager, ConfigSnapshot, ConfigWatcher, config_manager
+
+
+def write_config(config_dir, name, content):
+    path = os.path.join(config_dir, f"{name}_config.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """使用临时配置目录的配置管理器"""
+    write_config(tmp_path, "model", "model:\n  name: test\n  params:\n    max_length: 2048\n    temperature: 0.7\n")
+    write_config(tmp_path, "cache", "cache:\n  result:\n    max_size: 8\n    ttl: 60\n")
+    manager = ConfigManager()
+    manager.config_dir = str(tmp_path)
+    manager.load_all_configs()
+    return manager
+
+
+class TestConfigReload:
+    """配置快照与热加载测试类"""
+
+    def test_snapshot_is_immutable(self, manager):
+        """测试配置快照不可修改"""
+        snapshot = manager.snapshot()
+        assert snapshot.get("model.params.temperature") == 0.7
+        with pytest.raises(TypeError):
+            snapshot.get("model.params")["temperature"] = 1.0
+
+    def test_reload_swaps_snapshot(self, manager, tmp_path):
+        """测试重新加载后新快照生效，旧快照保持不变"""
+        old = manager.snapshot()
+        calls = []
+        manager.add_reload_listener(calls.append)
+        write_config(tmp_path, "model", "model:\n  name: test\n  params:\n    max_length: 2048\n    temperature: 0.2\n")
+        assert manager.reload()
+        assert manager.get("model.params.temperature") == 0.2
+        assert manager.snapshot().get("model.params.temperature") == 0.2
+        assert manager.snapshot().version > old.version
+        assert old.get("model.params.temperature") == 0.7
+        assert calls == [manager.snapshot()]
+
+    def test_invalid_yaml_keeps_config(self, manager, tmp_path):
+        """测试配置文件无法解析时保留当前配置"""
+        old = manager.snapshot()
+        write_config(tmp_path, "model", "model: [unclosed\n")
+        assert not manager.reload()
+        assert manager.snapshot() is old
+        assert manager.get("model.params.temperature") == 0.7
+
+    def test_restart_only_change_warns(self, manager, tmp_path, caplog):
+        """测试修改只在重启后生效的配置时记录警告"""
+        write_config(tmp_path, "model", "model:\n  name: other\n  params:\n    max_length: 2048\n    temperature: 0.7\n")
+        with caplog.at_level("WARNING"):
+            assert manager.reload()
+        assert "model.name" in caplog.text
+
+    def test_watcher_detects_changes(self, manager, tmp_path):
+        """测试配置文件修改后监视器触发重新加载"""
+        watcher = ConfigWatcher(manager, interval=60)
+        assert not watcher.check()
+        path = write_config(tmp_path, "cache", "cache:\n  result:\n    max_size: 2\n    ttl: 60\n")
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        assert watcher.check()
+        assert manager.get("cache.result.max_size") == 2
+
+
+class TestCacheResize:
+    """缓存大小调整测试类"""
+
+    def test_resize_evicts_oldest(self):
+        """测试缩小容量时淘汰最久未使用的条目"""
+        cache = TTLCache(max_size=4, ttl=10)
+        for key in "abcd":
+            cache.set(key, key)
+        cache.get("a")
+        cache.resize(max_size=2, ttl=20)
+        assert len(cache) == 2
+        assert cache.get("a") == "a" and cache.get("d") == "d"
+        assert cache.get("b") is None
+        assert cache.ttl == 20 and cache.stats()["evictions"] == 2
+
+
+class TestGenerationSettings:
+    """按请求生成参数测试类"""
+
+    def _settings(self, context):
+        request = ModelRequest(model=None, messages=[], runtime=SimpleNamespace(context=context))
+        captured = []
+        GenerationSettingsMiddleware().wrap_model_call(request, lambda req: captured.append(req.model_settings))
+        return captured[0]
+
+    def test_defaults_from_snapshot(self):
+        """测试 max_tokens 未配置时使用 max_length"""
+        snapshot = ConfigSnapshot({"model": {"params": {"max_length": 1024, "temperature": 0.5}}})
+        assert generation_defaults(snapshot) == {"max_tokens": 1024, "temperature": 0.5}
+        snapshot = ConfigSnapshot({"model": {"params": {"max_length": 1024, "max_tokens": 128}}})
+        assert generation_defaults(snapshot)["max_tokens"] == 128
+
+    def test_request_overrides(self):
+        """测试请求中的生成参数覆盖默认值"""
+        settings = self._settings(runtime_context({"timeout": 5, "max_tokens": 64, "stop": ["\n\n"], "top_p": None}))
+        assert settings["max_tokens"] == 64
+        assert settings["stop"] == ["\n\n"]
+        assert "timeout" not in settings
+        assert settings["top_p"] == generation_defaults(config_manager.snapshot())["top_p"]
+
+    def test_without_context(self):
+        """测试没有运行时上下文时只使用默认值"""
+        settings = self._settings(None)
+        assert "stop" not in settings
+        assert settings["max_tokens"] >= 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
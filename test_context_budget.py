@@ -0,0 +1,123 @@
+# 工具结果紧凑编码与上下文预算测试文件
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.agents.agent import parse_tool_rows
+from src.agents.context_budget import ContextBudget, estimate_tokens
+from src.agents.middleware import ToolResultEncodingMiddleware
+from src.agents.tool_result_encoding import encode_records, encode_tool_result
+
+ROWS = [
+    {"id": 1, "model_name": "M", "engine_name": "vllm", "scenario": "", "quantization": "",
+     "data_parallel_size": 0, "tensor_parallel_size": 8, "ttft": 476.123, "throughput": 968.73},
+    {"id": 2, "model_name": "M", "engine_name": "vllm", "scenario": "", "quantization": "",
+     "data_parallel_size": 0, "tensor_parallel_size": 4, "ttft": 380.5, "throughput": 1250.45},
+    {"id": 3, "model_name": "M", "engine_name": "vllm", "scenario": "", "quantization": "",
+     "data_parallel_size": 0, "tensor_parallel_size": 2, "ttft": 210.3, "throughput": 1850.2},
+]
+
+
+def tool_message(rows, call_id="call_1"):
+    return ToolMessage(content=encode_tool_result(rows), artifact=rows, name="get_performance_data",
+                       tool_call_id=call_id)
+
+
+class TestToolResultEncoding:
+    """工具结果紧凑编码测试类"""
+
+    def test_drops_empty_and_hoists_common_columns(self):
+        """测试空列不输出，相同取值的列只在 common 行出现一次"""
+        text = encode_records(ROWS)
+        lines = text.split("\n")
+        assert lines[0] == "rows: 3"
+        assert lines[1] == "common: model_name=M, engine_name=vllm"
+        assert lines[2] == "id|tensor_parallel_size|ttft|throughput"
+        assert lines[3] == "1|8|476.12|968.73"
+        assert "scenario" not in text and "data_parallel_size" not in text
+        assert len(text) < len(json.dumps(ROWS)) / 2
+
+    def test_row_cap_keeps_highest_throughput(self):
+        """测试超过行数上限时按吞吐量保留前几行"""
+        lines = encode_records(ROWS, max_rows=1).split("\n")
+        assert lines[0] == "rows: 3 (showing top 1 by throughput)"
+        assert lines[-1].startswith("3|")
+
+    def test_compare_and_error_results(self):
+        """测试对比工具的表格和错误结果的编码"""
+        compare = {
+            "model_name": "M",
+            "groups": {"columns": ["engine_name", "max_throughput"], "rows": [["vllm", 1.5], ["sglang", 2.0]]},
+            "pareto_frontier": {"columns": ["id", "throughput"], "rows": [[3, 2.0]]},
+        }
+        text = encode_tool_result(compare)
+        assert text.startswith("model_name: M\n[groups]\nrows: 2")
+        assert "[pareto_frontier]" in text
+        error = {"error": "有歧义", "suggestions": {"model_name": ["A", "B"]}}
+        assert json.loads(encode_tool_result(error)) == error
+        assert encode_tool_result([]) == "rows: 0"
+
+    def test_middleware_keeps_full_rows_in_artifact(self):
+        """测试中间件把内容替换为紧凑编码，完整数据保存在 artifact 中"""
+        raw = ToolMessage(content=json.dumps(ROWS), name="get_performance_data", tool_call_id="call_1")
+        message = ToolResultEncodingMiddleware().wrap_tool_call(None, lambda request: raw)
+        assert message.content == encode_tool_result(ROWS)
+        assert message.artifact == ROWS
+        assert parse_tool_rows(message) == ROWS
+
+
+class TestContextBudget:
+    """上下文预算测试类"""
+
+    def conversation(self, rows):
+        return [
+            HumanMessage(content="old question"),
+            AIMessage(content="old answer"),
+            HumanMessage(content="question"),
+            AIMessage(content="", tool_calls=[{"name": "get_performance_data", "args": {}, "id": "call_1"}]),
+            tool_message(rows),
+        ]
+
+    def test_within_budget_unchanged(self):
+        """测试未超出预算时不裁剪，并统计未压缩时的 token 数"""
+        messages = self.conversation(ROWS)
+        budget = ContextBudget(n_ctx=4096, count_tokens=estimate_tokens)
+        fitted, report = budget.fit("system", messages)
+        assert fitted == messages
+        assert not report["over_budget"]
+        assert report["uncompacted_prompt_tokens"] > report["prompt_tokens"]
+
+    def test_reencodes_tool_results_first(self):
+        """测试超出预算时先减少工具结果的行数"""
+        rows = [dict(ROWS[0], id=i, ttft=100.0 + i, throughput=1000.0 + i) for i in range(40)]
+        messages = self.conversation(rows)
+        budget = ContextBudget(n_ctx=10_000, count_tokens=estimate_tokens, reserve_tokens=0)
+        full = budget.fit("", messages)[1]["prompt_tokens"]
+        budget.n_ctx = full - 20
+        fitted, report = budget.fit("", messages)
+        assert report["truncated_tool_results"] == 1 and report["dropped_messages"] == 0
+        assert fitted[-1].content.startswith("rows: 40 (showing top")
+        assert fitted[-1].artifact == rows
+        assert report["prompt_tokens"] <= budget.n_ctx
+
+    def test_drops_oldest_history(self):
+        """测试仍超出预算时删除最早的历史，保留最后的问题和最新一轮结果"""
+        messages = self.conversation(ROWS[:1])
+        budget = ContextBudget(n_ctx=10_000, count_tokens=estimate_tokens, reserve_tokens=0)
+        full = budget.fit("", messages)[1]["prompt_tokens"]
+        budget.n_ctx = full - 1
+        fitted, report = budget.fit("", messages)
+        assert report["dropped_messages"] == 1
+        assert fitted[0].content == "old answer"
+        assert fitted[-1] is messages[-1]
+
+    def test_reserve_uses_smaller_max_tokens(self):
+        """测试为生成保留的 token 数取 max_tokens 和 reserve_tokens 中较小者"""
+        budget = ContextBudget(n_ctx=2048, count_tokens=estimate_tokens, reserve_tokens=256)
+        assert budget.limit() == 1792
+        assert budget.limit(max_tokens=64) == 1984
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
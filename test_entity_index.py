@@ -0,0 +1,65 @@
+# 名称解析索引测试文件
+import pytest
+
+from src.tools.cpm_tools import get_performance_data
+from src.tools.entity_index import EntityIndex, get_entity_index, normalize_name
+
+VOCABULARIES = {
+    "model_name": ["Qwen/Qwen3-235B-A22B", "Qwen/Qwen3-72B-A22B", "Meta/Llama-3-70B-Instruct"],
+    "engine_name": ["vllm", "tensorrt-llm"],
+    "device_type": ["nvidia/h800", "nvidia/h100", "amd/h100"],
+}
+
+
+class TestEntityIndex:
+    """名称解析索引测试类"""
+
+    def setup_method(self):
+        self.index = EntityIndex(VOCABULARIES, aliases={"engine_name": {"TRT": "tensorrt-llm"}})
+
+    def test_normalized_and_alias_names(self):
+        """测试大小写、分隔符、短名称和配置别名"""
+        assert normalize_name("Qwen/Qwen3-235B-A22B") == "qwenqwen3235ba22b"
+        assert self.index.resolve("model_name", "qwen3 235b a22b") == ("Qwen/Qwen3-235B-A22B", [])
+        assert self.index.resolve("device_type", "H800") == ("nvidia/h800", [])
+        assert self.index.resolve("engine_name", "trt") == ("tensorrt-llm", [])
+        assert self.index.resolve("engine_name", "TensorRT LLM") == ("tensorrt-llm", [])
+
+    def test_fuzzy_match(self):
+        """测试部分名称通过 n-gram 打分解析"""
+        assert self.index.resolve("model_name", "qwen3 235b")[0] == "Qwen/Qwen3-235B-A22B"
+        assert self.index.resolve("model_name", "llama 3 70b")[0] == "Meta/Llama-3-70B-Instruct"
+
+    def test_ambiguous_returns_suggestions(self):
+        """测试有歧义或冲突的名称返回候选列表"""
+        canonical, suggestions = self.index.resolve("model_name", "qwen3")
+        assert canonical is None
+        assert set(suggestions) == {"Qwen/Qwen3-235B-A22B", "Qwen/Qwen3-72B-A22B"}
+        # 两个设备的短名称都是 h100，不作为别名
+        canonical, suggestions = self.index.resolve("device_type", "h100")
+        assert canonical is None
+        assert set(suggestions) == {"nvidia/h100", "amd/h100"}
+        assert self.index.resolve("model_name", "mistral 7b") == (None, [])
+
+    def test_canonicalize(self):
+        """测试多字段规范化，空值保持不变"""
+        arguments, suggestions = self.index.canonicalize(model_name="QWEN3-72B", engine_name=None,
+                                                         device_type="nvidia h800")
+        assert arguments == {"model_name": "Qwen/Qwen3-72B-A22B", "engine_name": None, "device_type": "nvidia/h800"}
+        assert suggestions == {}
+        # 没有相近候选的名称原样保留，由查询返回空结果
+        arguments, suggestions = self.index.canonicalize(model_name="Mistral/Mistral-7B")
+        assert arguments == {"model_name": "Mistral/Mistral-7B"}
+        assert suggestions == {}
+
+    def test_tool_canonicalizes_arguments(self):
+        """测试性能数据工具在查询前规范化名称，歧义时返回候选"""
+        rows = get_performance_data.invoke({"model_name": "qwen3 235b", "engine_name": "VLLM", "device_type": "H800"})
+        assert [row["id"] for row in rows] == [1]
+        result = get_performance_data.invoke({"model_name": "qwen3", "engine_name": "vllm", "device_type": "h800"})
+        assert "Qwen/Qwen3-235B-A22B" in result["suggestions"]["model_name"]
+        assert get_entity_index() is get_entity_index()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,127 @@
+# 基准结果增量导入测试文件
+import json
+import os
+
+import pytest
+
+from src.tools.ingestion import ResultIngestor
+from src.tools.performance_store import (
+    PerformanceStore,
+    get_performance_store,
+    set_performance_store,
+    validate_record,
+)
+
+KEY = {"model_name": "A/B", "engine_name": "vllm", "device_type": "nvidia/h100"}
+
+
+def row(record_id, throughput=10.0, **fields):
+    return json.dumps({**KEY, "id": record_id, "ttft": 100.0, "throughput": throughput, **fields}) + "\n"
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    original = get_performance_store()
+    yield ResultIngestor(str(tmp_path), base_records=[dict(validate_record(KEY | {"id": 1}), throughput=1.0)])
+    set_performance_store(original)
+
+
+def write(path, text, mode="a"):
+    with open(path, mode, encoding="utf-8") as f:
+        f.write(text)
+    # 同一时钟周期内的修改也要能被发现
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def throughputs(store):
+    return {record["id"]: record["throughput"] for record in store.lookup(**KEY)}
+
+
+class TestValidateRecord:
+    """记录校验测试类"""
+
+    def test_coerces_and_rejects(self):
+        """测试按字段类型转换，缺少键字段、无法转换或为负数的记录被拒绝"""
+        record = validate_record({**KEY, "id": "7", "tensor_parallel_size": "4", "ttft": "1.5", "extra": 1})
+        assert record["id"] == 7 and record["tensor_parallel_size"] == 4 and record["ttft"] == 1.5
+        assert "extra" not in record
+        for bad, message in [
+            ({**KEY}, "missing id"),
+            ({"id": 1, "model_name": "A/B"}, "missing engine_name"),
+            ({**KEY, "id": 1, "ttft": "fast"}, "invalid ttft"),
+            ({**KEY, "id": 1, "qps": -1}, "non-negative"),
+            ({**KEY, "id": 1, "tpot": float("nan")}, "non-negative"),
+        ]:
+            with pytest.raises(ValueError, match=message):
+                validate_record(bad)
+
+
+class TestResultIngestor:
+    """增量导入测试类"""
+
+    def test_appends_read_from_offset(self, tmp_path, ingestor):
+        """测试追加写入只读取新增的完整行，写到一半的行留到下次"""
+        path = tmp_path / "run.jsonl"
+        write(path, row(2) + row(3)[:10])
+        store = ingestor.ingest()
+        assert throughputs(store) == {1: 1.0, 2: 10.0}
+        assert get_performance_store() is store
+        write(path, row(3)[10:] + row(4))
+        assert set(throughputs(ingestor.ingest())) == {1, 2, 3, 4}
+        assert ingestor.stats.rows_read == 3
+        assert ingestor.ingest() is None
+        # 第一次导入构建存储，之后只新增 id 时追加到已有存储之后
+        assert (ingestor.stats.store_rebuilds, ingestor.stats.store_appends) == (1, 1)
+
+    def test_dedupes_by_id_and_validates(self, tmp_path, ingestor):
+        """测试同 id 的记录以最后导入的为准，不合法的行被拒绝"""
+        write(tmp_path / "a.jsonl", row(1, throughput=50.0) + row(2) + "not json\n" + row(3, qps=-1))
+        write(tmp_path / "b.csv", "id,model_name,engine_name,device_type,throughput\n2,A/B,vllm,nvidia/h100,20\n")
+        store = ingestor.ingest()
+        assert throughputs(store) == {1: 50.0, 2: 20.0}
+        stats = ingestor.stats.as_dict()
+        assert stats["rows_rejected"] == 2 and stats["rows_replaced"] == 2
+        assert stats["rows_per_second"] > 0
+
+    def test_rewritten_and_deleted_files(self, tmp_path, ingestor):
+        """测试被改写的文件重新读取，被删除的文件的记录被移除（恢复原始数据中的记录）"""
+        path = tmp_path / "run.jsonl"
+        write(path, row(1, throughput=50.0) + row(2))
+        ingestor.ingest()
+        write(path, row(5), mode="w")
+        assert throughputs(ingestor.ingest()) == {1: 1.0, 5: 10.0}
+        os.remove(path)
+        assert throughputs(ingestor.ingest()) == {1: 1.0}
+
+    def test_record_kept_while_a_file_holds_it(self, tmp_path, ingestor):
+        """测试多个文件包含同一 id 时，删除其中一个文件后仍保留其他文件中的记录"""
+        write(tmp_path / "a.jsonl", row(7, throughput=10.0))
+        ingestor.ingest()
+        write(tmp_path / "b.jsonl", row(7, throughput=20.0))
+        assert throughputs(ingestor.ingest())[7] == 20.0
+        os.remove(tmp_path / "b.jsonl")
+        assert throughputs(ingestor.ingest())[7] == 10.0
+        write(tmp_path / "b.jsonl", row(7, throughput=20.0))
+        ingestor.ingest()
+        os.remove(tmp_path / "a.jsonl")
+        assert throughputs(ingestor.ingest())[7] == 20.0
+        os.remove(tmp_path / "b.jsonl")
+        assert 7 not in throughputs(ingestor.ingest())
+
+    def test_append_matches_rebuild(self, tmp_path, ingestor):
+        """测试追加新记录得到的存储与重新构建的存储查询结果相同（包括新出现的名称）"""
+        path = tmp_path / "run.jsonl"
+        write(path, row(2))
+        ingestor.ingest()
+        write(path, row(3, engine_name="sglang") + row(4, device_type="nvidia/h800"))
+        store = ingestor.ingest()
+        assert ingestor.stats.store_appends == 1
+        rebuilt = PerformanceStore.from_records(store.records(list(range(len(store)))))
+        for key in ({**KEY, "engine_name": "sglang"}, {**KEY, "device_type": "nvidia/h800"}, KEY):
+            assert store.lookup(**key) == rebuilt.lookup(**key) and store.lookup(**key)
+        assert sorted(store.distinct("engine_name")) == ["sglang", "vllm"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,79 @@
+# 指标测试文件
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+from langchain_core.messages import AIMessage, ToolMessage
+from prometheus_client import REGISTRY
+
+from src.agents.middleware import tool_call_extractor_middleware, tool_metrics_middleware
+from src.models.scheduler import InferenceScheduler
+from src.utils.metrics import render_metrics
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class FakeRequest:
+    tool_call = {"name": "get_performance_data", "args": {}, "id": "call_1"}
+
+
+class TestMetrics:
+    """Prometheus 指标测试类"""
+
+    def test_tool_latency_and_failures(self):
+        """测试工具耗时和执行失败计数"""
+        count = sample("cpm_tool_latency_seconds_count", tool="get_performance_data")
+        failures = sample("cpm_tool_call_failures_total", stage="execution")
+        ok = ToolMessage(content="[]", tool_call_id="call_1")
+        error = ToolMessage(content="boom", tool_call_id="call_1", status="error")
+        tool_metrics_middleware.wrap_tool_call(FakeRequest(), lambda request: ok)
+
+        async def handler(request):
+            return error
+
+        asyncio.run(tool_metrics_middleware.awrap_tool_call(FakeRequest(), handler))
+        assert sample("cpm_tool_latency_seconds_count", tool="get_performance_data") == count + 2
+        assert sample("cpm_tool_call_failures_total", stage="execution") == failures + 1
+
+    def test_parse_failures_and_parse_time(self):
+        """测试中间件解析耗时和解析失败计数"""
+        parses = sample("cpm_middleware_parse_seconds_count")
+        failures = sample("cpm_tool_call_failures_total", stage="parse")
+        message = AIMessage(content='<tool_call>{"name": </tool_call>')
+        tool_call_extractor_middleware.after_model({"messages": [message]}, None)
+        assert sample("cpm_middleware_parse_seconds_count") == parses + 1
+        assert sample("cpm_tool_call_failures_total", stage="parse") == failures + 1
+
+    def test_queue_wait_exported(self):
+        """测试排队时间被记录并以文本格式导出"""
+        before = sample("cpm_queue_wait_seconds_count")
+        scheduler = InferenceScheduler(max_concurrency=1, max_queue_size=1, request_timeout=5)
+
+        async def work():
+            return 1
+
+        assert asyncio.run(scheduler.run(work)) == 1
+        assert sample("cpm_queue_wait_seconds_count") == before + 1
+        content, content_type = render_metrics()
+        assert b"cpm_queue_wait_seconds_bucket" in content
+        assert content_type.startswith("text/plain")
+
+    def test_multiprocess_merge(self, tmp_path):
+        """测试多进程模式下导出的是各进程记录的指标合并后的值"""
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+        cwd = os.path.dirname(os.path.abspath(__file__))
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", "from src.utils.metrics import AGENT_TURNS; AGENT_TURNS.inc(2)"],
+                           env=env, cwd=cwd, check=True)
+        output = subprocess.run(
+            [sys.executable, "-c", "from src.utils.metrics import render_metrics; print(render_metrics()[0].decode())"],
+            env=env, cwd=cwd, check=True, capture_output=True, text=True).stdout
+        assert "cpm_agent_turns_total 4.0" in output
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
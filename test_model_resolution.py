@@ -0,0 +1,131 @@
+# 模型文件解析测试文件
+import copy
+import os
+
+import pytest
+
+from src.models import agent_model
+from src.utils.config import config_manager
+
+
+@pytest.fixture
+def model_config(tmp_path, monkeypatch):
+    """使用临时缓存目录的模型配置"""
+    config = copy.deepcopy(config_manager.configs["model"])
+    config.update({"name": "Org/Model-GGUF", "path": "", "cache_dir": str(tmp_path / "cache")})
+    config["quantization"] = {"enabled": True, "type": "q4_k_m"}
+    config["download"] = {"reuse_cache": True, "force_redownload": False, "gguf_versions": ["q4_k_m"]}
+    monkeypatch.setitem(config_manager.configs, "model", config)
+    return config
+
+
+@pytest.fixture
+def fake_hub(tmp_path, monkeypatch):
+    """模拟 ModelScope 下载，记录调用次数"""
+    snapshot = tmp_path / "snapshot"
+    snapshot.mkdir()
+    for name in ("model.Q4_K_S.gguf", "model.Q4_K_M.gguf", "README.md"):
+        (snapshot / name).write_bytes(b"weights-" + name.encode())
+    calls = []
+
+    def download(model_name, cache_dir, quant):
+        calls.append(quant)
+        return str(snapshot)
+
+    monkeypatch.setattr(agent_model, "_download_model", download)
+    return calls
+
+
+class TestModelResolution:
+    """模型文件解析测试类"""
+
+    def test_selects_configured_quant(self, model_config, fake_hub):
+        """测试选择与量化配置匹配的文件"""
+        path = agent_model.resolve_model_file()
+        assert path.endswith("model.Q4_K_M.gguf")
+        assert fake_hub == ["q4_k_m"]
+
+    def test_warm_boot_uses_manifest(self, model_config, fake_hub):
+        """测试再次启动时通过 manifest 跳过下载"""
+        first = agent_model.resolve_model_file()
+        second = agent_model.resolve_model_file()
+        assert first == second
+        assert len(fake_hub) == 1
+        entry = agent_model._load_manifest(model_config["cache_dir"])["Org/Model-GGUF:q4_k_m"]
+        assert entry["quant"] == "q4_k_m"
+        assert len(entry["sha256"]) == 64
+
+    def test_reuse_cache_disabled(self, model_config, fake_hub):
+        """测试 reuse_cache 关闭时每次都访问模型仓库"""
+        model_config["download"]["reuse_cache"] = False
+        agent_model.resolve_model_file()
+        agent_model.resolve_model_file()
+        assert len(fake_hub) == 2
+
+    def test_changed_file_invalidates_manifest(self, model_config, fake_hub):
+        """测试文件大小变化后重新解析"""
+        path = agent_model.resolve_model_file()
+        with open(path, "ab") as f:
+            f.write(b"more")
+        agent_model.resolve_model_file()
+        assert len(fake_hub) == 2
+
+    def test_local_path(self, model_config, tmp_path):
+        """测试本地目录中按量化类型查找"""
+        local = tmp_path / "local"
+        local.mkdir()
+        (local / "a.q4_k_s.gguf").write_bytes(b"x")
+        (local / "a.q4_k_m.gguf").write_bytes(b"x")
+        model_config["path"] = str(local)
+        assert agent_model.resolve_model_file().endswith("a.q4_k_m.gguf")
+
+    def test_local_path_fallback(self, model_config, tmp_path):
+        """测试本地目录中没有文件名包含量化类型的文件时使用其中的 GGUF 文件"""
+        local = tmp_path / "local"
+        local.mkdir()
+        (local / "model.gguf").write_bytes(b"x")
+        model_config["path"] = str(local)
+        assert agent_model.resolve_model_file().endswith("model.gguf")
+
+    def test_force_redownload_once(self, model_config, fake_hub, monkeypatch):
+        """测试强制重新下载只替换当前量化版本的文件一次，关闭后再打开会再次下载"""
+        path = agent_model.resolve_model_file()
+        other = path.replace("Q4_K_M", "Q4_K_S")
+        model_config["download"]["force_redownload"] = True
+        downloads = []
+
+        def download(model_name, cache_dir, quant):
+            # 模拟仓库重新写入被删除的文件
+            downloads.append(quant)
+            with open(path, "wb") as f:
+                f.write(b"fresh")
+            return os.path.dirname(path)
+
+        monkeypatch.setattr(agent_model, "_download_model", download)
+        assert agent_model.resolve_model_file() == path
+        assert agent_model.resolve_model_file() == path
+        assert downloads == ["q4_k_m"] and os.path.exists(other)
+        model_config["download"]["force_redownload"] = False
+        agent_model.resolve_model_file()
+        model_config["download"]["force_redownload"] = True
+        agent_model.resolve_model_file()
+        assert downloads == ["q4_k_m", "q4_k_m"]
+
+    def test_force_redownload_without_manifest(self, model_config, fake_hub, monkeypatch):
+        """测试没有 manifest 记录时强制重新下载替换仓库缓存中已有的文件"""
+        model_config["download"]["force_redownload"] = True
+        removed = []
+        monkeypatch.setattr(agent_model.os, "remove", removed.append)
+        agent_model.resolve_model_file()
+        assert [os.path.basename(path) for path in removed] == ["model.Q4_K_M.gguf"]
+        assert len(fake_hub) == 2
+
+    def test_missing_quant(self, model_config, fake_hub):
+        """测试找不到指定量化版本时报错"""
+        model_config["quantization"]["type"] = "q8_0"
+        with pytest.raises(FileNotFoundError):
+            agent_model.resolve_model_file()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
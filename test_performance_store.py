@@ -0,0 +1,123 @@
+# 性能数据存储测试文件
+import json
+
+import pytest
+
+import numpy as np
+
+from src.tools.performance_store import (PerformanceStore, get_performance_store, pareto_mask, read_records,
+                                         table_records)
+
+
+class TestPerformanceStore:
+    """性能数据存储测试类"""
+
+    def test_lookup_matches_bundled_data(self):
+        """测试复合键查询返回完整记录"""
+        rows = get_performance_store().lookup("Qwen/Qwen3-235B-A22B", "vllm", "nvidia/h800")
+        assert len(rows) == 1
+        assert rows[0]["id"] == 1
+        assert rows[0]["throughput"] == 968.73
+        assert rows[0]["enable_chunked_prefill"] is False
+        json.dumps(rows)
+
+    def test_lookup_missing_key(self):
+        """测试不存在的键返回空列表"""
+        assert get_performance_store().lookup("Unknown/Model", "vllm", "nvidia/h800") == []
+
+    def test_secondary_index(self):
+        """测试二级索引"""
+        store = get_performance_store()
+        assert sorted(store.rows_for("engine_name", "vllm").tolist()) == [0, 1, 2, 3]
+        assert len(store.rows_for("dtype", "float32")) == 0
+
+    def test_load_csv(self, tmp_path):
+        """测试从 CSV 加载并按字段类型转换"""
+        path = tmp_path / "perf.csv"
+        path.write_text(
+            "id,model_name,engine_name,device_type,node_num,enable_chunked_prefill,ttft,throughput\n"
+            "7,A/B,vllm,nvidia/h100,2,true,100.5,900\n",
+            encoding="utf-8",
+        )
+        store = PerformanceStore.from_file(str(path))
+        row = store.lookup("A/B", "vllm", "nvidia/h100")[0]
+        assert row["node_num"] == 2
+        assert row["enable_chunked_prefill"] is True
+        assert row["ttft"] == 100.5
+        assert row["quantization"] == ""
+
+    def test_unsupported_format(self, tmp_path):
+        """测试不支持的文件格式"""
+        path = tmp_path / "perf.txt"
+        path.write_text("", encoding="utf-8")
+        with pytest.raises(ValueError):
+            list(read_records(str(path)))
+
+    def test_top_k_objectives(self):
+        """测试按优化目标排序的前 k 条记录"""
+        store = get_performance_store()
+        rows = store.top_k("throughput", k=2, model_name="Qwen/Qwen3-235B-A22B")
+        assert [row["id"] for row in rows] == [2, 5]
+        rows = store.top_k("ttft", k=10, engine_name="vllm")
+        assert [row["id"] for row in rows] == [4, 3, 2, 1]
+
+    def test_top_k_constraints(self):
+        """测试约束条件过滤"""
+        store = get_performance_store()
+        rows = store.top_k("throughput", k=5, model_name="Qwen/Qwen3-235B-A22B", max_ttft=450)
+        assert [row["id"] for row in rows] == [2, 5]
+        assert store.top_k("throughput", k=5, dtype="float16") == []
+        assert store.top_k("throughput", k=5, max_node_num=0) == []
+
+    def test_top_k_unknown_objective(self):
+        """测试未知优化目标"""
+        with pytest.raises(ValueError):
+            get_performance_store().top_k("latency")
+
+    def test_empty_store(self):
+        """测试空数据集"""
+        store = PerformanceStore.from_records([])
+        assert len(store) == 0
+        assert store.lookup("A", "B", "C") == []
+
+    def test_pareto_mask_matches_brute_force(self):
+        """测试向量化的 Pareto 前沿与逐对比较结果一致（含重复行）"""
+        values = np.random.default_rng(0).integers(0, 6, size=(300, 3)).astype(float)
+        expected = [
+            not any((other <= row).all() and (other < row).any() for other in values)
+            for row in values
+        ]
+        assert pareto_mask(values).tolist() == expected
+
+    def test_compare_groups_and_frontier(self):
+        """测试按引擎和设备分组汇总，以及 Pareto 前沿"""
+        result = get_performance_store().compare("Qwen/Qwen3-235B-A22B")
+        groups = table_records(result["groups"])
+        assert [(g["engine_name"], g["device_type"]) for g in groups] == [
+            ("vllm", "nvidia/h100"), ("tensorrt-llm", "nvidia/h800"), ("vllm", "nvidia/h800")]
+        assert groups[0]["max_throughput"] == 1250.45
+        assert sum(g["configs"] for g in groups) == 3
+        # id=2 在 ttft、tpot 和吞吐量上都优于其他配置
+        assert [row["id"] for row in table_records(result["pareto_frontier"])] == [2]
+        assert [g["pareto_configs"] for g in groups] == [1, 0, 0]
+        json.dumps(result)
+
+    def test_compare_multi_config_groups(self):
+        """测试同一组内多个配置的聚合，以及前沿上的多个权衡配置"""
+        records = [
+            {"id": 1, "model_name": "M", "engine_name": "e1", "device_type": "d1", "ttft": 100, "tpot": 20, "throughput": 500, "qps": 1},
+            {"id": 2, "model_name": "M", "engine_name": "e1", "device_type": "d1", "ttft": 300, "tpot": 10, "throughput": 900, "qps": 2},
+            {"id": 3, "model_name": "M", "engine_name": "e2", "device_type": "d1", "ttft": 400, "tpot": 30, "throughput": 400, "qps": 1},
+            {"id": 4, "model_name": "N", "engine_name": "e2", "device_type": "d1", "ttft": 1, "tpot": 1, "throughput": 9999, "qps": 9},
+        ]
+        result = PerformanceStore.from_records(records).compare("M")
+        assert result["groups"]["rows"] == [
+            ["e1", "d1", 2, 900.0, 2.0, 100.0, 10.0, 2],
+            ["e2", "d1", 1, 400.0, 1.0, 400.0, 30.0, 0],
+        ]
+        assert [row["id"] for row in table_records(result["pareto_frontier"])] == [2, 1]
+        assert PerformanceStore.from_records(records).compare("Unknown")["groups"]["rows"] == []
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
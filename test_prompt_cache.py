@@ -0,0 +1,25 @@
+# 前缀状态缓存测试文件
+import pytest
+
+from src.models.prompt_cache import PromptCacheStats
+
+
+class TestPromptCacheStats:
+    """前缀状态缓存统计测试类"""
+
+    def test_counts_only_restored_tokens(self):
+        """测试只统计载入缓存状态后实际少预填充的 token 数，上下文中已有前缀时不计"""
+        stats = PromptCacheStats()
+        system, turn = list(range(100)), [500, 501]
+        # 上下文中是另一个会话的内容：载入缓存状态，省去 100 个 token
+        stats.record_hit(system, [900, 901], system + turn)
+        # 上下文中已有系统提示词（连续请求）：不载入
+        stats.record_hit(system, system + [600], system + turn)
+        # 上下文中只有前 40 个 token 相同：省去 60 个
+        stats.record_hit(system, system[:40] + [7], system + turn)
+        assert stats.as_dict()["hits"] == 3 and stats.restores == 2
+        assert stats.prefill_tokens_saved == 160
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,47 @@
+# 快速路径路由测试文件
+import pytest
+
+from src.agents.router import QueryRouter
+from src.tools.performance_store import get_performance_store
+
+
+class TestQueryRouter:
+    """快速路径路由测试类"""
+
+    def setup_method(self):
+        self.router = QueryRouter.from_store(get_performance_store())
+
+    def test_extract_well_formed_query(self):
+        """测试从规范查询中提取三个参数"""
+        arguments = self.router.extract("What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?")
+        assert arguments == {
+            "model_name": "Qwen/Qwen3-235B-A22B",
+            "engine_name": "vllm",
+            "device_type": "nvidia/h800",
+        }
+
+    def test_extract_is_case_insensitive(self):
+        """测试大小写不敏感并返回规范名称"""
+        arguments = self.router.extract("meta/llama-3-70b-instruct, VLLM, NVIDIA/H800")
+        assert arguments["model_name"] == "Meta/Llama-3-70B-Instruct"
+        assert arguments["device_type"] == "nvidia/h800"
+
+    def test_missing_or_ambiguous_falls_back(self):
+        """测试缺少参数或有歧义时返回 None"""
+        assert self.router.extract("Hello, how are you?") is None
+        assert self.router.extract("Qwen/Qwen3-235B-A22B with vllm") is None
+        assert self.router.extract("Qwen/Qwen3-235B-A22B with vllm on nvidia/h800 or nvidia/h100") is None
+
+    def test_no_partial_name_match(self):
+        """测试不会匹配名称的一部分"""
+        assert self.router.extract("Qwen/Qwen3-235B-A22B-FP8 with vllm on nvidia/h800") is None
+
+    def test_stats(self):
+        """测试命中统计"""
+        self.router.route("Qwen/Qwen3-235B-A22B with vllm on nvidia/h800")
+        self.router.route("Hello")
+        assert self.router.stats() == {"hits": 1, "misses": 1, "hit_ratio": 0.5}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
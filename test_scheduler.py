@@ -0,0 +1,185 @@
+# 推理调度器测试文件
+import asyncio
+import time
+
+import pytest
+from langchain_community.chat_models import ChatLlamaCpp
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+from src.models.llama_chat import ToolCallAwareChatLlamaCpp
+from src.models.scheduler import (
+    CancelToken,
+    DeadlineExceeded,
+    InferenceScheduler,
+    RequestCancelled,
+    SchedulerOverloaded,
+    cancel_scope,
+    cancellation_stats,
+    raise_if_cancelled,
+)
+
+
+class TestInferenceScheduler:
+    """推理调度器测试类"""
+
+    def test_limits_concurrency(self):
+        """测试并发数不超过 max_concurrency"""
+        scheduler = InferenceScheduler(max_concurrency=2, max_queue_size=10)
+        peak = 0
+
+        async def job():
+            nonlocal peak
+            peak = max(peak, scheduler.active)
+            await asyncio.sleep(0.01)
+            return scheduler.active
+
+        async def main():
+            return await asyncio.gather(*(scheduler.run(job) for _ in range(6)))
+
+        asyncio.run(main())
+        assert peak == 2
+        stats = scheduler.stats()
+        assert stats["admitted"] == 6
+        assert stats["active"] == 0 and stats["waiting"] == 0
+
+    def test_rejects_when_queue_full(self):
+        """测试队列已满时快速拒绝"""
+        scheduler = InferenceScheduler(max_concurrency=1, max_queue_size=1, request_timeout=5)
+
+        async def main():
+            release = asyncio.Event()
+            running = asyncio.create_task(scheduler.run(release.wait))
+            queued = asyncio.create_task(scheduler.run(release.wait))
+            while scheduler.active < 1 or scheduler.waiting < 1:
+                await asyncio.sleep(0)
+            assert scheduler.is_overloaded()
+            with pytest.raises(SchedulerOverloaded):
+                await scheduler.run(release.wait)
+            release.set()
+            await asyncio.gather(running, queued)
+
+        asyncio.run(main())
+        assert scheduler.stats()["rejected"] == 1
+
+    def test_deadline_while_queued(self):
+        """测试排队超过截止时间"""
+        scheduler = InferenceScheduler(max_concurrency=1, max_queue_size=4)
+
+        async def main():
+            blocker = asyncio.create_task(scheduler.run(lambda: asyncio.sleep(0.2)))
+            await asyncio.sleep(0)
+            with pytest.raises(DeadlineExceeded):
+                await scheduler.run(lambda: asyncio.sleep(0), timeout=0.01)
+            await blocker
+
+        asyncio.run(main())
+        assert scheduler.stats()["timed_out"] == 1
+
+    def test_deadline_during_inference(self):
+        """测试推理超过截止时间后释放槽位"""
+        scheduler = InferenceScheduler(max_concurrency=1, max_queue_size=4)
+
+        async def main():
+            with pytest.raises(DeadlineExceeded):
+                await scheduler.run(lambda: asyncio.sleep(1), timeout=0.01)
+            assert await scheduler.run(lambda: asyncio.sleep(0, result="ok")) == "ok"
+
+        asyncio.run(main())
+
+
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    """每个 token 耗时 10ms 的模型，记录已解码的 token"""
+    decoded = []
+
+    def fake_stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for index in range(1000):
+            time.sleep(0.01)
+            decoded.append(index)
+            yield ChatGenerationChunk(message=AIMessageChunk(content="x"))
+
+    monkeypatch.setattr(ChatLlamaCpp, "_stream", fake_stream)
+    llm = ToolCallAwareChatLlamaCpp.model_construct(early_stop_tool_calls=True, max_tokens=1000)
+    return llm, decoded
+
+
+class TestCancellation:
+    """取消与截止时间传递到模型生成的测试类"""
+
+    def test_deadline_stops_generation(self, slow_llm):
+        """测试超过截止时间后模型在下一个 token 前停止生成，槽位在生成停止后才释放"""
+        llm, decoded = slow_llm
+        scheduler = InferenceScheduler(max_concurrency=1, max_queue_size=4)
+        saved_before = cancellation_stats.decode_tokens_saved
+
+        async def main():
+            with pytest.raises(DeadlineExceeded):
+                await scheduler.run(lambda: asyncio.to_thread(llm._generate, [HumanMessage(content="hi")]),
+                                    timeout=0.1)
+            stopped_at = len(decoded)
+            await asyncio.sleep(0.05)
+            return stopped_at
+
+        stopped_at = asyncio.run(main())
+        assert stopped_at < 100
+        assert len(decoded) == stopped_at
+        assert cancellation_stats.decode_tokens_saved - saved_before == 1000 - stopped_at
+
+    def test_caller_cancellation_stops_generation(self, slow_llm):
+        """测试调用方任务被取消（客户端断开）时停止生成"""
+        llm, decoded = slow_llm
+        scheduler = InferenceScheduler(max_concurrency=1, max_queue_size=4)
+
+        async def main():
+            task = asyncio.ensure_future(
+                scheduler.run(lambda: asyncio.to_thread(llm._generate, [HumanMessage(content="hi")])))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return len(decoded)
+
+        stopped_at = asyncio.run(main())
+        time.sleep(0.05)
+        assert stopped_at < 100 and len(decoded) == stopped_at
+
+    def test_finished_after_deadline_not_cancelled(self):
+        """测试在截止时间之后、下一次检查之前正常完成的请求不计为取消"""
+        scheduler = InferenceScheduler(max_concurrency=1, max_queue_size=4)
+        before = cancellation_stats.as_dict()["cancelled_requests"]
+
+        async def finishes_late():
+            # 阻塞到截止时间之后，期间没有让出事件循环
+            time.sleep(0.05)
+            return "ok"
+
+        assert asyncio.run(scheduler.run(finishes_late, timeout=0.01)) == "ok"
+        assert cancellation_stats.as_dict()["cancelled_requests"] == before
+
+    def test_child_token(self):
+        """测试嵌套在另一个请求中的令牌随外层请求取消，截止时间不晚于外层"""
+        scheduler = InferenceScheduler(request_timeout=60)
+        outer = CancelToken(deadline=time.monotonic() + 1)
+        with cancel_scope(outer):
+            inner = scheduler.cancel_token()
+        assert inner.parent is outer and inner.deadline == outer.deadline
+        assert not inner.cancelled
+        outer.cancel("disconnected")
+        assert inner.cancelled and inner.reason == "disconnected"
+
+    def test_cancel_token(self):
+        """测试取消原因和抛出的异常类型"""
+        token = CancelToken(deadline=time.monotonic() - 1)
+        assert token.cancelled and token.reason == "deadline"
+        with pytest.raises(DeadlineExceeded):
+            token.raise_if_cancelled()
+        token = CancelToken()
+        token.cancel("disconnected")
+        with cancel_scope(token), pytest.raises(RequestCancelled):
+            raise_if_cancelled()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
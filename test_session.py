@@ -0,0 +1,158 @@
+# 多轮会话测试文件
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.agents import agent
+from src.agents.session import SessionStore
+from src.utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeState:
+    """模拟 llama.cpp 的状态快照"""
+
+    def __init__(self, llama_state_size):
+        self.llama_state_size = llama_state_size
+
+
+def turn(index):
+    return [HumanMessage(content=f"question {index}"), AIMessage(content=f"answer {index}")]
+
+
+class TestTTLCacheMemoryLimit:
+    """缓存内存上限测试类"""
+
+    def test_evicts_least_recently_used_over_memory(self):
+        """测试总内存超过上限时淘汰最久未使用的条目"""
+        cache = TTLCache(max_size=10, max_memory_bytes=250, sizeof=lambda value: value)
+        cache.set("a", 100)
+        cache.set("b", 100)
+        cache.get("a")
+        cache.set("c", 100)
+        assert cache.get("b") is None
+        assert cache.get("a") == 100 and cache.get("c") == 100
+        assert cache.stats()["memory_bytes"] == 200
+
+    def test_pop(self):
+        """测试 pop 删除条目并更新内存统计"""
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock, sizeof=lambda value: 1)
+        cache.set("a", "x")
+        assert cache.pop("a") == "x"
+        assert cache.pop("a", "missing") == "missing"
+        cache.set("b", "y")
+        clock.now = 11
+        assert cache.pop("b") is None
+        assert cache.stats()["memory_bytes"] == 0
+
+
+class TestSessionStore:
+    """会话存储测试类"""
+
+    def test_history_trimmed_from_human_message(self):
+        """测试历史超过上限时只保留最近的消息，并从一条用户消息开始"""
+        store = SessionStore(max_history_messages=5)
+        session = store.get("s")
+        store.save(session, [message for index in range(4) for message in turn(index)])
+        assert [message.content for message in session.messages] == [
+            "question 2", "answer 2", "question 3", "answer 3"]
+        assert session.turns == 1
+        assert store.get("s") is session
+
+    def test_kv_state_counts_towards_memory(self):
+        """测试 KV 快照计入会话内存，超出总内存上限时淘汰最久未使用的会话"""
+        store = SessionStore(max_memory_bytes=3000)
+        first, second = store.get("first"), store.get("second")
+        store.save(first, turn(0), FakeState(1500))
+        store.save(second, turn(0), FakeState(1500))
+        assert store.get("first") is not first
+        assert store.get("second").kv_state is not None
+        assert store.stats()["evictions"] == 1
+
+    def test_expired_session_starts_over(self):
+        """测试空闲超时的会话重新开始"""
+        store = SessionStore(ttl=10)
+        clock = FakeClock()
+        store._sessions._clock = clock
+        session = store.get("s")
+        store.save(session, turn(0))
+        clock.now = 11
+        assert store.get("s").messages == []
+        assert store.delete("s") and not store.delete("s")
+
+    def test_running_session_not_evicted(self):
+        """测试正在执行一轮的会话不会因 LRU 或空闲超时被淘汰，这一轮结束后照常淘汰"""
+        store = SessionStore(max_sessions=1, ttl=10)
+        clock = FakeClock()
+        store._sessions._clock = clock
+
+        async def main():
+            session = store.get("running")
+            async with session.lock:
+                store.get("other")
+                clock.now = 11
+                assert store.get("running") is session
+            return session
+
+        session = asyncio.run(main())
+        store.get("next")
+        assert store.stats()["evictions"] == 2
+        assert store.get("running") is not session
+
+
+class TestSessionTurns:
+    """会话中的对话轮次测试类"""
+
+    def test_fast_path_turn_recorded(self, monkeypatch):
+        """测试快速路径的查询以工具调用和工具结果的形式记入会话历史"""
+        store = SessionStore()
+        monkeypatch.setattr(agent, "session_store", store)
+        rows = [{"id": 1, "model_name": "M", "throughput": 10.0}]
+        monkeypatch.setattr(agent.get_query_router(), "route", lambda task: {"model_name": "M"})
+        monkeypatch.setattr(agent, "fast_path_result",
+                            lambda arguments: {"performance_data": rows, "message": "summary"})
+        result = asyncio.run(agent.run("M 的性能", {"session_id": "s"}))
+        assert result["performance_data"] == rows
+        messages = store.get("s").messages
+        assert [message.type for message in messages] == ["human", "ai", "tool", "ai"]
+        assert messages[1].tool_calls[0]["args"] == {"model_name": "M"}
+        assert messages[2].artifact == rows
+
+    def test_follow_up_sees_history(self, monkeypatch):
+        """测试追问时智能体收到会话历史，结果只包含本轮新增的消息"""
+        store = SessionStore()
+        monkeypatch.setattr(agent, "session_store", store)
+        session = store.get("s")
+        rows = [{"id": 1, "model_name": "M", "throughput": 10.0}]
+        store.save(session, agent.fast_path_messages("question 0", {"model_name": "M"},
+                                                     {"performance_data": rows, "message": "answer 0"}))
+        received = []
+
+        class FakeAgent:
+            async def ainvoke(self, state, context=None):
+                received.append(list(state["messages"]))
+                return {"messages": [*state["messages"], AIMessage(content="follow-up answer")]}
+
+        async def fake_agent_instance():
+            return FakeAgent()
+
+        monkeypatch.setattr(agent, "aget_agent_instance", fake_agent_instance)
+        monkeypatch.setattr(agent, "get_chat_llm", lambda: None)
+        result = asyncio.run(agent.run("and on H100?", {"session_id": "s", "fast_path": False}))
+        assert [message.type for message in received[0]] == ["human", "ai", "tool", "ai", "human"]
+        assert received[0][-1].content == "and on H100?"
+        assert result["performance_data"] == []
+        assert len(session.messages) == 6 and session.turns == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
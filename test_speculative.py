@@ -0,0 +1,68 @@
+# 推测解码测试文件
+import numpy as np
+import pytest
+
+from src.models.speculative import MeasuredDraftModel, SpeculativeStats, create_draft_model
+
+
+class ScriptedDraft:
+    """按顺序返回预设草稿的草稿模型"""
+
+    def __init__(self, drafts):
+        self.drafts = list(drafts)
+
+    def __call__(self, input_ids, **kwargs):
+        return np.array(self.drafts.pop(0), dtype=np.intc)
+
+
+class TestMeasuredDraftModel:
+    """草稿接受率统计测试类"""
+
+    def test_counts_accepted_prefix(self):
+        """测试下一次调用的输入中与草稿相同的前缀计为接受的 token"""
+        stats = SpeculativeStats()
+        draft = MeasuredDraftModel(ScriptedDraft([[5, 6, 7], [9, 9], []]), stats)
+        draft(np.array([1, 2, 3], dtype=np.intc))
+        # 接受 5、6，模型在 7 的位置采样了 8
+        draft(np.array([1, 2, 3, 5, 6, 8], dtype=np.intc))
+        # 草稿全部被接受，之后是模型采样的 10
+        draft(np.array([1, 2, 3, 5, 6, 8, 9, 9, 10], dtype=np.intc))
+        assert stats.draft_calls == 3
+        assert stats.drafted_tokens == 5 and stats.accepted_tokens == 4
+        assert stats.as_dict()["acceptance_rate"] == pytest.approx(0.8)
+
+    def test_unverified_draft_not_counted(self):
+        """测试一次生成最后一步未经验证的草稿不计入统计"""
+        stats = SpeculativeStats()
+        draft = MeasuredDraftModel(ScriptedDraft([[5, 6], [7]]), stats)
+        draft(np.array([1, 2], dtype=np.intc))
+        draft.begin()
+        draft(np.array([3, 4, 5, 6], dtype=np.intc))
+        assert stats.drafted_tokens == 0 and stats.accepted_tokens == 0
+
+    def test_decode_speed(self):
+        """测试解码速度按全部模型调用的 token 数和耗时计算"""
+        stats = SpeculativeStats()
+        stats.record_decode(30, 1.0)
+        stats.record_decode(10, 1.0)
+        assert stats.as_dict()["decode_tokens_per_second"] == 20.0
+
+
+class TestCreateDraftModel:
+    """草稿模型配置测试类"""
+
+    def test_disabled(self):
+        """测试未启用时不创建草稿模型"""
+        assert create_draft_model({}) is None
+        assert create_draft_model({"enabled": False, "method": "draft_model"}) is None
+
+    def test_invalid_config(self):
+        """测试未知方法和缺少草稿模型路径时报错"""
+        with pytest.raises(ValueError, match="Unknown speculative decoding method"):
+            create_draft_model({"enabled": True, "method": "medusa"})
+        with pytest.raises(ValueError, match="draft_model_path"):
+            create_draft_model({"enabled": True, "method": "draft_model"})
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,181 @@
+# 流式聊天接口测试文件
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+import app as web_app
+from benchmarks.fake_llm import FakeChatModel
+from src.agents import agent
+from src.models import agent_model
+from src.models.scheduler import InferenceScheduler, cancellation_stats, inference_scheduler
+
+AGENT_QUESTION = "Which engine is fastest for Qwen/Qwen3-235B-A22B?"
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    """用确定性的假模型创建智能体实例，测试结束后恢复"""
+    llm = FakeChatModel()
+    monkeypatch.setattr(agent_model, "_chat_llm_instance", llm)
+    monkeypatch.setattr(agent, "_agent_instance", None)
+    agent.get_agent_instance()
+    return llm
+
+
+def parse_sse(text):
+    """把 server-sent events 文本解析为 [(event, data)]"""
+    events = []
+    for block in text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def post_stream(payload):
+    async def send():
+        transport = httpx.ASGITransport(app=web_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/chat/stream", json=payload)
+    return asyncio.run(send())
+
+
+class TestChatStream:
+    """流式聊天接口测试类"""
+
+    def test_event_sequence(self, fake_agent):
+        """测试依次推送模型 token、工具调用、工具结果和最终结果"""
+        response = post_stream({"message": AGENT_QUESTION})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = parse_sse(response.text)
+        kinds = [kind for kind, _ in events]
+        first_tool = kinds.index("tool_start")
+        assert first_tool > 0 and set(kinds[:first_tool]) == {"token"}
+        assert kinds[first_tool:] == ["tool_start", "tool_result", "result"]
+        # token 事件拼接起来是模型输出的工具调用
+        text = "".join(data["content"] for kind, data in events if kind == "token")
+        assert text.startswith("<tool_call>") and "get_performance_data" in text
+        tool_start, tool_result, result = (data for _, data in events[first_tool:])
+        assert tool_start["name"] == "get_performance_data"
+        assert tool_start["arguments"]["model_name"] == "Qwen/Qwen3-235B-A22B"
+        assert tool_result["rows"] and result["performance_data"] == tool_result["rows"]
+
+    def test_fast_path_events(self):
+        """测试参数明确的查询不调用模型，直接推送工具结果和最终结果"""
+        response = post_stream({"message": "What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?"})
+        kinds = [kind for kind, _ in parse_sse(response.text)]
+        assert kinds == ["tool_result", "result"]
+
+    def test_fast_path_disabled(self, fake_agent):
+        """测试配置 fast_path 为 False 时参数明确的查询也调用模型"""
+
+        async def collect():
+            message = "What's the best config for Qwen/Qwen3-235B-A22B with vllm on nvidia/h800?"
+            return [item["event"] async for item in agent.stream(message, {"fast_path": False})]
+
+        kinds = asyncio.run(collect())
+        assert "token" in kinds and "tool_start" in kinds and kinds[-1] == "result"
+
+    def test_rejects_when_queue_full(self, fake_agent, monkeypatch):
+        """测试开始推送前队列已满时返回 429，推送开始后才满时推送 status 为 429 的 error 事件"""
+        full = InferenceScheduler(max_concurrency=1, max_queue_size=0)
+        full.active = 1
+        monkeypatch.setattr(web_app, "inference_scheduler", full)
+        assert post_stream({"message": AGENT_QUESTION}).status_code == 429
+        monkeypatch.setattr(web_app, "inference_scheduler", InferenceScheduler())
+        monkeypatch.setattr(agent, "inference_scheduler", full)
+        events = parse_sse(post_stream({"message": AGENT_QUESTION}).text)
+        assert events[-1][0] == "error" and events[-1][1]["status"] == 429
+
+    def test_deadline_error_event(self, fake_agent, monkeypatch):
+        """测试生成过程中超过截止时间时推送 status 为 503 的 error 事件"""
+        monkeypatch.setattr(fake_agent, "token_latency", 0.05)
+        events = parse_sse(post_stream({"message": AGENT_QUESTION, "timeout": 0.2}).text)
+        assert events[-1] == ("error", {"status": 503, "detail": "Request deadline exceeded during inference"})
+        assert "result" not in [kind for kind, _ in events]
+
+
+def call_with_disconnect(path, payload, disconnect_after):
+    """以原始 ASGI 调用接口，客户端在 disconnect_after 秒后断开连接，返回 (状态码, 响应体, 耗时)"""
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        body = json.dumps(payload).encode("utf-8")
+        requested = []
+        sent = []
+
+        async def receive():
+            if not requested:
+                requested.append(True)
+                return {"type": "http.request", "body": body, "more_body": False}
+            # 断开之前一直没有消息（is_disconnected 检查时会取消本次等待），断开之后立即返回
+            remaining = disconnect_after - (loop.time() - start)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+                 "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+                 "headers": [(b"content-type", b"application/json")], "client": ("test", 1), "server": ("test", 80)}
+        await web_app.app(scope, receive, send)
+        status = next(message["status"] for message in sent if message["type"] == "http.response.start")
+        content = b"".join(message.get("body", b"") for message in sent if message["type"] == "http.response.body")
+        return status, content.decode("utf-8"), loop.time() - start
+
+    return asyncio.run(main())
+
+
+class TestDisconnect:
+    """客户端断开连接测试类"""
+
+    def test_chat_returns_499(self, fake_agent, monkeypatch):
+        """测试 /chat 处理中客户端断开时停止处理、释放推理槽位并返回 499"""
+        monkeypatch.setattr(fake_agent, "token_latency", 0.05)
+        before = cancellation_stats.cancelled_requests["disconnected"]
+        status, content, elapsed = call_with_disconnect("/chat", {"message": AGENT_QUESTION}, 0.3)
+        assert status == 499 and "disconnected" in content
+        assert elapsed < 1
+        assert cancellation_stats.cancelled_requests["disconnected"] == before + 1
+        assert inference_scheduler.active == 0
+
+    def test_stream_stops(self, fake_agent, monkeypatch):
+        """测试 /chat/stream 推送中客户端断开时停止生成并释放推理槽位"""
+        monkeypatch.setattr(fake_agent, "token_latency", 0.05)
+        before = cancellation_stats.cancelled_requests["disconnected"]
+        status, content, elapsed = call_with_disconnect("/chat/stream", {"message": AGENT_QUESTION}, 0.3)
+        kinds = [kind for kind, _ in parse_sse(content)]
+        assert status == 200 and "token" in kinds and "result" not in kinds
+        assert elapsed < 1
+        assert cancellation_stats.cancelled_requests["disconnected"] == before + 1
+        assert inference_scheduler.active == 0
+
+    def test_stream_finished_after_deadline_not_cancelled(self, monkeypatch):
+        """测试在截止时间之后、下一次检查之前正常结束的事件流不计为取消"""
+
+        class FinishesLate:
+            async def astream_events(self, state, version=None, context=None):
+                yield {"event": "on_chat_model_start", "name": "model", "data": {}}
+                # 阻塞到截止时间之后，之后不再产出事件
+                time.sleep(0.1)
+
+        async def fake_agent_instance():
+            return FinishesLate()
+
+        async def collect():
+            return [item async for item in agent.stream(AGENT_QUESTION, {"timeout": 0.05})]
+
+        monkeypatch.setattr(agent, "aget_agent_instance", fake_agent_instance)
+        before = cancellation_stats.as_dict()["cancelled_requests"]
+        assert asyncio.run(collect())[-1]["event"] == "result"
+        assert cancellation_stats.as_dict()["cancelled_requests"] == before
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
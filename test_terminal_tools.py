@@ -0,0 +1,96 @@
+# 工具终止模式测试文件
+import json
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.agents.agent import process_result
+from src.agents.middleware import is_terminal_result, terminal_tool_middleware
+from src.utils.config import config_manager
+
+ROWS = [{"id": 1, "model_name": "M", "throughput": 10.0}]
+
+
+@pytest.fixture
+def terminal_tools(monkeypatch):
+    tools = {"get_performance_data": True, "compare_configs": False}
+    monkeypatch.setitem(config_manager.configs, "agent", {"terminal_tools": tools})
+    config_manager._refresh_snapshot()
+    yield tools
+    monkeypatch.undo()
+    config_manager._refresh_snapshot()
+
+
+def tool_message(name="get_performance_data", data=ROWS, call_id="call_1", **kwargs):
+    return ToolMessage(content=json.dumps(data), name=name, tool_call_id=call_id, **kwargs)
+
+
+def state(*results):
+    calls = [{"name": message.name, "args": {}, "id": message.tool_call_id} for message in results]
+    return {"messages": [HumanMessage(content="question"), AIMessage(content="", tool_calls=calls), *results]}
+
+
+class TestTerminalTools:
+    """工具终止模式测试类"""
+
+    def test_terminal_tool_ends_loop(self, terminal_tools):
+        """测试终止工具成功返回后直接结束智能体循环"""
+        assert terminal_tool_middleware.before_model(state(tool_message()), None) == {"jump_to": "end"}
+
+    def test_first_model_call_not_skipped(self, terminal_tools):
+        """测试还没有工具结果时正常调用模型"""
+        assert terminal_tool_middleware.before_model({"messages": [HumanMessage(content="q")]}, None) is None
+
+    def test_errors_go_back_to_model(self, terminal_tools):
+        """测试名称有歧义或工具执行失败时交给模型重试"""
+        ambiguous = tool_message(data={"error": "有歧义", "suggestions": {"model_name": ["A", "B"]}})
+        assert not is_terminal_result(ambiguous, terminal_tools)
+        assert not is_terminal_result(tool_message(status="error"), terminal_tools)
+        assert terminal_tool_middleware.before_model(state(ambiguous), None) is None
+
+    def test_all_results_must_be_terminal(self, terminal_tools):
+        """测试同一轮的工具中有非终止工具时继续调用模型"""
+        results = (tool_message(), tool_message(name="compare_configs", data={}, call_id="call_2"))
+        assert terminal_tool_middleware.before_model(state(*results), None) is None
+
+    def test_uses_artifact_when_compact(self, terminal_tools):
+        """测试紧凑编码的工具结果按 artifact 中的数据判断"""
+        message = ToolMessage(content="rows: 1", artifact=ROWS, name="get_performance_data", tool_call_id="call_1")
+        assert is_terminal_result(message, terminal_tools)
+
+
+class TestTerminalSummary:
+    """工具终止模式结果概括测试类"""
+
+    def test_best_configs_by_objective(self):
+        """测试 get_best_configs 按调用的优化目标概括工具排名第一的配置，而不是吞吐量最高的配置"""
+        rows = [
+            {"id": 1, "model_name": "M", "engine_name": "vllm", "device_type": "nvidia/h800", "ttft": 12.5, "throughput": 5.0},
+            {"id": 2, "model_name": "M", "engine_name": "vllm", "device_type": "nvidia/h800", "ttft": 30.0, "throughput": 50.0},
+        ]
+        message = tool_message(name="get_best_configs", data=rows)
+        result = state(message)
+        result["messages"][1].tool_calls[0]["args"] = {"model_name": "M", "objective": "ttft"}
+        formatted = process_result(result)
+        assert "首 token 延迟为 12.50 ms" in formatted["message"] and "50.00" not in formatted["message"]
+        assert formatted["performance_data"] == rows
+
+    def test_compare_configs(self):
+        """测试 compare_configs 按引擎和设备组合的对比结果概括"""
+        data = {
+            "model_name": "M",
+            "groups": {"columns": ["engine_name", "device_type", "configs", "max_throughput", "max_qps",
+                                   "min_ttft", "min_tpot", "pareto_configs"],
+                       "rows": [["sglang", "nvidia/h100", 3, 80.0, 2.0, 10.0, 5.0, 1],
+                                ["vllm", "nvidia/h800", 2, 60.0, 1.0, 8.0, 4.0, 1]]},
+            "pareto_frontier": {"columns": ["id", "engine_name", "device_type", "throughput"],
+                                "rows": [[1, "sglang", "nvidia/h100", 80.0], [2, "vllm", "nvidia/h800", 60.0]]},
+        }
+        formatted = process_result(state(tool_message(name="compare_configs", data=data)))
+        assert formatted["message"] == ("对比了 M 在 2 个引擎和设备组合上的 5 个性能配置，吞吐量最高的是 sglang 引擎"
+                                        "在 nvidia/h100 上（80.00 tokens/sec），Pareto 前沿共 2 个配置")
+        assert [row["engine_name"] for row in formatted["performance_data"]] == ["sglang", "vllm"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
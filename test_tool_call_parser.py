@@ -0,0 +1,172 @@
+# 工具调用解析测试文件
+import json
+import re
+
+import pytest
+from langchain_community.chat_models import ChatLlamaCpp
+from langchain_core.messages import AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+from src.agents.tool_call_parser import ToolCallStreamParser, parse_tool_calls
+from src.models.llama_chat import ToolCallAwareChatLlamaCpp
+
+CALL_A = '<tool_call>{"name": "get_performance_data", "arguments": {"model_name": "A"}}</tool_call>'
+CALL_B = '<tool_call>{"name": "get_best_configs", "arguments": {"model_name": "B"}}</tool_call>'
+
+
+class TestParseToolCalls:
+    """工具调用解析测试类"""
+
+    def test_multiple_calls(self):
+        """测试一轮输出中的多个工具调用"""
+        tool_calls, content, errors = parse_tool_calls(f"好的。{CALL_A}\n{CALL_B}")
+        assert [call["name"] for call in tool_calls] == ["get_performance_data", "get_best_configs"]
+        assert tool_calls[1]["args"] == {"model_name": "B"}
+        assert tool_calls[0]["id"] != tool_calls[1]["id"]
+        assert all(call["type"] == "tool_call" for call in tool_calls)
+        assert content == "好的。"
+        assert errors == []
+
+    def test_malformed_call_reported(self):
+        """测试格式错误的工具调用被记录而不影响其他调用"""
+        tool_calls, _, errors = parse_tool_calls('<tool_call>{"name": </tool_call>' + CALL_A)
+        assert len(tool_calls) == 1
+        assert len(errors) == 1
+
+    def test_unclosed_trailing_call(self):
+        """测试生成被截断时最后一个未闭合的块"""
+        tool_calls, content, _ = parse_tool_calls(CALL_A[:-len("</tool_call>")])
+        assert tool_calls[0]["args"] == {"model_name": "A"}
+        assert content == ""
+
+
+class TestToolCallStreamParser:
+    """流式解析测试类"""
+
+    def feed_all(self, pieces):
+        parser = ToolCallStreamParser()
+        for i, piece in enumerate(pieces):
+            if parser.feed(piece):
+                return i
+        return None
+
+    def test_stops_after_call_followed_by_text(self):
+        """测试工具调用闭合后出现普通文本时停止"""
+        pieces = ["<tool_", "call>{}</tool", "_call>", "\n", "我", "来"]
+        assert self.feed_all(pieces) == 4
+
+    def test_waits_for_possible_second_call(self):
+        """测试后续输出可能是新的工具调用时继续生成"""
+        pieces = [CALL_A, "\n<tool", "_call>", "{}", "</tool_call>", "完"]
+        assert self.feed_all(pieces) == 5
+
+    def test_never_stops_without_call(self):
+        """测试没有工具调用时不会提前停止"""
+        assert self.feed_all(["你好", "，", "世界"]) is None
+
+
+class TestEarlyStop:
+    """提前停止解码测试类"""
+
+    def test_stream_stops_after_tool_call(self, monkeypatch):
+        """测试工具调用完成后不再消费后续 token"""
+        tokens = ["<tool_call>", '{"name": "get_performance_data", "arguments": {}}', "</tool_call>", "\n", "接下来", "我", "会"]
+        consumed = []
+
+        def fake_stream(self, messages, stop=None, run_manager=None, **kwargs):
+            for token in tokens:
+                consumed.append(token)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+        monkeypatch.setattr(ChatLlamaCpp, "_stream", fake_stream)
+        llm = ToolCallAwareChatLlamaCpp.model_construct(early_stop_tool_calls=True)
+        result = llm._generate([HumanMessage(content="hi")])
+        assert len(consumed) == 5
+        assert result.generations[0].message.content.endswith("</tool_call>\n")
+
+
+class TestToolCallGrammar:
+    """工具调用语法生成测试类"""
+
+    def test_rules_follow_tool_signatures(self):
+        """测试语法按工具签名固定工具名、参数名和参数类型"""
+        from src.agents.tool_call_grammar import build_tool_call_grammar
+        from src.tools.cpm_tools import get_best_configs, get_performance_data
+
+        grammar = build_tool_call_grammar([get_performance_data, get_best_configs])
+        rules = dict(line.split(" ::= ", 1) for line in grammar.strip().splitlines())
+        assert rules["call"] == "call-get-performance-data | call-get-best-configs"
+        assert '"\\"get_best_configs\\""' in rules["call-get-best-configs"]
+        # 必填参数不可省略，可选参数带 ? 且保留可为 null 的类型
+        args = rules["args-get-best-configs"]
+        assert args.index('"\\"model_name\\""') < args.index('"\\"device_type\\""')
+        assert '( ws "," ws "\\"top_k\\"" ws ":" ws integer )?' in args
+        assert '( integer | null )' in args
+        assert "?" not in rules["args-get-performance-data"]
+
+    def test_enum_and_empty_arguments(self):
+        """测试枚举参数生成字面量，无参数工具生成空对象"""
+        from typing import Literal
+
+        from langchain_core.tools import tool
+
+        from src.agents.tool_call_grammar import build_tool_call_grammar
+
+        @tool
+        def rank(objective: Literal["qps", "ttft"]) -> str:
+            """按指标排序"""
+            return objective
+
+        @tool
+        def ping() -> str:
+            """连通性检查"""
+            return "pong"
+
+        rules = dict(line.split(" ::= ", 1) for line in build_tool_call_grammar([rank, ping]).strip().splitlines())
+        assert '( "\\"qps\\"" | "\\"ttft\\"" )' in rules["args-rank"]
+        assert rules["args-ping"] == '"{" ws "}"'
+
+    def test_preamble_and_text(self):
+        """测试调用前可以有简短说明；带说明的格式错误调用和含开始标签的文本都被拒绝"""
+        from src.agents.tool_call_grammar import build_tool_call_grammar
+        from src.tools.cpm_tools import get_performance_data
+
+        grammar = grammar_regex(build_tool_call_grammar([get_performance_data]))
+        call = ('<tool_call>{"name": "get_performance_data", "arguments": {"model_name": "A", '
+                '"engine_name": "vllm", "device_type": "nvidia/h100"}}</tool_call>')
+        for accepted in [call, f"\n{call}", f"我来查询一下。\n{call}\n", "A 的吞吐量为 10 tokens/s", "a < b, <t> <tool_call"]:
+            assert grammar.fullmatch(accepted), accepted
+        for rejected in [
+            '我来查询一下。\n<tool_call>{"name": "get_performance_data", "arguments": {"model": 1}}</tool_call>',
+            '\n<tool_call>{"name": "unknown", "arguments": {}}</tool_call>',
+            "答案如下 <tool_call> 无法解析",
+            "<<tool_call>",
+            "x" * 300 + call,
+        ]:
+            assert not grammar.fullmatch(rejected), rejected
+
+
+def grammar_regex(grammar):
+    """把不含递归的 GBNF 语法展开为等价的正则表达式，用于检查语法接受哪些输出"""
+    rules = dict(line.split(" ::= ", 1) for line in grammar.strip().splitlines())
+    token = re.compile(r'"(?:\\.|[^"\\])*"|\[(?:\\.|[^\]\\])*\]|\{\d+,\d+\}|[()|?*+]|[a-z0-9-]+|\s+')
+
+    def expand(name):
+        parts = []
+        for match in token.finditer(rules[name]):
+            text = match.group(0)
+            if text.startswith('"'):
+                parts.append(f"(?:{re.escape(json.loads(text))})")
+            elif text[0].isalnum():
+                parts.append(f"(?:{expand(text)})")
+            elif text == "(":
+                parts.append("(?:")
+            elif not text.isspace():
+                parts.append(text)
+        return "".join(parts)
+
+    return re.compile(expand("root"), re.DOTALL)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
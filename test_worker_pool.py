@@ -0,0 +1,120 @@
+# 多进程工作池测试文件
+import asyncio
+import time
+
+import pytest
+
+from src.models.scheduler import DeadlineExceeded, InferenceScheduler, raise_if_cancelled
+from src.models.worker_pool import WorkerPool
+
+
+def decode_until_cancelled(task, config=None):
+    """工作进程中的模拟推理：每 10ms 检查一次取消令牌，最多运行 seconds 秒"""
+    start = time.monotonic()
+    while time.monotonic() - start < (config or {}).get("seconds", 10):
+        raise_if_cancelled()
+        time.sleep(0.01)
+    return task
+
+
+async def stream_tokens(task, config=None):
+    """工作进程中的模拟流式推理：每 10ms 产出一个 token 事件，tokens 个之后产出结果"""
+    for index in range((config or {}).get("tokens", 1000)):
+        raise_if_cancelled()
+        await asyncio.sleep(0.01)
+        yield {"event": "token", "data": {"content": str(index)}}
+    if (config or {}).get("fail"):
+        raise DeadlineExceeded("Request deadline exceeded during inference")
+    yield {"event": "result", "data": {"message": task}}
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(1, 1, target="test_worker_pool:decode_until_cancelled", warmup=None,
+                      stream_target="test_worker_pool:stream_tokens")
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def run_in_scheduler(pool, **kwargs):
+    """像 app.dispatch 一样在调度器的槽位中把请求提交给工作池，返回 (调度器, 耗时)"""
+    scheduler = InferenceScheduler(max_concurrency=pool.num_workers, max_queue_size=4)
+
+    async def main():
+        start = time.monotonic()
+        task = asyncio.ensure_future(scheduler.run(lambda: pool.submit("slow"), **kwargs))
+        if "timeout" not in kwargs:
+            # 模拟客户端断开
+            await asyncio.sleep(0.3)
+            task.cancel()
+        with pytest.raises((DeadlineExceeded, asyncio.CancelledError)):
+            await task
+        assert pool.stats()["in_flight"] == [0]
+        assert scheduler.active == 0
+        return time.monotonic() - start
+
+    return scheduler, asyncio.run(main())
+
+
+class TestWorkerPoolCancellation:
+    """工作池请求截止时间与取消测试类"""
+
+    def test_deadline_stops_worker(self, pool):
+        """测试截止时间传到工作进程，工作进程停止后才释放槽位和在途计数"""
+        scheduler, elapsed = run_in_scheduler(pool, timeout=0.3)
+        assert elapsed < 2
+        assert scheduler.stats()["timed_out"] == 1
+
+    def test_disconnect_stops_worker(self, pool):
+        """测试调用方被取消（客户端断开）时通知工作进程停止，之后的请求不会排在它后面"""
+        _, elapsed = run_in_scheduler(pool)
+        assert elapsed < 2
+
+        async def follow_up():
+            start = time.monotonic()
+            assert await pool.submit("next", {"seconds": 0}) == "next"
+            return time.monotonic() - start
+
+        assert asyncio.run(follow_up()) < 1
+        assert pool.stats()["completed"] == [1]
+
+
+class TestWorkerPoolStream:
+    """工作池流式请求测试类"""
+
+    def test_relays_events(self, pool):
+        """测试工作进程产出的事件按顺序转发，工作进程中的异常在已产出的事件之后抛出"""
+
+        async def collect(config):
+            return [item async for item in pool.stream("question", config)]
+
+        items = asyncio.run(collect({"tokens": 3}))
+        assert [item["event"] for item in items] == ["token", "token", "token", "result"]
+        assert items[-1]["data"] == {"message": "question"}
+
+        async def failing():
+            items = []
+            with pytest.raises(DeadlineExceeded):
+                async for item in pool.stream("question", {"tokens": 2, "fail": True}):
+                    items.append(item)
+            return items
+
+        assert len(asyncio.run(failing())) == 2
+
+    def test_closing_stream_stops_worker(self, pool):
+        """测试提前关闭事件流（客户端断开）时工作进程停止生成"""
+
+        async def main():
+            events = pool.stream("question", {"tokens": 1000})
+            assert (await anext(events))["event"] == "token"
+            start = time.monotonic()
+            await events.aclose()
+            assert pool.stats()["in_flight"] == [0]
+            return time.monotonic() - start
+
+        assert asyncio.run(main()) < 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])